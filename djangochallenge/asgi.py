@@ -5,12 +5,49 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
+
+Every request runs its sync view in a thread of its own, so a process
+serves up to ASGI_MAX_CONCURRENT_REQUESTS requests concurrently, and as
+many threads and database connections. /projects/stream is only served under ASGI
+(see webhooks.stream), run it with eg.:
+
+    uvicorn djangochallenge.asgi:application --host 0.0.0.0 --port 8000
 """
 
+import asyncio
 import os
 
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangochallenge.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the apps are loaded
+from webhooks.stream import ProjectEventStream  # noqa: E402
+
+# The Django 4.0 ASGI handler iterates streamed responses in the event loop,
+# where their database cursor cannot be read, they are served by the WSGI handler
+STREAMED_PATH_PREFIXES = ('/projects/export',)
+streaming_application = WsgiToAsgi(get_wsgi_application())  # type: ignore[no-untyped-call]
+
+# Server-Sent Events, connections are held open by the event loop, not by threads
+EVENT_STREAM_PATHS = ('/projects/stream', '/projects/stream/')
+event_stream_application = ProjectEventStream()
+
+# Requests over the limit wait here without holding a thread
+request_slots = asyncio.Semaphore(settings.ASGI_MAX_CONCURRENT_REQUESTS)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] in EVENT_STREAM_PATHS:
+        return await event_stream_application(scope, receive, send)
+    if scope['type'] != 'http':
+        return await django_application(scope, receive, send)
+    async with request_slots:
+        if scope['path'].startswith(STREAMED_PATH_PREFIXES):
+            return await streaming_application(scope, receive, send)
+        return await django_application(scope, receive, send)
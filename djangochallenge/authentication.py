@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from djangochallenge.routers import read_from
+from hashlib import sha1
+from rest_framework.authentication import TokenAuthentication
+from typing import Iterable
+import time
+
+# User fields kept in the cache, the other fields of a cached user are deferred
+CACHED_USER_FIELDS = ['id', 'username', 'is_active', 'is_staff', 'is_superuser']
+
+
+def token_cache_keys(key: str) -> tuple[str, str]:
+    """
+    Return the cache keys of the cached user and of the version of a token
+    """
+    # Tokens are credentials, only their digest is stored
+    digest = sha1(key.encode()).hexdigest()
+    return 'auth:token:{0}'.format(digest), 'auth:token:{0}:version'.format(digest)
+
+
+def invalidate_tokens(keys: Iterable[str]) -> None:
+    """
+    Forget the cached users of tokens
+
+    The version of every token is increased, so a user loaded before the
+    invalidation and cached after it is never read.
+    """
+    for key in keys:
+        user_key, version_key = token_cache_keys(key)
+        cache.add(version_key, time.time_ns(), None)
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            # The version was evicted between add() and incr()
+            cache.set(version_key, time.time_ns(), None)
+        cache.delete(user_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication which keeps the user of a token in the default cache (Redis)
+
+    The token and user join only runs on a cache miss, then the user fields
+    in CACHED_USER_FIELDS are cached for TOKEN_CACHE_TIMEOUT seconds with the
+    version of the token read before the join. Signal receivers invalidate
+    a token (increase its version) when it is deleted or its user is changed
+    (eg. deactivated) or deleted, cached users of an earlier version are
+    ignored. Versions start from the clock, an evicted version never comes
+    back to an earlier value. Invalid tokens are not cached. The join
+    reads the primary database, a lagging replica could cache a deactivated
+    user or reject a new token.
+    """
+
+    def authenticate_credentials(self, key):
+        user_key, version_key = token_cache_keys(key)
+        cached = cache.get_many([user_key, version_key])
+        version = cached.get(version_key)
+        if version is None:
+            cache.add(version_key, time.time_ns(), None)
+            version = cache.get(version_key)
+        entry = cached.get(user_key)
+        if entry is None or entry[0] != version:
+            with read_from(None):
+                user, token = super().authenticate_credentials(key)
+            values = [getattr(user, field) for field in CACHED_USER_FIELDS]
+            cache.set(user_key, (version, values), settings.TOKEN_CACHE_TIMEOUT)
+            return user, token
+        model = self.get_model()
+        user_model = get_user_model()
+        user = user_model.from_db(router.db_for_read(user_model), CACHED_USER_FIELDS, entry[1])
+        return user, model(key=key, user=user)
@@ -0,0 +1,127 @@
+from calendar import timegm
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag  # type: ignore[attr-defined]
+from django.utils.http import http_date
+from hashlib import sha1
+from rest_framework import generics, status
+from rest_framework.exceptions import APIException
+from typing import TYPE_CHECKING, Optional
+
+CONDITIONAL_WRITE_HEADERS = ('HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_IF_NONE_MATCH')
+
+# The views the mixins are combined with, for type checking
+if TYPE_CHECKING:
+    ObjectViewBase = generics.RetrieveUpdateDestroyAPIView
+    ListViewBase = generics.ListAPIView
+else:
+    ObjectViewBase = ListViewBase = object
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has been modified.'
+    default_code = 'precondition_failed'
+
+
+class ConditionalObjectMixin(ObjectViewBase):
+    """
+    HTTP conditional requests for a detail view of a model with version and updated_at fields
+
+    ETag and Last-Modified are computed from the version and updated_at
+    columns, the object is never serialized to compute them:
+
+    GET - If-None-Match and If-Modified-Since return 304 Not Modified
+        before the serializer runs
+    PUT, PATCH, DELETE - If-Match and If-Unmodified-Since are checked
+        against the object locked for the write, stale ones return
+        412 Precondition Failed (optimistic concurrency)
+    """
+
+    def get_etag(self, obj) -> str:
+        return quote_etag(str(obj.version))
+
+    def get_last_modified(self, obj) -> Optional[int]:
+        return timegm(obj.updated_at.utctimetuple())
+
+    def get(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.get_etag(instance)
+        last_modified = self.get_last_modified(instance)
+        response = get_conditional_response(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        set_validators(response, etag, last_modified)
+        return response
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            self.check_write_preconditions(request)
+            response = super().update(request, *args, **kwargs)
+        instance = getattr(self, 'written_instance', None)
+        if instance is not None:
+            set_validators(response, self.get_etag(instance), self.get_last_modified(instance))
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            self.check_write_preconditions(request)
+            return super().destroy(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.written_instance = serializer.instance
+
+    def check_write_preconditions(self, request) -> None:
+        if not any(header in request.META for header in CONDITIONAL_WRITE_HEADERS):
+            return
+        instance = self.get_object()
+        # The row stays locked until the write is committed, so it cannot change in between
+        instance = type(instance)._default_manager.select_for_update().get(pk=instance.pk)
+        if get_conditional_response(request, self.get_etag(instance), self.get_last_modified(instance)) is not None:
+            raise PreconditionFailed()
+
+
+class ConditionalListMixin(ListViewBase):
+    """
+    HTTP conditional GET for a list view of a model with version and updated_at fields
+
+    The ETag is a digest of the request query and of the count, highest id
+    and latest updated_at of the filtered queryset, one aggregate query
+    which changes whenever an object is created, changed or deleted.
+    If-None-Match returns 304 Not Modified before the list is serialized.
+    """
+
+    def get_conditional_state(self) -> object:
+        """
+        Return state the response depends on which is not stored with the listed objects
+        """
+        return None
+
+    def get_list_etag(self, request) -> str:
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.order_by().aggregate(count=Count('pk'), last_id=Max('pk'), updated_at=Max('updated_at'))
+        digest = sha1(repr((
+            request.get_full_path(),
+            state['count'],
+            state['last_id'],
+            state['updated_at'] and state['updated_at'].isoformat(),
+            self.get_conditional_state(),
+        )).encode()).hexdigest()
+        return quote_etag(digest)
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        response = get_conditional_response(request, etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        set_validators(response, etag, None)
+        return response
+
+
+def set_validators(response, etag: str, last_modified: Optional[int]) -> None:
+    if not (200 <= response.status_code < 300 or response.status_code == status.HTTP_304_NOT_MODIFIED):
+        return
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
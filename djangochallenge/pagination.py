@@ -0,0 +1,171 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_json_api.pagination import JsonApiPageNumberPagination
+from typing import Any, Optional, Union
+import json
+
+
+class JsonApiCursorPagination(JsonApiPageNumberPagination):
+    """
+    A JSON:API compatible keyset (cursor) pagination
+
+    Requests with a page[cursor] parameter (empty for the first page) seek on
+    the sort fields followed by the primary key as a tie breaker, eg. for
+    sort=-rating: WHERE rating < 4.5 OR (rating = 4.5 AND id < 1234)
+    ORDER BY rating DESC, id DESC. There is no COUNT(*) and no OFFSET, so
+    with an index on the sort fields a deep page is as fast as the first one.
+    next and prev links carry opaque cursors, there is no last link.
+
+    Requests without page[cursor] are paginated by page number as before.
+    """
+
+    cursor_query_param = 'page[cursor]'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        position, self.reverse = self.decode_cursor(request.query_params[self.cursor_query_param])
+        ordering = [_reverse_field(field) for field in self.ordering] if self.reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(_seek(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = (position is not None) if self.reverse else has_more
+        self.has_previous = has_more if self.reverse else (position is not None)
+        return results
+
+    def get_ordering(self, request, queryset, view) -> list[str]:
+        """
+        Return the sort fields of the request followed by the primary key
+
+        Sorting comes from the view OrderingFilter (the sort parameter), then
+        from the queryset or the model default ordering.
+        """
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+        if not ordering:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+        pk_name = queryset.model._meta.pk.name
+        ordering = [pk_name if field == 'pk' else '-' + pk_name if field == '-pk' else field for field in ordering]
+        for field in ordering:
+            if not isinstance(field, str):
+                raise ValidationError('Cursor pagination only supports sorting by fields.')
+            if _is_nullable(queryset.model, field.lstrip('-')):
+                raise ValidationError('Cursor pagination does not support sorting by {0}.'.format(field.lstrip('-')))
+        if pk_name not in [field.lstrip('-') for field in ordering]:
+            # The primary key makes every position unique, it follows the direction of the last field
+            ordering.append('-' + pk_name if ordering and ordering[-1].startswith('-') else pk_name)
+        return ordering
+
+    def decode_cursor(self, cursor: str) -> tuple[Optional[list[Any]], bool]:
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+            position, reverse = data['p'], bool(data['r'])
+        except (BinasciiError, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            # The cursor was issued for a different sort
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, obj: Union[Model, dict[str, Any]], reverse: bool) -> str:
+        position = []
+        for field in self.ordering:
+            if isinstance(obj, dict):
+                # A row fetched with values()
+                position.append(obj[field.lstrip('-')])
+                continue
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            position.append(value)
+        data = json.dumps({'p': position, 'r': int(reverse)}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return urlsafe_b64encode(data.encode()).decode('ascii')
+
+    def build_cursor_link(self, cursor: str) -> str:
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        next = None
+        previous = None
+        if self.has_next and self.page:
+            next = self.build_cursor_link(self.encode_cursor(self.page[-1], False))
+        if self.has_previous and self.page:
+            previous = self.build_cursor_link(self.encode_cursor(self.page[0], True))
+
+        return Response(
+            {
+                'results': data,
+                'meta': {
+                    'pagination': OrderedDict([('size', self.page_size)]),
+                },
+                'links': OrderedDict(
+                    [
+                        ('first', self.build_cursor_link('')),
+                        ('next', next),
+                        ('prev', previous),
+                    ]
+                ),
+            }
+        )
+
+
+def _reverse_field(field: str) -> str:
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _seek(ordering: list[str], position: list[Any]) -> Q:
+    """
+    Build the condition selecting rows after position in the given ordering
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        lookup = '{0}__{1}'.format(field.lstrip('-'), 'lt' if field.startswith('-') else 'gt')
+        term = Q(**{lookup: position[index]})
+        for previous_field, value in zip(ordering[:index], position):
+            term &= Q(**{previous_field.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def _is_nullable(model: type[Model], path: str) -> bool:
+    # NULLs do not compare, rows with a NULL sort value could never be sought past
+    for name in path.split('__'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        if field.null:
+            return True
+        if field.related_model is not None:
+            model = field.related_model
+    return False
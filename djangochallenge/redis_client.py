@@ -0,0 +1,14 @@
+from django.conf import settings
+from functools import lru_cache
+import redis
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> 'redis.Redis[bytes]':
+    """
+    Return the shared Redis client of the current process
+
+    Used for data structures the Django cache API does not offer
+    (scripts, sorted sets, pub/sub). The client keeps its own connection pool.
+    """
+    return redis.Redis.from_url(settings.REDIS_URL)
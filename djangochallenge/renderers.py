@@ -0,0 +1,21 @@
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+import json
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON, one JSON document per line
+
+    Views stream NDJSON bodies themselves, this renders the responses which
+    are not streamed (errors) as a single line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, cls=JSONEncoder, separators=(',', ':')).encode() + b'\n'
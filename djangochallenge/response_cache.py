@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag  # type: ignore[attr-defined]
+from djangochallenge.routers import read_from
+from hashlib import sha1
+from rest_framework import generics
+from rest_framework.response import Response
+from typing import TYPE_CHECKING, Optional, Union
+from urllib.parse import urlencode
+import time
+
+# Only JSON:API documents are cached, the browsable API is rendered per user
+CACHED_MEDIA_TYPE = 'application/vnd.api+json'
+
+# The views the mixin is combined with, for type checking
+if TYPE_CHECKING:
+    CachedViewBase = generics.RetrieveAPIView
+else:
+    CachedViewBase = object
+
+
+def generation_key(namespace: str) -> str:
+    return 'responses:{0}:generation'.format(namespace)
+
+
+def new_generation() -> int:
+    # Generations start from the clock, a counter evicted from the cache never restarts at a value it
+    # already had, so responses and ETags of earlier generations are never served for later data
+    return time.time_ns()
+
+
+def get_generation(namespace: str) -> int:
+    return cache.get_or_set(generation_key(namespace), new_generation, None)
+
+
+def bump_generation(namespace: str) -> None:
+    """
+    Invalidate every cached response of a namespace
+
+    Cached responses are keyed by the namespace generation, after a bump
+    they are never read again and expire on their own.
+    """
+    cache.add(generation_key(namespace), new_generation(), None)
+    try:
+        cache.incr(generation_key(namespace))
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        cache.set(generation_key(namespace), new_generation(), None)
+
+
+def record_lookup(namespace: str, hit: bool) -> None:
+    key = 'responses:{0}:{1}'.format(namespace, 'hits' if hit else 'misses')
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def response_cache_metrics(namespace: str) -> dict[str, int]:
+    """
+    Return the number of response cache hits and misses of a namespace
+    """
+    counts = cache.get_many(['responses:{0}:hits'.format(namespace), 'responses:{0}:misses'.format(namespace)])
+    return {
+        'hits': counts.get('responses:{0}:hits'.format(namespace), 0),
+        'misses': counts.get('responses:{0}:misses'.format(namespace), 0),
+    }
+
+
+class CachedResponseMixin(CachedViewBase):
+    """
+    Cache rendered GET responses of a view in the default cache (Redis)
+
+    Responses are keyed by the absolute request URL, the normalized query parameters
+    (page, sort, filter, search...) and the generation of the view
+    response_cache_namespace, which signal receivers bump when the underlying
+    objects change. Every lookup is counted as a hit or a miss and reported
+    in the X-Cache response header.
+
+    With response_cache_etag the ETag is a digest of the cache key, so it
+    changes with the generation, and If-None-Match returns 304 Not Modified
+    before the cache or the database is read.
+
+    Responses which are cached or carry that ETag are rendered from the
+    primary database: a lagging replica would store data older than the
+    generation in its key.
+
+    Set response_cache_enabled = False on a view to opt out.
+    """
+
+    response_cache_namespace: str
+    response_cache_enabled = True
+    response_cache_etag = False
+
+    def get(self, request, *args, **kwargs):
+        if request.accepted_media_type != CACHED_MEDIA_TYPE:
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        etag = quote_etag(sha1(key.encode()).hexdigest()) if self.response_cache_etag else None
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+        if not self.response_cache_enabled:
+            if etag is None:
+                return super().get(request, *args, **kwargs)
+            with read_from(None):
+                response = super().get(request, *args, **kwargs)
+            set_etag(response, etag)
+            return response
+
+        cached = cache.get(key)
+        record_lookup(self.response_cache_namespace, cached is not None)
+        if cached is not None:
+            content, status, headers = cached
+            hit = HttpResponse(content, status=status)
+            for header, value in headers:
+                hit[header] = value
+            hit['X-Cache'] = 'HIT'
+            return hit
+
+        with read_from(None):
+            response = super().get(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        set_etag(response, etag)
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: self.store_response(key, rendered))
+        return response
+
+    def get_response_cache_key(self, request) -> str:
+        query = urlencode(sorted(
+            (name, value)
+            for name in request.query_params
+            for value in sorted(request.query_params.getlist(name))
+        ))
+        # Documents hold absolute links, responses are kept per scheme, host and port
+        digest = sha1('{0}?{1}'.format(request.build_absolute_uri(request.path), query).encode()).hexdigest()
+        return 'responses:{0}:{1}:{2}'.format(
+            self.response_cache_namespace,
+            get_generation(self.response_cache_namespace),
+            digest,
+        )
+
+    def store_response(self, key: str, response: HttpResponse) -> None:
+        headers = [(header, value) for header, value in response.items() if header != 'X-Cache']
+        cache.set(key, (response.content, response.status_code, headers), settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def set_etag(response: Union[HttpResponse, Response], etag: Optional[str]) -> None:
+    if etag is not None and response.status_code == 200:
+        response['ETag'] = etag
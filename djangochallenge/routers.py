@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model, QuerySet
+from functools import wraps
+from hashlib import sha1
+from rest_framework import permissions
+from typing import Any, Callable, ContextManager, Iterator, Optional, TypeVar
+import random
+
+# Database alias reads of the current request or task go to, None for the primary
+_read_database: ContextVar[Optional[str]] = ContextVar('read_database', default=None)
+
+_M = TypeVar('_M', bound=Model)
+
+
+def get_read_database() -> Optional[str]:
+    return _read_database.get()
+
+
+@contextmanager
+def read_from(alias: Optional[str]) -> Iterator[None]:
+    """
+    Send reads of the block to a database alias, or to the primary when alias is None
+    """
+    token = _read_database.set(alias)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def read_from_replica() -> ContextManager[None]:
+    """
+    Send reads of the block to one of settings.REPLICA_DATABASES, to the primary when there is none
+
+    One replica is picked for the whole block, its reads see a single replication state.
+    """
+    return read_from(random.choice(settings.REPLICA_DATABASES) if settings.REPLICA_DATABASES else None)
+
+
+def reads_from_replica(function: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Run a function (eg. a Celery task) with its reads sent to a replica
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with read_from_replica():
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def get_with_primary_fallback(queryset: 'QuerySet[_M]', **lookups: Any) -> _M:
+    """
+    Get an object from the read database, or from the primary when a lagging replica does not have it yet
+    """
+    try:
+        return queryset.get(**lookups)
+    except queryset.model.DoesNotExist:
+        if get_read_database() is None:
+            raise
+        return queryset.using(DEFAULT_DB_ALIAS).get(**lookups)
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen for the current request or task, everything else to the primary
+
+    Reads only go to a replica inside read_from_replica(), eg. safe API
+    requests (see PrimaryPinningMiddleware) and tasks decorated with
+    reads_from_replica. Reads inside a transaction of the primary, and
+    select_for_update() queries, stay on the primary. Replicas hold the
+    same data, relations between aliases are allowed and only the primary
+    is migrated.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        alias = _read_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
+
+
+def primary_pin_key(request) -> str:
+    # Clients are told apart by their credentials, session or address, only digests are stored
+    client = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    client = client or request.META.get('REMOTE_ADDR', '')
+    return 'db:primary:{0}'.format(sha1(client.encode()).hexdigest())
+
+
+class PrimaryPinningMiddleware:
+    """
+    Serve safe requests from a replica, except for clients which have just written
+
+    After an unsafe request (POST, PUT, PATCH, DELETE) a client is pinned to
+    the primary for DATABASE_PRIMARY_PIN_SECONDS, long enough for replicas
+    to replay its writes, so it reads its own writes. The pin is set before
+    the request and refreshed after it, a slow request does not outlive it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        if request.method not in permissions.SAFE_METHODS:
+            # Pinned before writing, so no read can reach a replica between the commit and the pin
+            cache.set(primary_pin_key(request), 1, settings.DATABASE_PRIMARY_PIN_SECONDS)
+            response = self.get_response(request)
+            cache.set(primary_pin_key(request), 1, settings.DATABASE_PRIMARY_PIN_SECONDS)
+            return response
+        if cache.get(primary_pin_key(request)) is not None:
+            return self.get_response(request)
+        with read_from_replica():
+            return self.get_response(request)
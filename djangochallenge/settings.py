@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
 from pathlib import Path
+from typing import Any
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,12 +42,14 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'rest_framework_json_api',
+    'django_filters',
     'githubprojects',
     'webhooks',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'djangochallenge.routers.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -121,7 +124,7 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
     'EXCEPTION_HANDLER': 'rest_framework_json_api.exceptions.exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'djangochallenge.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework_json_api.pagination.JsonApiPageNumberPagination',
@@ -148,12 +151,140 @@ REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'vnd.api+json'
 }
 
+# Seconds a rendered API response is cached for, changes invalidate it earlier
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Seconds the user of an API token is cached for, changes to the token or user invalidate it earlier
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+
+# Maximum number of requests an ASGI process serves at once, each runs its view in a thread of its own
+# with a database connection, further requests wait in the event loop
+ASGI_MAX_CONCURRENT_REQUESTS = int(os.getenv('ASGI_MAX_CONCURRENT_REQUESTS', 16))
+
+# Number of projects fetched from the database cursor and encoded at a time by the export
+PROJECT_EXPORT_CHUNK_SIZE = int(os.getenv('PROJECT_EXPORT_CHUNK_SIZE', 2000))
+
+# Project change log settings
+# Number of changes returned by /projects/changes/ by default and at most (page[size])
+PROJECT_CHANGES_PAGE_SIZE = int(os.getenv('PROJECT_CHANGES_PAGE_SIZE', 100))
+PROJECT_CHANGES_MAX_PAGE_SIZE = int(os.getenv('PROJECT_CHANGES_MAX_PAGE_SIZE', 1000))
+# Maximum number of committed changes numbered at once
+PROJECT_CHANGES_SEQUENCE_BATCH_SIZE = int(os.getenv('PROJECT_CHANGES_SEQUENCE_BATCH_SIZE', 1000))
+# Maximum number of changes counted at once in rating statistics
+PROJECT_STATS_BATCH_SIZE = int(os.getenv('PROJECT_STATS_BATCH_SIZE', 1000))
+# Seconds after which changes superseded by a later change of the same project are deleted
+PROJECT_CHANGES_COMPACT_AFTER = int(os.getenv('PROJECT_CHANGES_COMPACT_AFTER', 60 * 60))
+# Seconds deletions are kept for, clients syncing less often have to list projects again
+PROJECT_CHANGES_RETENTION = int(os.getenv('PROJECT_CHANGES_RETENTION', 30 * 24 * 60 * 60))
+
+# Number of owners and of best rated projects listed by /projects/stats/
+PROJECT_STATS_TOP_SIZE = int(os.getenv('PROJECT_STATS_TOP_SIZE', 10))
+
+# Maximum number of JSON:API atomic operations in one request to /projects/operations/
+PROJECT_OPERATIONS_MAX_SIZE = int(os.getenv('PROJECT_OPERATIONS_MAX_SIZE', 1000))
+
+# Webhooks delivery settings
+# Maximum number of concurrent outgoing requests while delivering one event
+WEBHOOK_DELIVERY_MAX_IN_FLIGHT = int(os.getenv('WEBHOOK_DELIVERY_MAX_IN_FLIGHT', 32))
+# Seconds to wait for a webhook receiver to accept the connection and to answer
+WEBHOOK_DELIVERY_CONNECT_TIMEOUT = float(os.getenv('WEBHOOK_DELIVERY_CONNECT_TIMEOUT', 3.05))
+WEBHOOK_DELIVERY_READ_TIMEOUT = float(os.getenv('WEBHOOK_DELIVERY_READ_TIMEOUT', 10))
+# Number of webhooks delivered by a single chunk task
+WEBHOOK_FANOUT_CHUNK_SIZE = int(os.getenv('WEBHOOK_FANOUT_CHUNK_SIZE', 500))
+# Seconds the encoded payload of an event is kept in cache for its deliveries and retries
+WEBHOOK_PAYLOAD_CACHE_TIMEOUT = int(os.getenv('WEBHOOK_PAYLOAD_CACHE_TIMEOUT', 24 * 60 * 60))
+# Number of attempts after which a failing delivery is dead-lettered
+WEBHOOK_DELIVERY_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_DELIVERY_MAX_ATTEMPTS', 8))
+# Exponential backoff of retries, in seconds
+WEBHOOK_RETRY_BASE_DELAY = int(os.getenv('WEBHOOK_RETRY_BASE_DELAY', 30))
+WEBHOOK_RETRY_MAX_DELAY = int(os.getenv('WEBHOOK_RETRY_MAX_DELAY', 6 * 60 * 60))
+# Maximum number of retries dispatched by one run of the retry task
+WEBHOOK_RETRY_BATCH_SIZE = int(os.getenv('WEBHOOK_RETRY_BATCH_SIZE', 5000))
+# Seconds a dispatched retry has to finish before it is dispatched again
+WEBHOOK_RETRY_LEASE = int(os.getenv('WEBHOOK_RETRY_LEASE', 10 * 60))
+# Seconds a claimed batch has to be delivered before another worker may claim its events again
+WEBHOOK_BATCH_LEASE = int(os.getenv('WEBHOOK_BATCH_LEASE', 60))
+# Circuit breaker of webhook destination hosts
+# Consecutive failures (errors, timeouts and 5xx answers) which open the circuit of a host
+WEBHOOK_BREAKER_FAILURE_THRESHOLD = int(os.getenv('WEBHOOK_BREAKER_FAILURE_THRESHOLD', 5))
+# Seconds after which failures are no longer considered consecutive
+WEBHOOK_BREAKER_FAILURES_TIMEOUT = int(os.getenv('WEBHOOK_BREAKER_FAILURES_TIMEOUT', 10 * 60))
+# Seconds the circuit stays open before a probe request is let through
+WEBHOOK_BREAKER_COOLDOWN = int(os.getenv('WEBHOOK_BREAKER_COOLDOWN', 60))
+# Seconds other deliveries wait for the probe request to finish
+WEBHOOK_BREAKER_PROBE_TIMEOUT = int(os.getenv('WEBHOOK_BREAKER_PROBE_TIMEOUT', 30))
+# Rate limits (requests per second, burst) and maximum concurrent requests per destination host,
+# enforced across all workers. Limits set on a Webhook take precedence, eg.
+# {'example.com': {'rate': 5, 'burst': 10, 'max_in_flight': 4}}
+WEBHOOK_HOST_LIMITS: dict[str, dict[str, float]] = {}
+# Seconds a delivery over the limits may wait in the worker, longer waits are deferred to a retry
+WEBHOOK_THROTTLE_MAX_WAIT = float(os.getenv('WEBHOOK_THROTTLE_MAX_WAIT', 1))
+# Seconds to wait for a free in-flight slot of a busy host
+WEBHOOK_THROTTLE_BUSY_DELAY = float(os.getenv('WEBHOOK_THROTTLE_BUSY_DELAY', 1))
+# Deferred deliveries are spread over this many seconds, so they do not come back at once
+WEBHOOK_DEFER_JITTER = float(os.getenv('WEBHOOK_DEFER_JITTER', 10))
+# Keep-alive connections kept open per destination host by each worker process
+WEBHOOK_HTTP_POOL_MAXSIZE = int(os.getenv('WEBHOOK_HTTP_POOL_MAXSIZE', 10))
+# Number of destination hosts with pooled connections kept by each worker process
+WEBHOOK_HTTP_POOL_MAX_HOSTS = int(os.getenv('WEBHOOK_HTTP_POOL_MAX_HOSTS', 256))
+# Seconds after which connections to an unused destination host are closed
+WEBHOOK_HTTP_POOL_IDLE_TIMEOUT = float(os.getenv('WEBHOOK_HTTP_POOL_IDLE_TIMEOUT', 300))
+
+# Maximum number of outbox events published at once
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv('OUTBOX_RELAY_BATCH_SIZE', 500))
+# Seconds dispatched and streamed outbox events are kept for
+OUTBOX_RETENTION = int(os.getenv('OUTBOX_RETENTION', 24 * 60 * 60))
+
+# Project stream (Server-Sent Events) settings
+# Approximate number of recent events kept in Redis for clients resuming with Last-Event-ID
+PROJECT_STREAM_MAXLEN = int(os.getenv('PROJECT_STREAM_MAXLEN', 10000))
+# Seconds between comments sent to idle clients, so proxies keep their connections open
+PROJECT_STREAM_HEARTBEAT = float(os.getenv('PROJECT_STREAM_HEARTBEAT', 15))
+# Events buffered per client, a client falling further behind is disconnected and resumes
+PROJECT_STREAM_QUEUE_SIZE = int(os.getenv('PROJECT_STREAM_QUEUE_SIZE', 100))
+
+# Celery beat schedule
+CELERYBEAT_SCHEDULE = {
+    'relay-outbox': {
+        'task': 'webhooks.tasks.relay_outbox',
+        'schedule': 1.0,
+    },
+    'stream-outbox': {
+        'task': 'webhooks.tasks.stream_outbox',
+        'schedule': 1.0,
+    },
+    'flush-due-webhook-batches': {
+        'task': 'webhooks.tasks.flush_due_webhook_batches',
+        'schedule': 1.0,
+    },
+    'prune-outbox': {
+        'task': 'webhooks.tasks.prune_outbox',
+        'schedule': 60.0 * 60,
+    },
+    'sequence-project-changes': {
+        'task': 'githubprojects.tasks.sequence_project_changes',
+        'schedule': 1.0,
+    },
+    'count-project-changes': {
+        'task': 'githubprojects.tasks.count_project_changes',
+        'schedule': 1.0,
+    },
+    'compact-project-changes': {
+        'task': 'githubprojects.tasks.compact_project_changes',
+        'schedule': 60.0 * 60,
+    },
+    'retry-due-webhook-deliveries': {
+        'task': 'webhooks.tasks.retry_due_webhook_deliveries',
+        'schedule': 10.0,
+    },
+}
+
 
 INSTANCE_MODE = os.getenv('INSTANCE_MODE', 'local')
 
 if INSTANCE_MODE == 'docker':
     # Configuration for running in docker container
-    DATABASES = {
+    DATABASES: dict[str, dict[str, Any]] = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',
             'NAME': os.environ.get('POSTGRES_NAME'),
@@ -163,6 +294,18 @@ if INSTANCE_MODE == 'docker':
             'PORT': 5432,
         }
     }
+    # Read replicas of the default database, eg. POSTGRES_REPLICA_HOSTS=db-replica-1,db-replica-2
+    for index, host in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+        DATABASES['replica{0}'.format(index)] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    # REDIS
+    REDIS_URL = 'redis://redis:6379/1'
+    # CACHE
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
     # CELERY
     BROKER_URL = 'redis://redis:6379'
     CELERY_RESULT_BACKEND = 'redis://redis:6379'
@@ -176,6 +319,21 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        # A second connection to the same file, exercises replica routing without replication
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+    # REDIS
+    REDIS_URL = 'redis://localhost:6379/1'
+    # CACHE
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
         }
     }
     # CELERY
@@ -185,3 +343,9 @@ else:
     CELERY_TASK_SERIALIZER = 'json'
     CELERY_RESULT_SERIALIZER = 'json'
     CELERY_TIMEZONE = 'Europe/Helsinki'
+
+# Database replicas, reads of safe API requests and of some tasks are sent to them
+DATABASE_ROUTERS = ['djangochallenge.routers.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+# Seconds a client is served by the primary database after a write, longer than the replication lag
+DATABASE_PRIMARY_PIN_SECONDS = float(os.getenv('DATABASE_PRIMARY_PIN_SECONDS', 5))
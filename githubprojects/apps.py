@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GithubprojectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'githubprojects'
+
+    def ready(self):
+        # Implicitly connect signal handlers decorated with @receiver.
+        from . import signals
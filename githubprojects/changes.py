@@ -0,0 +1,115 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+from githubprojects.models import PendingProjectChange, Project, ProjectChange, ProjectChangeFloor
+from typing import Iterable
+
+
+def record_changes(projects: Iterable[Project], action: str) -> list[PendingProjectChange]:
+    """
+    Write a change log entry per Project object, numbered by sequence() once committed
+
+    Must be called inside the transaction which changes the Project objects,
+    so the entries are committed or rolled back together with them.
+    """
+    return PendingProjectChange.objects.bulk_create([
+        PendingProjectChange(project_id=project.pk, action=action, version=project.version)
+        for project in projects
+    ])
+
+
+def sequence(batch_size: int) -> int:
+    """
+    Number committed pending changes after the latest change and move them to the change log
+
+    Only committed entries are read and numbering runs one at a time (the
+    floor row is locked), so sequence numbers follow commit order: a reader
+    which has seen a change never misses one numbered before it. Returns
+    the number of numbered changes.
+    """
+    numbered = 0
+    while True:
+        with transaction.atomic():
+            floor, _ = ProjectChangeFloor.objects.select_for_update().get_or_create(pk=1)
+            pending = list(PendingProjectChange.objects.order_by('id')[:batch_size])
+            if not pending:
+                break
+            head = max(ProjectChange.objects.aggregate(head=Max('seq'))['head'] or 0, floor.seq)
+            ProjectChange.objects.bulk_create([
+                ProjectChange(
+                    seq=head + index,
+                    project_id=change.project_id,
+                    action=change.action,
+                    version=change.version,
+                    created_at=change.created_at,
+                )
+                for index, change in enumerate(pending, 1)
+            ])
+            PendingProjectChange.objects.filter(id__in=[change.id for change in pending]).delete()
+        numbered += len(pending)
+        if len(pending) < batch_size:
+            break
+    return numbered
+
+
+def get_floor() -> int:
+    """
+    Return the highest sequence number of a pruned change, 0 when nothing was pruned
+    """
+    return ProjectChangeFloor.objects.values_list('seq', flat=True).first() or 0
+
+
+def get_head() -> int:
+    """
+    Return the sequence number of the latest change
+    """
+    return max(ProjectChange.objects.aggregate(head=Max('seq'))['head'] or 0, get_floor())
+
+
+def read_changes(since: int, limit: int) -> list[ProjectChange]:
+    """
+    Return up to limit changes after the since sequence number, in sequence order
+
+    Changes are numbered once committed, in commit order (see sequence()),
+    a change numbered later never gets a sequence number below one already read.
+    """
+    return list(ProjectChange.objects.filter(seq__gt=since).order_by('seq')[:limit])
+
+
+def compact(age: int) -> int:
+    """
+    Delete changes superseded by a later change of the same Project, both written more than age seconds ago
+
+    Clients reading the log only need the latest change of a Project. Recent
+    entries are kept, clients reading the log often see every change.
+    Returns the number of deleted changes.
+    """
+    cutoff = timezone.now() - timedelta(seconds=age)
+    superseded = ProjectChange.objects.filter(
+        project_id=OuterRef('project_id'), seq__gt=OuterRef('seq'), created_at__lt=cutoff,
+    )
+    deleted, _ = ProjectChange.objects.filter(created_at__lt=cutoff).filter(Exists(superseded)).delete()
+    return deleted
+
+
+def prune(retention: int) -> int:
+    """
+    Delete deletions written more than retention seconds ago and raise the floor to the latest of them
+
+    Clients which have not read the changes up to the floor would miss
+    deletions, they have to list projects again. Returns the number of
+    deleted changes.
+    """
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    with transaction.atomic():
+        floor, _ = ProjectChangeFloor.objects.select_for_update().get_or_create(pk=1)
+        pruned = ProjectChange.objects.filter(action=ProjectChange.Action.DELETED, created_at__lt=cutoff)
+        seq = pruned.aggregate(seq=Max('seq'))['seq']
+        if seq is None:
+            return 0
+        deleted, _ = pruned.delete()
+        if seq > floor.seq:
+            floor.seq = seq
+            floor.save(update_fields=['seq'])
+    return deleted
@@ -0,0 +1,189 @@
+from django.core.exceptions import ImproperlyConfigured
+from githubprojects.models import Project
+from githubprojects.serializers import ProjectSerializer
+from json.encoder import encode_basestring, encode_basestring_ascii  # type: ignore[attr-defined]
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_json_api.relations import ResourceRelatedField
+from rest_framework_json_api.settings import json_api_settings
+from rest_framework_json_api.utils import get_resource_type_from_model, get_resource_type_from_serializer
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional
+import json
+
+JSON_API_MEDIA_TYPE = 'application/vnd.api+json'
+
+# Serializer fields whose representation is the database value as a string
+PLAIN_FIELDS = (serializers.CharField, serializers.ReadOnlyField)
+
+# (field name, values() key, encoded attribute key, converter)
+AttributeType = tuple[str, str, str, Optional[Callable[[Any], Any]]]
+# (field name, values() key, encoded relationship key and resource identifier prefix, encoded null relationship)
+RelationshipType = tuple[str, str, str, str]
+# (attributes, relationships) columns of the fields a request renders
+FieldsetType = tuple[list[AttributeType], list[RelationshipType]]
+# A Project row fetched with values()
+RowType = dict[str, Any]
+
+
+class ProjectListEncoder:
+    """
+    Encode Project rows fetched with values() to the JSON:API list document
+
+    The output is byte for byte what ProjectSerializer and the JSON:API
+    renderer produce, without building serializer fields, ReturnDicts and
+    OrderedDicts per row. Columns, the encoded keys and the value
+    converters are resolved once from ProjectSerializer, the only field
+    machinery left per row is DecimalField.to_representation().
+
+    A fieldset is the (attributes, relationships) columns of the fields a
+    request renders, all of them unless it has a fields[Project] sparse
+    fieldset. Its values() keys are the only columns the request reads.
+    """
+
+    def __init__(self) -> None:
+        self.ensure_ascii = not api_settings.UNICODE_JSON
+        self.encode_string = encode_basestring_ascii if self.ensure_ascii else encode_basestring
+        resource_type = get_resource_type_from_serializer(ProjectSerializer)
+        self.resource_prefix = '{{"type":{0},"id":'.format(self.encode_string(resource_type))
+        self.fieldset_param = 'fields[{0}]'.format(resource_type)
+        self.attributes: list[AttributeType] = []
+        self.relationships: list[RelationshipType] = []
+        for name, field in ProjectSerializer().fields.items():
+            if name == 'id':
+                continue
+            column = field.source.replace('.', '__')
+            if isinstance(field, ResourceRelatedField):
+                key = self.encode_string(name)
+                related_type = get_resource_type_from_model(Project._meta.get_field(field.source).related_model)
+                self.relationships.append((
+                    name,
+                    column,
+                    '{0}:{{"data":{{"type":{1},"id":'.format(key, self.encode_string(related_type)),
+                    '{0}:{{"data":null}}'.format(key),
+                ))
+                continue
+            if isinstance(field, serializers.DecimalField):
+                converter = field.to_representation
+            elif isinstance(field, PLAIN_FIELDS):
+                converter = None
+            else:
+                raise ImproperlyConfigured('ProjectListEncoder cannot encode field {0}'.format(name))
+            self.attributes.append((name, column, self.encode_string(name) + ':', converter))
+
+    def accepts(self, request) -> bool:
+        """
+        Check whether the response to a request is a document this encoder reproduces
+        """
+        return (
+            api_settings.COMPACT_JSON
+            and not json_api_settings.FORMAT_FIELD_NAMES
+            # Media type parameters (eg. indent=4) change the output
+            and request.accepted_media_type == JSON_API_MEDIA_TYPE
+            and 'include' not in request.query_params
+        )
+
+    def get_fieldset(self, request) -> FieldsetType:
+        """
+        Return the attribute and relationship columns of the fields rendered for a request
+
+        Like SparseFieldsetsMixin, url is kept in every sparse fieldset.
+        """
+        fieldset = request.query_params.get(self.fieldset_param)
+        if fieldset is None:
+            return self.attributes, self.relationships
+        names = {*fieldset.split(','), api_settings.URL_FIELD_NAME}
+        return (
+            [column for column in self.attributes if column[0] in names],
+            [column for column in self.relationships if column[0] in names],
+        )
+
+    def get_values(self, fieldset: FieldsetType) -> list[str]:
+        """
+        Return the values() keys of a fieldset
+        """
+        attributes, relationships = fieldset
+        return ['id'] + [column[1] for column in attributes] + [column[1] for column in relationships]
+
+    def encode_resource(self, row: RowType, fieldset: FieldsetType) -> str:
+        attributes, relationships = fieldset
+        encoded = []
+        for _, column, key, converter in attributes:
+            value = row[column]
+            if converter is not None:
+                value = converter(value)
+            encoded.append(key + self.encode_string(value))
+        resource = '{0}{1},"attributes":{{{2}}}'.format(
+            self.resource_prefix,
+            self.encode_string(str(row['id'])),
+            ','.join(encoded),
+        )
+        if relationships:
+            resource += ',"relationships":{{{0}}}'.format(','.join(
+                null if row[column] is None else prefix + self.encode_string(str(row[column])) + '}}'
+                for _, column, prefix, null in relationships
+            ))
+        return resource + '}'
+
+    def encode(
+        self,
+        rows: Iterable[RowType],
+        fieldset: FieldsetType,
+        links: Optional[dict[str, Any]] = None,
+        meta: Optional[dict[str, Any]] = None,
+    ) -> bytes:
+        parts = []
+        if links:
+            parts.append('"links":' + self.dumps(links))
+        parts.append('"data":[' + ','.join(self.encode_resource(row, fieldset) for row in rows) + ']')
+        if meta:
+            parts.append('"meta":' + self.dumps(meta))
+        return self.finish('{' + ','.join(parts) + '}')
+
+    def stream(self, rows: Iterable[RowType], fieldset: FieldsetType, chunk_size: int) -> Iterator[bytes]:
+        """
+        Encode rows to a JSON:API document with a data array, chunk_size resources at a time
+        """
+        yield b'{"data":['
+        separator = ''
+        for chunk in _chunks(rows, chunk_size):
+            yield self.finish(separator + ','.join(self.encode_resource(row, fieldset) for row in chunk))
+            separator = ','
+        yield b']}'
+
+    def stream_lines(self, rows: Iterable[RowType], fieldset: FieldsetType, chunk_size: int) -> Iterator[bytes]:
+        """
+        Encode rows to NDJSON, one JSON:API resource object per line, chunk_size lines at a time
+        """
+        for chunk in _chunks(rows, chunk_size):
+            yield self.finish(''.join(self.encode_resource(row, fieldset) + '\n' for row in chunk))
+
+    def finish(self, text: str) -> bytes:
+        # Escaped like the DRF JSON renderer does, to keep the output a strict JavaScript subset
+        return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+    def dumps(self, data: dict[str, Any]) -> str:
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=self.ensure_ascii, separators=(',', ':'))
+
+
+class EncodedResponse(Response):
+    """
+    Response whose content has already been encoded, data is kept for inspection only
+    """
+
+    def __init__(self, content: bytes, data=None, **kwargs) -> None:
+        super().__init__(data, **kwargs)
+        self.encoded_content = content
+
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = JSON_API_MEDIA_TYPE
+        return self.encoded_content
+
+
+def _chunks(rows: Iterable[RowType], size: int) -> Iterator[list[RowType]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
@@ -0,0 +1,25 @@
+from django_filters import rest_framework as filters
+from githubprojects.models import Project
+
+
+class ProjectFilter(filters.FilterSet):
+    """
+    Filters of the project list, each one is backed by a (filtered field, id) index
+
+    filter[rating], filter[rating.gte], filter[rating.lte]... - Rating equality and ranges
+    filter[owner] - Username of the owner
+    filter[org] - GitHub user or organization, case insensitive
+    """
+
+    owner = filters.CharFilter(field_name='owner__username')
+    org = filters.CharFilter(method='filter_org')
+
+    class Meta:
+        model = Project
+        fields = {
+            'rating': ['exact', 'gt', 'gte', 'lt', 'lte'],
+        }
+
+    def filter_org(self, queryset, name, value):
+        # github_org is stored lowercased, an exact match keeps using its index
+        return queryset.filter(github_org=value.lower())
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from time import perf_counter
+import requests
+import threading
+
+
+class Command(BaseCommand):
+    help = 'Send concurrent GET requests to a running API server and print its throughput and latencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='eg. http://localhost:8000/projects/')
+        parser.add_argument('--requests', type=int, default=1000, help='Total number of requests')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of requests in flight')
+        parser.add_argument('--token', help='API token sent in the Authorization header')
+
+    def handle(self, *args, **options):
+        headers = {'Accept': 'application/vnd.api+json'}
+        if options['token']:
+            headers['Authorization'] = 'Token ' + options['token']
+        local = threading.local()
+
+        def send(_):
+            if not hasattr(local, 'session'):
+                # One keep-alive connection per client thread
+                local.session = requests.Session()
+            started = perf_counter()
+            try:
+                ok = local.session.get(options['url'], headers=headers, timeout=60).status_code < 400
+            except requests.RequestException:
+                ok = False
+            return perf_counter() - started, ok
+
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(send, range(options['requests'])))
+        elapsed = perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+
+        def percentile(fraction: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+        self.stdout.write(
+            'requests: {0}\nconcurrency: {1}\nerrors: {2}\nthroughput: {3:.1f} requests/s\n'
+            'latency p50: {4:.1f} ms\nlatency p95: {5:.1f} ms\nlatency p99: {6:.1f} ms'.format(
+                len(results), options['concurrency'], errors, len(results) / elapsed,
+                percentile(0.5), percentile(0.95), percentile(0.99),
+            )
+        )
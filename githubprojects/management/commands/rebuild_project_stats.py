@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from githubprojects.stats import check, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild project rating statistics and the leaderboard from the projects, then check them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report differences, do not rebuild')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            self.stdout.write('rebuilt statistics: {0}'.format(rebuild()))
+        differences = check(settings.PROJECT_STATS_BATCH_SIZE)
+        for difference in differences:
+            self.stdout.write(difference)
+        if differences:
+            raise CommandError('{0} differences found'.format(len(differences)))
+        self.stdout.write('statistics and leaderboard are consistent')
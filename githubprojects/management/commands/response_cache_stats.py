@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from djangochallenge.response_cache import response_cache_metrics
+
+
+class Command(BaseCommand):
+    help = 'Print response cache hits, misses and hit ratio of project endpoints'
+
+    def handle(self, *args, **options):
+        metrics = response_cache_metrics('projects')
+        lookups = metrics['hits'] + metrics['misses']
+        ratio = metrics['hits'] / lookups if lookups else 0
+        self.stdout.write('hits: {0}\nmisses: {1}\nhit ratio: {2:.2%}'.format(metrics['hits'], metrics['misses'], ratio))
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0007_delete_webhook'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0008_project_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['rating', 'id'], name='githubprojects_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['name', 'id'], name='githubprojects_name_idx'),
+        ),
+    ]
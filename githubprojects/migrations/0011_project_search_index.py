@@ -0,0 +1,88 @@
+from django.db import migrations
+
+POSTGRESQL_SEARCH_INDEX_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # Generated column, Postgres keeps it up to date on every insert and update
+    """
+    ALTER TABLE githubprojects_project ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX githubprojects_search_idx ON githubprojects_project USING GIN (search_vector)',
+    'CREATE INDEX githubprojects_name_trgm_idx ON githubprojects_project USING GIN (name gin_trgm_ops)',
+]
+
+POSTGRESQL_DROP_SEARCH_INDEX_SQL = [
+    'DROP INDEX IF EXISTS githubprojects_name_trgm_idx',
+    'DROP INDEX IF EXISTS githubprojects_search_idx',
+    'ALTER TABLE githubprojects_project DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_SEARCH_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS githubprojects_project_fts USING fts5(
+        name, description,
+        content='githubprojects_project', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    # Triggers keeping the external content FTS5 table in sync with the project table
+    """
+    CREATE TRIGGER IF NOT EXISTS githubprojects_project_fts_insert AFTER INSERT ON githubprojects_project BEGIN
+        INSERT INTO githubprojects_project_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS githubprojects_project_fts_delete AFTER DELETE ON githubprojects_project BEGIN
+        INSERT INTO githubprojects_project_fts (githubprojects_project_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS githubprojects_project_fts_update AFTER UPDATE OF name, description ON githubprojects_project BEGIN
+        INSERT INTO githubprojects_project_fts (githubprojects_project_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO githubprojects_project_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO githubprojects_project_fts (githubprojects_project_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SEARCH_INDEX_SQL = [
+    'DROP TRIGGER IF EXISTS githubprojects_project_fts_insert',
+    'DROP TRIGGER IF EXISTS githubprojects_project_fts_delete',
+    'DROP TRIGGER IF EXISTS githubprojects_project_fts_update',
+    'DROP TABLE IF EXISTS githubprojects_project_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_SEARCH_INDEX_SQL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_SEARCH_INDEX_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_DROP_SEARCH_INDEX_SQL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_DROP_SEARCH_INDEX_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0010_project_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:44
+
+from django.db import migrations, models
+from urllib.parse import urlsplit
+
+
+def fill_github_org(apps, schema_editor):
+    Project = apps.get_model('githubprojects', 'Project')
+    batch = []
+    for project in Project.objects.only('id', 'url').iterator(chunk_size=2000):
+        project.github_org = urlsplit(project.url).path.strip('/').split('/')[0].lower()
+        batch.append(project)
+        if len(batch) == 2000:
+            Project.objects.bulk_update(batch, ['github_org'])
+            batch = []
+    Project.objects.bulk_update(batch, ['github_org'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0011_project_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='github_org',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='GitHub organization'),
+        ),
+        migrations.RunPython(fill_github_org, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['owner', 'id'], name='githubprojects_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['github_org', 'id'], name='githubprojects_org_idx'),
+        ),
+    ]
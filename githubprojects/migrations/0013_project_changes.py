@@ -0,0 +1,43 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0012_project_github_org'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Sequence number')),
+                ('project_id', models.BigIntegerField(verbose_name='Project id')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7, verbose_name='Action')),
+                ('version', models.PositiveIntegerField(verbose_name='Version')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Created at')),
+            ],
+            options={
+                'verbose_name': 'Project change',
+                'verbose_name_plural': 'Project changes',
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectChangeFloor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(default=0, verbose_name='Sequence number')),
+            ],
+            options={
+                'verbose_name': 'Project change floor',
+                'verbose_name_plural': 'Project change floor',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='projectchange',
+            index=models.Index(fields=['project_id', 'seq'], name='githubprojects_change_idx'),
+        ),
+    ]
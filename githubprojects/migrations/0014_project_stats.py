@@ -0,0 +1,34 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('githubprojects', '0013_project_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=30, unique=True, verbose_name='Key')),
+                ('project_count', models.IntegerField(default=0, verbose_name='Project count')),
+                ('rating_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Rating total')),
+                ('owner', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='project_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Project statistics',
+                'verbose_name_plural': 'Project statistics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='projectstats',
+            index=models.Index(fields=['project_count', 'key'], name='githubprojects_stats_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0014_project_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingProjectChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.BigIntegerField(verbose_name='Project id')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7, verbose_name='Action')),
+                ('version', models.PositiveIntegerField(verbose_name='Version')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+            ],
+            options={
+                'verbose_name': 'Pending project change',
+                'verbose_name_plural': 'Pending project changes',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='projectchange',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Created at'),
+        ),
+        migrations.AlterField(
+            model_name='projectchange',
+            name='seq',
+            field=models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Sequence number'),
+        ),
+    ]
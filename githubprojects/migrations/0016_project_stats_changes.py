@@ -0,0 +1,55 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:58
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def count_projects(apps, schema_editor):
+    # Statistics already count every project, changes from now on are counted from the change log
+    Project = apps.get_model('githubprojects', 'Project')
+    CountedProject = apps.get_model('githubprojects', 'CountedProject')
+    ProjectChange = apps.get_model('githubprojects', 'ProjectChange')
+    ProjectChangeFloor = apps.get_model('githubprojects', 'ProjectChangeFloor')
+    ProjectStatsCursor = apps.get_model('githubprojects', 'ProjectStatsCursor')
+    projects = Project.objects.values_list('id', 'owner_id', 'rating').iterator(chunk_size=1000)
+    CountedProject.objects.bulk_create(
+        (CountedProject(project_id=pk, owner_id=owner_id, rating=rating) for pk, owner_id, rating in projects),
+        batch_size=1000,
+    )
+    head = ProjectChange.objects.aggregate(head=Max('seq'))['head'] or 0
+    floor = ProjectChangeFloor.objects.values_list('seq', flat=True).first() or 0
+    ProjectStatsCursor.objects.create(pk=1, seq=max(head, floor))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0015_pending_project_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountedProject',
+            fields=[
+                ('project_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Project id')),
+                ('owner_id', models.BigIntegerField(verbose_name='Owner id')),
+                ('rating', models.DecimalField(decimal_places=2, max_digits=3, verbose_name='Rating')),
+            ],
+            options={
+                'verbose_name': 'Counted project',
+                'verbose_name_plural': 'Counted projects',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectStatsCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(default=0, verbose_name='Sequence number')),
+            ],
+            options={
+                'verbose_name': 'Project statistics cursor',
+                'verbose_name_plural': 'Project statistics cursor',
+            },
+        ),
+        migrations.RunPython(count_projects, migrations.RunPython.noop),
+    ]
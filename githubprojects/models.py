@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MaxValueValidator, MinValueValidator, DecimalValidator, RegexValidator
+from typing import Any
+from urllib.parse import urlsplit
 
 
 class GithubURLValidator(RegexValidator):
@@ -8,6 +11,27 @@ class GithubURLValidator(RegexValidator):
     message = u'URL must be a valid link to a Project on GitHub.'
 
 
+def next_version(instance: Any) -> int:
+    """
+    Return the version an object is saved with, one more than the version of its row
+
+    The row is locked until the transaction ends, so concurrent saves get
+    distinct versions whatever version their instances were loaded with.
+    Must be called inside the transaction which saves the object.
+    """
+    version = type(instance)._default_manager.select_for_update().filter(pk=instance.pk).values_list(
+        'version', flat=True,
+    ).first()
+    return (instance.version if version is None else version) + 1
+
+
+def github_org(url: str) -> str:
+    """
+    Return the lowercased GitHub user or organization of a project URL, eg. https://github.com/<org>/<repo>
+    """
+    return urlsplit(url).path.strip('/').split('/')[0].lower()
+
+
 class Project(models.Model):
     """
     The Project object
@@ -20,6 +44,10 @@ class Project(models.Model):
     rating - Is a decimal between 1 and 5 with maximum 2 decimal places
     owner - Is not blank
 
+    version - Is increased on every save, it identifies a particular state of the object
+    updated_at - Is set on every save
+    github_org - Is set from url on every save, the lowercased GitHub user or organization of the project
+
     ModelSerializer class will handle the validation automatically
     """
 
@@ -31,11 +59,207 @@ class Project(models.Model):
             MaxValueValidator(5),
         ])
     owner = models.ForeignKey('auth.User', related_name='projects', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(_('Version'), default=1, editable=False)
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+    # As long as url, GithubURLValidator does not limit the length of the organization
+    github_org = models.CharField(_('GitHub organization'), max_length=200, default='', editable=False)
     
     class Meta:
         verbose_name = _('Project')
         verbose_name_plural = _('Projects')
         ordering = ['-id']
+        indexes = [
+            # Keyset pagination seeks on (sort field, id), filters on (filtered field, id)
+            # keep the default newest first order an index scan as well
+            models.Index(fields=['rating', 'id'], name='githubprojects_rating_idx'),
+            models.Index(fields=['name', 'id'], name='githubprojects_name_idx'),
+            models.Index(fields=['owner', 'id'], name='githubprojects_owner_idx'),
+            models.Index(fields=['github_org', 'id'], name='githubprojects_org_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.github_org = github_org(self.url)
+        if not self._state.adding and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at', 'github_org'}
+        # post_save receivers write their records (eg. outbox events) in the same transaction
+        with transaction.atomic():
+            if not self._state.adding:
+                self.version = next_version(self)
+            super().save(*args, **kwargs)
+
+
+def project_stats_keys(owner_id: int) -> list[str]:
+    """
+    Return the keys of the ProjectStats objects a Project object of an owner is counted in
+    """
+    return ['*', 'owner:{0}'.format(owner_id)]
+
+
+class ProjectStats(models.Model):
+    """
+    The ProjectStats object
+
+    Rating statistics of all projects (key *) or of the projects of an owner (key owner:<id>),
+    updated from the change log shortly after every change of a Project, see githubprojects.stats:
+
+    key - Which projects are counted
+    owner - The owner of the counted projects, empty for all projects
+    project_count - Number of projects
+    rating_total - Sum of the ratings of the projects
+    """
+
+    key = models.CharField(_('Key'), max_length=30, unique=True)
+    owner = models.OneToOneField(
+        'auth.User', related_name='project_stats', on_delete=models.CASCADE, null=True, blank=True,
+    )
+    project_count = models.IntegerField(_('Project count'), default=0)
+    rating_total = models.DecimalField(_('Rating total'), max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _('Project statistics')
+        verbose_name_plural = _('Project statistics')
+        indexes = [
+            # Owners with the most projects first
+            models.Index(fields=['project_count', 'key'], name='githubprojects_stats_idx'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def average_rating(self):
+        return self.rating_total / self.project_count if self.project_count else None
+
+
+class CountedProject(models.Model):
+    """
+    The CountedProject object
+
+    Owner and rating a Project is counted with in ProjectStats, changes of the
+    Project are counted as the difference to them:
+
+    project_id - The id of the counted Project
+    owner_id - The id of its owner
+    rating - Its rating
+    """
+
+    project_id = models.BigIntegerField(_('Project id'), primary_key=True)
+    owner_id = models.BigIntegerField(_('Owner id'))
+    rating = models.DecimalField(_('Rating'), max_digits=3, decimal_places=2)
+
+    class Meta:
+        verbose_name = _('Counted project')
+        verbose_name_plural = _('Counted projects')
+
+    def __str__(self):
+        return str(self.project_id)
+
+
+class ProjectStatsCursor(models.Model):
+    """
+    The ProjectStatsCursor object
+
+    Single row holding the sequence number of the latest change counted in
+    ProjectStats, locked while changes are counted or statistics rebuilt:
+
+    seq - Changes after it are not counted yet
+    """
+
+    seq = models.BigIntegerField(_('Sequence number'), default=0)
+
+    class Meta:
+        verbose_name = _('Project statistics cursor')
+        verbose_name_plural = _('Project statistics cursor')
+
+    def __str__(self):
+        return str(self.seq)
+
+
+class ProjectChange(models.Model):
+    """
+    The ProjectChange object
+
+    Entry of the project change log, numbered in commit order once the change is committed:
+
+    seq - Sequence number, increases with every change
+    project_id - The id of the changed Project, kept once the Project is deleted
+    action - What happened, created, updated or deleted
+    version - The version of the Project after the change
+    created_at - When the change was written
+
+    Entries superseded by a later change of the same Project are compacted
+    and deleted entries are pruned after a while, see githubprojects.changes.
+    """
+
+    class Action(models.TextChoices):
+        CREATED = 'created', _('Created')
+        UPDATED = 'updated', _('Updated')
+        DELETED = 'deleted', _('Deleted')
+
+    seq = models.BigIntegerField(_('Sequence number'), primary_key=True)
+    project_id = models.BigIntegerField(_('Project id'))
+    action = models.CharField(_('Action'), max_length=7, choices=Action.choices)
+    version = models.PositiveIntegerField(_('Version'))
+    created_at = models.DateTimeField(_('Created at'), default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = _('Project change')
+        verbose_name_plural = _('Project changes')
+        ordering = ['seq']
+        indexes = [
+            # Compaction looks for the latest change of every project
+            models.Index(fields=['project_id', 'seq'], name='githubprojects_change_idx'),
+        ]
+
+    def __str__(self):
+        return '{0} {1} #{2}'.format(self.action, self.project_id, self.seq)
+
+
+class PendingProjectChange(models.Model):
+    """
+    The PendingProjectChange object
+
+    Entry of the project change log written in the same database transaction
+    as the change, moved to ProjectChange with its sequence number once committed:
+
+    project_id - The id of the changed Project
+    action - What happened, created, updated or deleted
+    version - The version of the Project after the change
+    created_at - When the change was written
+    """
+
+    project_id = models.BigIntegerField(_('Project id'))
+    action = models.CharField(_('Action'), max_length=7, choices=ProjectChange.Action.choices)
+    version = models.PositiveIntegerField(_('Version'))
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Pending project change')
+        verbose_name_plural = _('Pending project changes')
+        ordering = ['id']
+
+    def __str__(self):
+        return '{0} {1}'.format(self.action, self.project_id)
+
+
+class ProjectChangeFloor(models.Model):
+    """
+    The ProjectChangeFloor object
+
+    Single row holding the highest sequence number of a pruned change, locked
+    while changes are numbered or pruned:
+
+    seq - Clients which have not read the changes up to it have to list projects again
+    """
+
+    seq = models.BigIntegerField(_('Sequence number'), default=0)
+
+    class Meta:
+        verbose_name = _('Project change floor')
+        verbose_name_plural = _('Project change floor')
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return str(self.seq)
@@ -0,0 +1,241 @@
+from django.conf import settings
+from django.utils import timezone
+from githubprojects.models import Project, github_org
+from githubprojects.permissions import IsOwnerOrReadOnly
+from githubprojects.serializers import ProjectSerializer
+from githubprojects.signals import projects_bulk_saved
+from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework_json_api.renderers import JSONRenderer
+from rest_framework_json_api.utils import get_resource_type_from_serializer, get_serializer_fields
+from typing import Any, Optional
+
+ATOMIC_MEDIA_TYPE = 'application/vnd.api+json; ext="https://jsonapi.org/ext/atomic"'
+
+# Fields bulk_update() writes besides the updated attributes, Project.save() maintains them
+MAINTAINED_FIELDS = {'version', 'updated_at', 'github_org'}
+
+
+class AtomicOperationsParser(JSONParser):
+    """
+    Parse JSON:API Atomic Operations extension documents, {"atomic:operations": [...]}
+    """
+    media_type = ATOMIC_MEDIA_TYPE
+
+
+class ProjectOperations:
+    """
+    A batch of JSON:API atomic operations (add, update and remove) on projects
+
+    Every operation is validated with ProjectSerializer before anything is
+    written, a single invalid operation rejects the whole batch. Projects
+    are then written with one bulk_create(), one bulk_update() and one
+    delete query whatever the number of operations, which must run in a
+    transaction. bulk_create() and bulk_update() do not call Project.save()
+    nor send post_save, the fields save() maintains are set here and
+    projects_bulk_saved is sent once per kind of write instead.
+
+    Operations cannot refer to projects added in the same batch (lid).
+    """
+
+    resource_type = get_resource_type_from_serializer(ProjectSerializer)
+
+    def __init__(self, document, context: dict[str, Any]) -> None:
+        self.document = document
+        self.context = context
+        self.request = context['request']
+        self.errors: list[dict[str, Any]] = []
+
+    def apply(self) -> Optional[list[dict[str, Any]]]:
+        """
+        Validate and write the operations, return their results or None when there are errors
+        """
+        operations = self.get_operations()
+        if operations is None:
+            return None
+        pks = {ref for op, ref, _ in operations if ref is not None}
+        # Locked until the transaction ends, so projects cannot change between validation and write
+        instances = Project.objects.select_related('owner').select_for_update(of=('self',)).in_bulk(pks)
+        now = timezone.now()
+
+        created: list[Project] = []
+        updated: dict[int, Project] = {}
+        updated_fields: set[str] = set()
+        removed: set[int] = set()
+        results: list[Optional[Project]] = []
+        for index, (op, pk, attributes) in enumerate(operations):
+            pointer = '/atomic:operations/{0}'.format(index)
+            if op == 'add':
+                serializer = ProjectSerializer(data=attributes, context=self.context)
+                if not self.is_valid(serializer, pointer):
+                    continue
+                project = Project(**serializer.validated_data, owner=self.request.user)
+                project.github_org = github_org(project.url)
+                created.append(project)
+                results.append(project)
+                continue
+
+            if pk is None or pk not in instances or pk in removed:
+                self.add_error(status.HTTP_404_NOT_FOUND, 'not_found', 'Not found.', pointer + '/ref')
+                continue
+            project = instances[pk]
+            if not IsOwnerOrReadOnly().has_object_permission(self.request, self.context['view'], project):
+                self.add_error(
+                    status.HTTP_403_FORBIDDEN, 'permission_denied',
+                    'You do not have permission to perform this action.', pointer,
+                )
+                continue
+            if op == 'remove':
+                removed.add(pk)
+                updated.pop(pk, None)
+                # Earlier updates of the project are superseded, their resource no longer exists
+                results = [None if result is project else result for result in results]
+                results.append(None)
+                continue
+            serializer = ProjectSerializer(project, data=attributes, partial=True, context=self.context)
+            if not self.is_valid(serializer, pointer):
+                continue
+            for attr, value in serializer.validated_data.items():
+                setattr(project, attr, value)
+            updated_fields.update(serializer.validated_data)
+            project.github_org = github_org(project.url)
+            project.version += 1
+            project.updated_at = now
+            updated[pk] = project
+            results.append(project)
+
+        if self.errors:
+            return None
+        if created:
+            Project.objects.bulk_create(created)
+            projects_bulk_saved.send(sender=Project, instances=created, created=True)
+        if updated:
+            Project.objects.bulk_update(updated.values(), sorted(updated_fields | MAINTAINED_FIELDS))
+            projects_bulk_saved.send(sender=Project, instances=list(updated.values()), created=False)
+        if removed:
+            Project.objects.filter(pk__in=removed).delete()
+        return self.get_results(results)
+
+    def get_operations(self) -> Optional[list[tuple[str, Optional[int], dict[str, Any]]]]:
+        """
+        Return (op, project id or None for add, attributes) of every operation of the document
+        """
+        operations = self.document.get('atomic:operations') if isinstance(self.document, dict) else None
+        if not isinstance(operations, list) or not operations:
+            self.add_error(
+                status.HTTP_400_BAD_REQUEST, 'invalid',
+                'atomic:operations must be a non-empty array of operations.', '/atomic:operations',
+            )
+            return None
+        if len(operations) > settings.PROJECT_OPERATIONS_MAX_SIZE:
+            self.add_error(
+                status.HTTP_400_BAD_REQUEST, 'too_many_operations',
+                'A request may contain at most {0} operations.'.format(settings.PROJECT_OPERATIONS_MAX_SIZE),
+                '/atomic:operations',
+            )
+            return None
+
+        parsed: list[tuple[str, Optional[int], dict[str, Any]]] = []
+        for index, operation in enumerate(operations):
+            pointer = '/atomic:operations/{0}'.format(index)
+            if not isinstance(operation, dict) or operation.get('op') not in ('add', 'update', 'remove'):
+                self.add_error(status.HTTP_400_BAD_REQUEST, 'invalid', 'op must be add, update or remove.', pointer)
+                continue
+            op = operation['op']
+            data: Any = operation.get('data')
+            ref: Any = operation.get('ref')
+            if op != 'remove' and not isinstance(data, dict):
+                self.add_error(status.HTTP_400_BAD_REQUEST, 'invalid', 'data must be a resource object.', pointer)
+                continue
+            if op == 'remove' and not isinstance(ref, dict):
+                self.add_error(status.HTTP_400_BAD_REQUEST, 'invalid', 'ref must identify a resource.', pointer)
+                continue
+            if ref is not None and (not isinstance(ref, dict) or 'relationship' in ref or op == 'add'):
+                self.add_error(
+                    status.HTTP_400_BAD_REQUEST, 'invalid', 'ref must identify the updated or removed resource.',
+                    pointer + '/ref',
+                )
+                continue
+
+            pk = None
+            if op != 'add':
+                pk = self.get_pk(ref if op == 'remove' else data, pointer + ('/ref' if op == 'remove' else '/data'))
+                if pk is None:
+                    continue
+                if op == 'update' and ref is not None and self.get_pk(ref, pointer + '/ref') != pk:
+                    self.add_error(
+                        status.HTTP_409_CONFLICT, 'conflict', 'ref and data identify different resources.',
+                        pointer + '/ref',
+                    )
+                    continue
+            elif data.get('type') != self.resource_type:
+                self.add_type_error(pointer + '/data/type')
+                continue
+
+            attributes = data.get('attributes', {}) if data is not None else {}
+            if not isinstance(attributes, dict):
+                self.add_error(
+                    status.HTTP_400_BAD_REQUEST, 'invalid', 'attributes must be an object.',
+                    pointer + '/data/attributes',
+                )
+                continue
+            parsed.append((op, pk, attributes))
+        return None if self.errors else parsed
+
+    def get_pk(self, identifier: dict[str, Any], pointer: str) -> Optional[int]:
+        if identifier.get('type') != self.resource_type:
+            self.add_type_error(pointer + '/type')
+            return None
+        try:
+            return int(identifier['id'])
+        except (KeyError, TypeError, ValueError):
+            self.add_error(status.HTTP_400_BAD_REQUEST, 'invalid', 'id must be a project id.', pointer + '/id')
+            return None
+
+    def is_valid(self, serializer: ProjectSerializer, pointer: str) -> bool:
+        if serializer.is_valid():
+            return True
+        for field, details in serializer.errors.items():
+            if field == api_settings.NON_FIELD_ERRORS_KEY:
+                field_pointer = pointer + '/data'
+            else:
+                field_pointer = '{0}/data/attributes/{1}'.format(pointer, field)
+            for detail in details:
+                self.add_error(status.HTTP_400_BAD_REQUEST, detail.code, str(detail), field_pointer)
+        return False
+
+    def add_type_error(self, pointer: str) -> None:
+        self.add_error(
+            status.HTTP_409_CONFLICT, 'conflict', 'type must be {0}.'.format(self.resource_type), pointer,
+        )
+
+    def add_error(self, status_code: int, code: str, detail: str, pointer: str) -> None:
+        self.errors.append({
+            'detail': detail,
+            'status': str(status_code),
+            'source': {'pointer': pointer},
+            'code': code,
+        })
+
+    def get_status_code(self) -> int:
+        """
+        Return the status code of the errors, 400 Bad Request if they differ
+        """
+        codes = {error['status'] for error in self.errors}
+        return int(codes.pop()) if len(codes) == 1 else status.HTTP_400_BAD_REQUEST
+
+    def get_results(self, projects: list[Optional[Project]]) -> list[dict[str, Any]]:
+        """
+        Return the atomic:results of the operations, the written resource objects (none for remove)
+        """
+        written = list({id(project): project for project in projects if project is not None}.values())
+        serializer = ProjectSerializer(written, many=True, context=self.context)
+        fields = get_serializer_fields(serializer)
+        resources = {
+            id(project): JSONRenderer.build_json_resource_obj(
+                fields, resource, project, self.resource_type, serializer.child,
+            )
+            for project, resource in zip(written, serializer.data)
+        }
+        return [{'data': resources[id(project)]} if project is not None else {} for project in projects]
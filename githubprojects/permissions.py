@@ -6,10 +6,11 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     Custom permission to only allow owners of an object to edit it.
     """
 
-    def has_object_permission(self, request, view, obj):
+    def has_object_permission(self, request, view, obj) -> bool:
         # Read permissions are allowed to any request
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        # Write permissions are only allowed to the owner of the object
-        return obj.owner == request.user
\ No newline at end of file
+        # Write permissions are only allowed to the owner of the object,
+        # compared by id so neither user is loaded
+        return obj.owner_id == request.user.id
\ No newline at end of file
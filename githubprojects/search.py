@@ -0,0 +1,117 @@
+from django.db import connections
+from django.db.models import BooleanField, FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+from githubprojects.models import Project
+from rest_framework.filters import SearchFilter
+from rest_framework_json_api.filters import OrderingFilter
+from typing import Optional
+
+# Text search configuration of the Postgres search_vector column, see migration 0011
+SEARCH_CONFIG = 'english'
+
+PROJECT_TABLE = 'githubprojects_project'
+SQLITE_FTS_TABLE = 'githubprojects_project_fts'
+
+# Triggers keeping the external content FTS5 table in sync with the project table, created by migration 0011
+SQLITE_SEARCH_TRIGGERS_SQL = {
+    'githubprojects_project_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS githubprojects_project_fts_insert AFTER INSERT ON githubprojects_project BEGIN
+            INSERT INTO githubprojects_project_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """,
+    'githubprojects_project_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS githubprojects_project_fts_delete AFTER DELETE ON githubprojects_project BEGIN
+            INSERT INTO githubprojects_project_fts (githubprojects_project_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    'githubprojects_project_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS githubprojects_project_fts_update AFTER UPDATE OF name, description ON githubprojects_project BEGIN
+            INSERT INTO githubprojects_project_fts (githubprojects_project_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO githubprojects_project_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+
+def ensure_sqlite_search_triggers(connection) -> None:
+    """
+    Recreate missing SQLite search triggers and reindex if any was missing
+
+    SQLite migrations which alter the project table rebuild it and drop its
+    triggers, so this runs after every migrate as well.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        if SQLITE_FTS_TABLE not in existing:
+            return
+        missing = [trigger for trigger in SQLITE_SEARCH_TRIGGERS_SQL if trigger not in existing]
+        for trigger in missing:
+            cursor.execute(SQLITE_SEARCH_TRIGGERS_SQL[trigger])
+        if missing:
+            cursor.execute("INSERT INTO {0} ({0}) VALUES ('rebuild')".format(SQLITE_FTS_TABLE))
+
+
+def search_projects(queryset: 'QuerySet[Project]', terms: list[str]) -> Optional['QuerySet[Project]']:
+    """
+    Filter a Project queryset by full-text search terms and annotate it with search_rank
+
+    A higher search_rank is a better match, name matches weigh more than
+    description ones. Returns None if the database has no full-text index.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        text = ' '.join(terms)
+        tsquery = 'websearch_to_tsquery(%s, %s)'
+        return queryset.filter(RawSQL(
+            # The trigram operator also matches misspelled names
+            '({0}.search_vector @@ {1} OR {0}.name %% %s)'.format(PROJECT_TABLE, tsquery),
+            (SEARCH_CONFIG, text, text),
+            output_field=BooleanField(),
+        )).annotate(search_rank=RawSQL(
+            # Both are real, cursors compare the rank as the double it is read as
+            'CAST(ts_rank({0}.search_vector, {1}) + similarity({0}.name, %s) AS double precision)'.format(
+                PROJECT_TABLE, tsquery,
+            ),
+            (SEARCH_CONFIG, text, text),
+            output_field=FloatField(),
+        ))
+    if vendor == 'sqlite':
+        # Every term is quoted, FTS5 query syntax in user input is matched literally
+        match = ' '.join('"{0}"*'.format(term.replace('"', '""')) for term in terms)
+        return queryset.filter(RawSQL(
+            '{0}.id IN (SELECT rowid FROM {1} WHERE {1} MATCH %s)'.format(PROJECT_TABLE, SQLITE_FTS_TABLE),
+            (match,),
+            output_field=BooleanField(),
+        )).annotate(search_rank=RawSQL(
+            '(SELECT -bm25({1}, 10.0, 1.0) FROM {1} WHERE {1} MATCH %s AND rowid = {0}.id)'.format(
+                PROJECT_TABLE, SQLITE_FTS_TABLE,
+            ),
+            (match,),
+            output_field=FloatField(),
+        ))
+    return None
+
+
+class ProjectSearchFilter(SearchFilter):
+    """
+    filter[search] backed by the full-text index of projects
+
+    Postgres uses the GIN indexed search_vector column and a trigram index
+    on name, SQLite an FTS5 table, both are maintained by the database on
+    every save. Results are ranked by relevance unless sort is given.
+    Other databases fall back to SearchFilter over view.search_fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        results = search_projects(queryset, terms)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        if not request.query_params.get(OrderingFilter.ordering_param):
+            results = results.order_by('-search_rank', '-id')
+        return results
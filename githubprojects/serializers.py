@@ -1,10 +1,31 @@
+from django.contrib.auth.models import User
 from rest_framework_json_api import serializers
-from githubprojects.models import Project
+from githubprojects.models import Project, ProjectChange
+
+
+class UserSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ['id', 'username']
 
 
 class ProjectSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
+    # The owner as a relationship, owner is an attribute already
+    user = serializers.ResourceRelatedField(source='owner', read_only=True)
+
+    included_serializers = {
+        'user': UserSerializer,
+    }
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'description', 'url', 'rating', 'owner']
\ No newline at end of file
+        fields = ['id', 'name', 'description', 'url', 'rating', 'owner', 'user']
+
+
+class ProjectChangeSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ProjectChange
+        fields = ['seq', 'project_id', 'action', 'version', 'created_at']
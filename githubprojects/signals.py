@@ -0,0 +1,114 @@
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from djangochallenge.authentication import invalidate_tokens
+from djangochallenge.response_cache import bump_generation
+from githubprojects.changes import record_changes
+from githubprojects.models import Project, ProjectChange
+from githubprojects.search import ensure_sqlite_search_triggers
+from rest_framework.authtoken.models import Token
+
+# Sent with instances (a list of Project objects) and created after projects are
+# written with bulk_create() or bulk_update(), which do not send post_save
+projects_bulk_saved = Signal()
+
+
+@receiver(post_save, sender=Project)
+@receiver(projects_bulk_saved, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_project_responses(sender, **kwargs) -> None:
+    """
+    Invalidate cached project responses when a Project object or an owner (their username) changes
+    """
+    # Bumped once committed, otherwise a concurrent request could cache the
+    # previous state of the objects under the new generation
+    transaction.on_commit(lambda: bump_generation('projects'))
+
+
+@receiver(post_save, sender=Project)
+def record_project_change(sender, instance: Project, created: bool, **kwargs) -> None:
+    """
+    Write a created or updated change of a Project object to the change log
+    """
+    record_changes([instance], ProjectChange.Action.CREATED if created else ProjectChange.Action.UPDATED)
+
+
+@receiver(projects_bulk_saved, sender=Project)
+def record_bulk_project_changes(sender, instances: list[Project], created: bool, **kwargs) -> None:
+    """
+    Write the changes of Project objects saved in bulk to the change log
+    """
+    record_changes(instances, ProjectChange.Action.CREATED if created else ProjectChange.Action.UPDATED)
+
+
+@receiver(post_delete, sender=Project)
+def record_project_deletion(sender, instance: Project, **kwargs) -> None:
+    """
+    Write a deleted change of a Project object to the change log
+    """
+    record_changes([instance], ProjectChange.Action.DELETED)
+
+
+@receiver(pre_save, sender=User)
+def remember_owner_username(sender, instance: User, **kwargs) -> None:
+    """
+    Remember the username a saved User object replaces, see touch_renamed_owner_projects()
+    """
+    if instance._state.adding or kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    instance.__dict__['_previous_username'] = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def touch_renamed_owner_projects(sender, instance: User, **kwargs) -> None:
+    """
+    Increase the version of the Project objects of a renamed owner
+
+    Project documents render the owner username, their ETag, Last-Modified,
+    webhook payloads and change log entries follow the Project version.
+    """
+    previous = instance.__dict__.pop('_previous_username', None)
+    if previous is None or previous == instance.username:
+        return
+    projects = Project.objects.filter(owner_id=instance.pk)
+    projects.update(version=F('version') + 1, updated_at=timezone.now())
+    record_changes(projects.only('id', 'version'), ProjectChange.Action.UPDATED)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance: User, **kwargs) -> None:
+    """
+    Invalidate cached token users when a User object changes, eg. is deactivated
+    """
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        # Logins do not change cached fields
+        return
+    keys = list(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    if keys:
+        # Invalidated once committed, otherwise a concurrent request could cache the previous state
+        transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance: Token, **kwargs) -> None:
+    """
+    Invalidate the cached user of a deleted token, tokens of deleted users are deleted too
+    """
+    # The key is the primary key, delete() clears it from the instance
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens([key]))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, **kwargs) -> None:
+    """
+    Restore SQLite full-text search triggers dropped by migrations which rebuilt the project table
+    """
+    connection = connections[kwargs.get('using', 'default')]
+    if sender.name == 'githubprojects' and connection.vendor == 'sqlite':
+        ensure_sqlite_search_triggers(connection)
@@ -0,0 +1,245 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, QuerySet, Sum
+from djangochallenge.redis_client import get_redis
+from githubprojects.changes import get_floor, get_head, sequence
+from githubprojects.models import CountedProject, Project, ProjectChange, ProjectStats, ProjectStatsCursor
+from githubprojects.models import project_stats_keys
+from typing import Any, Optional, Union
+
+# Sorted set of project ids scored by rating
+LEADERBOARD_KEY = 'projects:leaderboard'
+
+# (project count, rating total) differences by ProjectStats key, and the owner id of the key
+DeltasType = dict[str, tuple[Optional[int], int, Decimal]]
+
+
+def add_delta(deltas: DeltasType, owner_id: int, count: int, rating: Decimal) -> None:
+    for key in project_stats_keys(owner_id):
+        _, previous_count, previous_rating = deltas.get(key, (None, 0, Decimal(0)))
+        deltas[key] = None if key == '*' else owner_id, previous_count + count, previous_rating + rating
+
+
+def apply_deltas(deltas: DeltasType) -> None:
+    """
+    Add (project count, rating total) differences to ProjectStats objects, creating the missing ones
+    """
+    for key, (owner_id, count, rating) in deltas.items():
+        if not count and not rating:
+            continue
+        stats = ProjectStats.objects.filter(key=key)
+        if stats.update(project_count=F('project_count') + count, rating_total=F('rating_total') + rating):
+            continue
+        if count <= 0:
+            # Nothing to remove from, eg. the owner is being deleted with their statistics
+            continue
+        ProjectStats.objects.bulk_create([ProjectStats(key=key, owner_id=owner_id)], ignore_conflicts=True)
+        stats.update(project_count=F('project_count') + count, rating_total=F('rating_total') + rating)
+
+
+def count_changes(batch_size: int) -> int:
+    """
+    Count the project changes written since the last run in the statistics and the leaderboard
+
+    Changed projects are counted with their current owner and rating, as the
+    difference to the CountedProject they were counted with, so counting is
+    idempotent and compacted changes are not missed. Runs one at a time (the
+    cursor is locked) apart from the transactions changing projects, which
+    never wait on statistics rows. Statistics are rebuilt when deletions
+    the cursor had not reached were pruned. Returns the number of counted changes.
+    """
+    counted = 0
+    while True:
+        with transaction.atomic():
+            cursor, _ = ProjectStatsCursor.objects.select_for_update().get_or_create(pk=1)
+            batch = count_batch(cursor, batch_size)
+        counted += batch
+        if batch < batch_size:
+            break
+    return counted
+
+
+def count_batch(cursor: ProjectStatsCursor, batch_size: int) -> int:
+    """
+    Count at most batch_size changes after the locked cursor and move it past them
+
+    Returns the number of counted changes.
+    """
+    if cursor.seq < get_floor():
+        rebuild_locked(cursor)
+    changes = list(
+        ProjectChange.objects.filter(seq__gt=cursor.seq).order_by('seq')
+        .values_list('seq', 'project_id')[:batch_size]
+    )
+    if not changes:
+        return 0
+    count_projects({project_id for _, project_id in changes})
+    cursor.seq = changes[-1][0]
+    cursor.save(update_fields=['seq'])
+    return len(changes)
+
+
+def count_projects(project_ids: set[int]) -> None:
+    # Fields with a default are typed as nullable, ratings are never NULL
+    current: dict[int, tuple[int, Decimal]] = {
+        pk: (owner_id, rating)  # type: ignore[misc]
+        for pk, owner_id, rating in Project.objects.filter(id__in=project_ids).values_list('id', 'owner_id', 'rating')
+    }
+    counted = {project.project_id: project for project in CountedProject.objects.filter(project_id__in=project_ids)}
+    deltas: DeltasType = {}
+    created: list[CountedProject] = []
+    updated: list[CountedProject] = []
+    removed: list[int] = []
+    scores: dict[Union[str, bytes], float] = {}
+    for pk in project_ids:
+        previous = counted.get(pk)
+        state = current.get(pk)
+        if previous is not None and (previous.owner_id, previous.rating) == state:
+            continue
+        if previous is not None:
+            add_delta(deltas, previous.owner_id, -1, -previous.rating)
+        if state is None:
+            removed.append(pk)
+            continue
+        owner_id, rating = state
+        add_delta(deltas, owner_id, 1, rating)
+        scores[str(pk)] = float(rating)
+        if previous is None:
+            created.append(CountedProject(project_id=pk, owner_id=owner_id, rating=rating))
+        else:
+            previous.owner_id, previous.rating = state
+            updated.append(previous)
+    apply_deltas(deltas)
+    CountedProject.objects.bulk_create(created)
+    CountedProject.objects.bulk_update(updated, ['owner_id', 'rating'])
+    CountedProject.objects.filter(project_id__in=removed).delete()
+    # Written while the cursor is locked, so leaderboard updates are applied in counting order.
+    # They hold current ratings, written again after a rolled back run they are still right.
+    pipeline = get_redis().pipeline()
+    if scores:
+        pipeline.zadd(LEADERBOARD_KEY, scores)
+    if removed:
+        pipeline.zrem(LEADERBOARD_KEY, *removed)
+    pipeline.execute()
+
+
+def top_rated(limit: int) -> list[tuple[int, float]]:
+    """
+    Return the (id, rating) of the limit best rated projects
+    """
+    members: list[tuple[bytes, float]] = get_redis().zrevrange(LEADERBOARD_KEY, 0, limit - 1, withscores=True)
+    return [(int(member), score) for member, score in members]
+
+
+def compute_stats(projects: 'QuerySet[Any]') -> dict[str, tuple[Optional[int], int, Decimal]]:
+    """
+    Return the (owner id, project count, rating total) of every ProjectStats key, aggregated from projects
+
+    projects are Project or CountedProject objects.
+    """
+    rows = projects.order_by().values('owner_id').annotate(count=Count('pk'), total=Sum('rating'))
+    stats: dict[str, tuple[Optional[int], int, Decimal]] = {}
+    for row in rows:
+        stats['owner:{0}'.format(row['owner_id'])] = (row['owner_id'], row['count'], row['total'])
+    stats['*'] = (
+        None,
+        sum(count for _, count, _ in stats.values()),
+        sum((total for _, _, total in stats.values()), Decimal(0)),
+    )
+    return stats
+
+
+def rebuild() -> int:
+    """
+    Recompute the statistics and the leaderboard from the projects
+
+    Returns the number of ProjectStats objects.
+    """
+    with transaction.atomic():
+        cursor, _ = ProjectStatsCursor.objects.select_for_update().get_or_create(pk=1)
+        return rebuild_locked(cursor)
+
+
+def rebuild_locked(cursor: ProjectStatsCursor) -> int:
+    # Read first, changes after it are committed after the projects are read and counted by count_changes()
+    head = get_head()
+    CountedProject.objects.all().delete()
+    projects = Project.objects.values_list('id', 'owner_id', 'rating').iterator(chunk_size=1000)
+    CountedProject.objects.bulk_create(
+        (
+            CountedProject(project_id=pk, owner_id=owner_id, rating=rating)  # type: ignore[misc]
+            for pk, owner_id, rating in projects
+        ),
+        batch_size=1000,
+    )
+    # Aggregated from the counted projects, the statistics match them whatever changed meanwhile
+    stats = compute_stats(CountedProject.objects.all())
+    ProjectStats.objects.exclude(key__in=stats).delete()
+    ProjectStats.objects.bulk_create(
+        [ProjectStats(key=key, owner_id=owner_id) for key, (owner_id, _, _) in stats.items()],
+        ignore_conflicts=True,
+    )
+    objects = list(ProjectStats.objects.all())
+    for stats_object in objects:
+        _, stats_object.project_count, stats_object.rating_total = stats[stats_object.key]
+    ProjectStats.objects.bulk_update(objects, ['project_count', 'rating_total'], batch_size=1000)
+    rebuild_leaderboard(dict(CountedProject.objects.values_list('project_id', 'rating').iterator()))
+    cursor.seq = head
+    cursor.save(update_fields=['seq'])
+    return len(objects)
+
+
+def rebuild_leaderboard(scores: dict[int, Decimal]) -> None:
+    # Written to a new key then renamed, readers never see a partial leaderboard
+    client = get_redis()
+    pipeline = client.pipeline()
+    pipeline.delete(LEADERBOARD_KEY + ':rebuild')
+    items = list(scores.items())
+    for index in range(0, len(items), 1000):
+        chunk = items[index:index + 1000]
+        pipeline.zadd(LEADERBOARD_KEY + ':rebuild', {str(pk): float(rating) for pk, rating in chunk})
+    if items:
+        pipeline.rename(LEADERBOARD_KEY + ':rebuild', LEADERBOARD_KEY)
+    else:
+        pipeline.delete(LEADERBOARD_KEY)
+    pipeline.execute()
+
+
+def check(batch_size: int) -> list[str]:
+    """
+    Return the differences between the statistics and leaderboard and the projects, empty when they match
+
+    Pending changes are numbered and counted first, batch_size at a time,
+    and the comparison runs under the same lock of the cursor, so changes
+    committed before the check are never reported as differences.
+    """
+    sequence(batch_size)
+    with transaction.atomic():
+        cursor, _ = ProjectStatsCursor.objects.select_for_update().get_or_create(pk=1)
+        while count_batch(cursor, batch_size) == batch_size:
+            pass
+        return compare()
+
+
+def compare() -> list[str]:
+    expected = compute_stats(Project.objects.all())
+    differences = []
+    stored = {stats.key: stats for stats in ProjectStats.objects.all()}
+    for key in sorted(expected.keys() | stored.keys()):
+        _, count, total = expected.get(key, (None, 0, Decimal(0)))
+        stats = stored.get(key)
+        stored_count, stored_total = (stats.project_count, stats.rating_total) if stats else (0, Decimal(0))
+        if (stored_count, stored_total) != (count, total):
+            differences.append('{0}: {1} projects rated {2} in total, expected {3} rated {4}'.format(
+                key, stored_count, stored_total, count, total,
+            ))
+    scores = {int(member): score for member, score in get_redis().zscan_iter(LEADERBOARD_KEY, score_cast_func=float)}
+    ratings: dict[int, Decimal] = dict(Project.objects.values_list('id', 'rating').iterator())  # type: ignore[arg-type]
+    for pk in sorted(scores.keys() | ratings.keys()):
+        if pk not in ratings:
+            differences.append('leaderboard: project {0} does not exist'.format(pk))
+        elif pk not in scores:
+            differences.append('leaderboard: project {0} is missing'.format(pk))
+        elif scores[pk] != float(ratings[pk]):
+            differences.append('leaderboard: project {0} is scored {1}, rated {2}'.format(pk, scores[pk], ratings[pk]))
+    return differences
@@ -0,0 +1,34 @@
+from celery import shared_task
+from django.conf import settings
+from githubprojects.changes import compact, prune, sequence
+from githubprojects.stats import count_changes
+
+
+@shared_task
+def sequence_project_changes() -> int:
+    """
+    Number committed project changes, runs periodically
+
+    Returns the number of numbered changes.
+    """
+    return sequence(settings.PROJECT_CHANGES_SEQUENCE_BATCH_SIZE)
+
+
+@shared_task
+def count_project_changes() -> int:
+    """
+    Count numbered project changes in rating statistics and the leaderboard, runs periodically
+
+    Returns the number of counted changes.
+    """
+    return count_changes(settings.PROJECT_STATS_BATCH_SIZE)
+
+
+@shared_task
+def compact_project_changes() -> int:
+    """
+    Compact superseded project changes and prune old deletions, runs periodically
+
+    Returns the number of deleted changes.
+    """
+    return compact(settings.PROJECT_CHANGES_COMPACT_AFTER) + prune(settings.PROJECT_CHANGES_RETENTION)
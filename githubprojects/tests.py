@@ -1,10 +1,42 @@
 from django.urls import reverse
+from asgiref.sync import sync_to_async
+from djangochallenge.asgi import application
+from asgiref.testing import ApplicationCommunicator
 from django.contrib.auth.models import User
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 from rest_framework.authtoken.models import Token
-from githubprojects.models import Project
+from githubprojects.models import PendingProjectChange, Project, ProjectChange, ProjectStats
+from githubprojects.tasks import compact_project_changes, count_project_changes, sequence_project_changes
+from githubprojects.stats import LEADERBOARD_KEY, check as check_stats
+from djangochallenge.redis_client import get_redis
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+from githubprojects.operations import ATOMIC_MEDIA_TYPE
+from githubprojects.views import ProjectList
+from webhooks.batching import buffer_event
+from webhooks.models import OutboxEvent, Webhook
+from django.core.cache import cache
+from djangochallenge.response_cache import bump_generation, generation_key, response_cache_metrics
+from githubprojects.search import ensure_sqlite_search_triggers
+from django.db import connection, connections, router, transaction
+from djangochallenge.authentication import invalidate_tokens
+from djangochallenge.routers import PrimaryPinningMiddleware, primary_pin_key, read_from
+from django.http import HttpResponse
+from rest_framework.authentication import TokenAuthentication
+from django.utils import timezone
+from datetime import timedelta
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+import asyncio
+import json
+import threading
+import time
 
 
 class ProjectTests(APITestCase):
@@ -12,6 +44,7 @@ class ProjectTests(APITestCase):
     Project tests
     """
     def setUp(self):
+        cache.clear()
         user = User.objects.create_user(
             username='testuser', 
             password='12345',
@@ -348,4 +381,1330 @@ class ProjectTests(APITestCase):
         url = reverse('project-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_project_version_is_increased_on_save(self):
+        """
+        Ensure every save of a Project object produces a new version
+        """
+        self.assertEqual(self.first_project.version, 1)
+        self.first_project.name = 'Project Number One'
+        self.first_project.save()
+        self.first_project.rating = Decimal('4.98')
+        self.first_project.save(update_fields=['rating'])
+        self.first_project.refresh_from_db()
+        self.assertEqual(self.first_project.version, 3)
+        # Instances loaded with the same version are saved with distinct versions
+        stale = Project.objects.get(id=self.first_project.id)
+        self.first_project.save()
+        stale.save()
+        self.assertEqual((self.first_project.version, stale.version), (4, 5))
+        self.assertEqual(Project.objects.get(id=stale.id).version, 5)
+
+
+class ProjectCursorPaginationTests(APITestCase):
+    """
+    Project list keyset pagination tests
+    """
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(
+            username='testuser',
+            password='12345',
+        )
+        self.projects = [
+            Project.objects.create(
+                name='Project {0:02d}'.format(index),
+                url='https://github.com/fedorkosilov/literate-parakeet',
+                # Many projects share a rating, the id breaks ties
+                rating=Decimal(1 + index % 4),
+                owner=user,
+            )
+            for index in range(23)
+        ]
+
+    def walk(self, url, link):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(int(item['id']) for item in response.json()['data'])
+            pages += 1
+            url = response.json()['links'][link]
+        return ids, pages, response
+
+    def test_projects_are_paginated_with_cursors(self):
+        """
+        Ensure next links walk all projects once in the default order without counting them
+        """
+        ids, pages, response = self.walk(reverse('project-list') + '?page[cursor]=&page[size]=5', 'next')
+        self.assertEqual(ids, sorted((project.id for project in self.projects), reverse=True))
+        self.assertEqual(pages, 5)
+        self.assertNotIn('last', response.json()['links'])
+        self.assertNotIn('count', response.json()['meta']['pagination'])
+
+    def test_cursors_follow_sort_parameter(self):
+        """
+        Ensure cursors seek on the sort fields and id, forwards and backwards
+        """
+        expected = [
+            project.id
+            for project in sorted(self.projects, key=lambda project: (-project.rating, -project.id))
+        ]
+        ids, pages, response = self.walk(reverse('project-list') + '?sort=-rating&page[cursor]=&page[size]=4', 'next')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 6)
+
+        # Walking back from the last page visits the previous pages in reverse
+        ids, pages, response = self.walk(response.json()['links']['prev'], 'prev')
+        pages_ids = [expected[index:index + 4] for index in range(0, 20, 4)]
+        self.assertEqual(ids, [item for page in reversed(pages_ids) for item in page])
+
+    def test_page_number_pagination_is_still_supported(self):
+        """
+        Ensure requests without a cursor are paginated by page number
+        """
+        response = self.client.get(reverse('project-list') + '?page[number]=3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['meta']['pagination']['count'], 23)
+        self.assertEqual(len(response.json()['data']), 3)
+
+    def test_invalid_cursor_is_rejected(self):
+        """
+        Ensure a tampered cursor results in 404 Not Found
+        """
+        response = self.client.get(reverse('project-list') + '?page[cursor]=bm9wZQ==')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProjectResponseCacheTests(APITestCase):
+    """
+    Project response cache tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='12345',
+        )
+        user_token = Token.objects.create(user=self.user)
+        self.auth_header = 'Token ' + user_token.key
+        self.project = Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user,
+        )
+
+    def test_responses_are_cached_per_query(self):
+        """
+        Ensure repeated requests are served from the cache, whatever the order of query parameters
+        """
+        url = reverse('project-list')
+        response = self.client.get(url + '?sort=-rating&page[size]=5')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        cached = self.client.get(url + '?page[size]=5&sort=-rating')
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], response['Content-Type'])
+        self.assertEqual(self.client.get(url + '?sort=name')['X-Cache'], 'MISS')
+        self.assertEqual(response_cache_metrics('projects'), {'hits': 1, 'misses': 2})
+
+    def test_responses_are_cached_per_host(self):
+        """
+        Ensure a response holding absolute links is not served to another host or port
+        """
+        url = reverse('project-list')
+        response = self.client.get(url, HTTP_HOST='localhost:8000')
+        self.assertIn('http://localhost:8000/', response.json()['links']['first'])
+        response = self.client.get(url, HTTP_HOST='localhost:8001')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('http://localhost:8001/', response.json()['links']['first'])
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost:8001')['X-Cache'], 'HIT')
+
+    def test_evicted_generations_are_not_reused(self):
+        """
+        Ensure ETags of earlier generations do not match once the generation counter was evicted
+        """
+        url = reverse('project-list')
+        etag = self.client.get(url)['ETag']
+        bump_generation('projects')
+        cache.delete(generation_key('projects'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_invalidate_cached_responses(self):
+        """
+        Ensure saving or deleting a Project object invalidates cached list and detail responses
+        """
+        list_url = reverse('project-list')
+        detail_url = reverse('project-detail', args=[self.project.id])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        data = {'data': {'type': 'Project', 'id': self.project.id, 'attributes': {'name': 'Project Number One'}}}
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url, data)
+        response = self.client.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['data']['attributes']['name'], 'Project Number One')
+        response = self.client.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['data'][0]['attributes']['name'], 'Project Number One')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(detail_url)
+        response = self.client.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['data'], [])
+
+    def test_views_can_opt_out(self):
+        """
+        Ensure views with response_cache_enabled = False are never cached
+        """
+        url = reverse('project-list')
+        with patch.object(ProjectList, 'response_cache_enabled', False):
+            self.client.get(url)
+            response = self.client.get(url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response_cache_metrics('projects'), {'hits': 0, 'misses': 0})
+
+
+class ProjectConditionalRequestTests(APITestCase):
+    """
+    Project conditional request tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='12345',
+        )
+        user_token = Token.objects.create(user=self.user)
+        self.auth_header = 'Token ' + user_token.key
+        self.project = Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user,
+        )
+        self.url = reverse('project-detail', args=[self.project.id])
+
+    def patch_name(self, name, **headers):
+        data = {'data': {'type': 'Project', 'id': self.project.id, 'attributes': {'name': name}}}
+        return self.client.patch(self.url, data, **headers)
+
+    @patch('githubprojects.views.ProjectSerializer')
+    def test_unchanged_project_is_not_modified(self, serializer):
+        """
+        Ensure If-None-Match and If-Modified-Since return 304 without serializing the Project object
+        """
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], '"1"')
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        serializer.assert_not_called()
+
+    def test_changed_project_is_returned(self):
+        """
+        Ensure a stale ETag gets the current representation and validators
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
+        response = self.patch_name('Project Number One')
+        self.assertEqual(response['ETag'], '"2"')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2"')
+
+    def test_writes_with_stale_if_match_fail(self):
+        """
+        Ensure If-Match gives optimistic concurrency to PATCH and DELETE
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
+        response = self.patch_name('Project Number One', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.patch_name('Project Number Two', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.name, 'Project Number One')
+
+        response = self.client.delete(self.url, HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(self.url, HTTP_IF_MATCH='"2"')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_unchanged_project_list_is_not_modified(self):
+        """
+        Ensure the list ETag changes when a Project object is created, changed or deleted
+        """
+        url = reverse('project-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(self.client.get(url + '?sort=name')['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'Project Number One'
+            self.project.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'renameduser'
+            self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_renamed_owner_changes_project_validators(self):
+        """
+        Ensure the version of a Project object, its ETag, is increased when its owner is renamed
+        """
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'renameduser'
+            self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2"')
+        self.assertEqual(response.json()['data']['attributes']['owner'], 'renameduser')
+        self.assertTrue(PendingProjectChange.objects.filter(project_id=self.project.id, version=2).exists())
+
+        # Other saves of the owner leave the Project object alone
+        self.user.first_name = 'Test'
+        self.user.save()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.version, 2)
+
+
+@patch.object(ProjectList, 'response_cache_enabled', False)
+class ProjectListFastPathTests(APITestCase):
+    """
+    Project list fast read path tests
+    """
+    def setUp(self):
+        owners = [
+            User.objects.create_user(username='testuser', password='12345'),
+            User.objects.create_user(username='tëst "user" ', password='12345'),
+        ]
+        descriptions = ['', 'Some basic description', 'Ünïcödé \\ "quoted" \u2028\u2029 \t tab', '<script>']
+        for index in range(7):
+            Project.objects.create(
+                name='Project {0}'.format(index),
+                description=descriptions[index % len(descriptions)],
+                url='https://github.com/fedorkosilov/literate-parakeet-{0}'.format(index),
+                rating=Decimal('1.5') + index % 3,
+                owner=owners[index % 2],
+            )
+
+    def get(self, url, fast_path_enabled):
+        with patch.object(ProjectList, 'fast_path_enabled', fast_path_enabled):
+            return self.client.get(url)
+
+    def test_fast_path_output_is_identical_to_serializer_output(self):
+        """
+        Ensure the fast path renders byte for byte what ProjectSerializer and the JSON:API renderer do
+        """
+        queries = [
+            '',
+            '?page[number]=2&page[size]=3',
+            '?sort=-rating,name',
+            '?filter[owner]=testuser&filter[rating.gte]=2',
+            '?filter[search]=Project',
+            '?page[cursor]=&page[size]=2&sort=rating',
+            '?page[cursor]=&page[size]=1&filter[search]=basic',
+            '?fields[Project]=name,rating',
+            '?fields[Project]=name,user&page[cursor]=&page[size]=2&sort=-rating',
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                url = reverse('project-list') + query
+                slow = self.get(url, False)
+                fast = self.get(url, True)
+                self.assertEqual(slow.status_code, status.HTTP_200_OK)
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+
+                # Following the cursor links gives identical pages too
+                if 'cursor' in query:
+                    next_url = fast.json()['links']['next']
+                    self.assertEqual(self.get(next_url, True).content, self.get(next_url, False).content)
+
+    @patch('githubprojects.views.ProjectSerializer')
+    def test_fast_path_does_not_use_serializer(self, serializer):
+        """
+        Ensure the fast path reads rows with a single query without the serializer
+        """
+        with self.assertNumQueries(2):
+            # COUNT(*) of page number pagination and the page itself
+            response = self.client.get(reverse('project-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        serializer.assert_not_called()
+
+    def test_browsable_api_uses_serializer(self):
+        """
+        Ensure other formats and sparse fieldsets take the regular path
+        """
+        response = self.client.get(reverse('project-list') + '?fields[Project]=name')
+        self.assertNotIn('description', response.json()['data'][0]['attributes'])
+        response = self.client.get(reverse('project-list'), HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+
+@patch.object(ProjectList, 'response_cache_enabled', False)
+class ProjectSearchTests(APITestCase):
+    """
+    Project full-text search tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='12345',
+        )
+        self.parakeet = self.create_project('Literate Parakeet', 'A simple django project')
+        self.django = self.create_project('Django', 'The web framework for perfectionists with deadlines')
+        self.rest = self.create_project('Django REST framework', 'Web APIs for Django')
+        self.unrelated = self.create_project('Unrelated', 'Nothing to see here')
+
+    def create_project(self, name, description):
+        return Project.objects.create(
+            name=name,
+            description=description,
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user,
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('project-list') + '?filter[search]=' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [int(item['id']) for item in response.json()['data']]
+
+    def test_results_are_ranked(self):
+        """
+        Ensure matches are ranked, name matches before description matches
+        """
+        ids = self.search('django')
+        self.assertEqual(ids[-1], self.parakeet.id)
+        self.assertEqual(set(ids), {self.django.id, self.rest.id, self.parakeet.id})
+        self.assertEqual(self.search('framework web'), [self.rest.id, self.django.id])
+        # Prefixes and stemming match as well
+        self.assertEqual(self.search('perfectionist'), [self.django.id])
+        self.assertEqual(self.search('parake'), [self.parakeet.id])
+
+    def test_query_syntax_is_matched_literally(self):
+        """
+        Ensure search terms cannot inject full-text query syntax
+        """
+        self.assertEqual(self.search('"django" OR'), [])
+        self.assertEqual(self.search('NEAR(django'), [])
+
+    def test_sort_overrides_rank(self):
+        """
+        Ensure an explicit sort parameter takes precedence over the rank
+        """
+        response = self.client.get(reverse('project-list') + '?filter[search]=django&sort=name')
+        self.assertEqual(
+            [int(item['id']) for item in response.json()['data']],
+            [self.django.id, self.rest.id, self.parakeet.id],
+        )
+
+    def test_index_is_maintained_on_save_and_delete(self):
+        """
+        Ensure the search index follows changes of Project objects
+        """
+        self.unrelated.name = 'Flask'
+        self.unrelated.save()
+        self.assertEqual(self.search('flask'), [self.unrelated.id])
+        self.assertEqual(self.search('unrelated'), [])
+        self.unrelated.delete()
+        self.assertEqual(self.search('flask'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite full-text index')
+    def test_dropped_sqlite_triggers_are_restored(self):
+        """
+        Ensure triggers dropped by a rebuild of the project table are restored and the index rebuilt
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER githubprojects_project_fts_insert')
+        flask = self.create_project('Flask', '')
+        self.assertEqual(self.search('flask'), [])
+        ensure_sqlite_search_triggers(connection)
+        self.assertEqual(self.search('flask'), [flask.id])
+        bottle = self.create_project('Bottle', '')
+        self.assertEqual(self.search('bottle'), [bottle.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Postgres search rank')
+    def test_tied_ranks_are_paginated_with_cursors(self):
+        """
+        Ensure cursors positioned on tied search ranks walk every match once in rank order
+        """
+        forks = [self.create_project('Django fork', 'A fork of Django') for index in range(5)]
+        ids = []
+        url = reverse('project-list') + '?filter[search]=django&page[cursor]=&page[size]=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(int(item['id']) for item in response.json()['data'])
+            url = response.json()['links']['next']
+        self.assertEqual(ids, self.search('django'))
+        self.assertEqual(len(ids), 3 + len(forks))
+
+
+@patch.object(ProjectList, 'response_cache_enabled', False)
+class ProjectFilterTests(APITestCase):
+    """
+    Project list filter tests
+    """
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='testuser1', password='12345')
+        self.user2 = User.objects.create_user(username='testuser2', password='12345')
+        self.low = Project.objects.create(
+            name='Low', url='https://github.com/Django/low', rating=Decimal('1.5'), owner=self.user1,
+        )
+        self.mid = Project.objects.create(
+            name='Mid', url='https://github.com/encode/mid', rating=Decimal('3'), owner=self.user2,
+        )
+        self.high = Project.objects.create(
+            name='High', url='https://github.com/django/high', rating=Decimal('4.5'), owner=self.user2,
+        )
+
+    def filter(self, query):
+        response = self.client.get(reverse('project-list') + '?' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [int(item['id']) for item in response.json()['data']]
+
+    def test_projects_can_be_filtered(self):
+        """
+        Ensure rating ranges, owner and GitHub organization filters can be combined
+        """
+        self.assertEqual(self.filter('filter[rating.gte]=3'), [self.high.id, self.mid.id])
+        self.assertEqual(self.filter('filter[rating.lt]=3'), [self.low.id])
+        self.assertEqual(self.filter('filter[rating]=3'), [self.mid.id])
+        self.assertEqual(self.filter('filter[owner]=testuser2'), [self.high.id, self.mid.id])
+        self.assertEqual(self.filter('filter[org]=DJANGO'), [self.high.id, self.low.id])
+        self.assertEqual(self.filter('filter[org]=django&filter[rating.gte]=2&filter[owner]=testuser2'), [self.high.id])
+
+    def test_github_org_follows_url(self):
+        """
+        Ensure the stored GitHub organization is updated with the URL
+        """
+        self.assertEqual(self.low.github_org, 'django')
+        self.low.url = 'https://github.com/encode/low'
+        self.low.save(update_fields=['url'])
+        self.low.refresh_from_db()
+        self.assertEqual(self.low.github_org, 'encode')
+        # Any URL GithubURLValidator accepts fits, SQLite does not enforce max_length
+        org = 'o' * 150
+        self.low.url = 'https://github.com/{0}/low'.format(org)
+        self.low.full_clean()
+        self.low.save()
+        self.assertLessEqual(len(self.low.url), Project._meta.get_field('github_org').max_length)
+        self.assertEqual(Project.objects.get(id=self.low.id).github_org, org)
+
+    def test_unsupported_filters_and_sorts_are_rejected(self):
+        """
+        Ensure filters and sorts without an index are refused with 400 Bad Request
+        """
+        for query in ['filter[description]=x', 'filter[url.icontains]=django', 'sort=description', 'sort=owner.username']:
+            with self.subTest(query=query):
+                response = self.client.get(reverse('project-list') + '?' + query)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Postgres query plans')
+    def test_filters_and_sorts_do_not_scan_project_table(self):
+        """
+        Ensure every supported filter and sort is served by an index, not a sequential scan
+        """
+        queries = [
+            'filter[rating]=3',
+            'filter[rating.gte]=3',
+            'filter[rating.lt]=3',
+            'filter[owner]=testuser2',
+            'filter[org]=django',
+            'filter[org]=django&filter[rating.gte]=2',
+            'sort=rating',
+            'sort=-name',
+        ]
+        with connection.cursor() as cursor:
+            # The planner would rather scan a table this small, only index access paths are considered
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for query in queries:
+            with self.subTest(query=query):
+                view = ProjectList()
+                view.request = view.initialize_request(APIRequestFactory().get('/projects/?' + query))
+                view.format_kwarg = None
+                view.kwargs = {}
+                plan = view.filter_queryset(view.get_queryset())[:10].explain()
+                self.assertNotIn('Seq Scan on githubprojects_project', plan)
+
+
+@patch.object(ProjectList, 'response_cache_enabled', False)
+class ProjectExportTests(APITestCase):
+    """
+    Project export tests
+    """
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='12345')
+        for index in range(5):
+            Project.objects.create(
+                name='Project {0}'.format(index),
+                description='Ünïcödé   description' if index % 2 else 'Some basic description',
+                url='https://github.com/fedorkosilov/literate-parakeet-{0}'.format(index),
+                rating=Decimal('1.5') + index,
+                owner=user,
+            )
+
+    def export(self, query='', url=None, **extra):
+        response = self.client.get((url or reverse('project-export')) + query, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    @override_settings(PROJECT_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_json_api_document(self):
+        """
+        Ensure the export is the project list data as one JSON:API document, read with a single query
+        """
+        with self.assertNumQueries(1):
+            response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/vnd.api+json')
+        listed = self.client.get(reverse('project-list') + '?page[size]=10').json()['data']
+        self.assertEqual(json.loads(content), {'data': listed})
+
+    @override_settings(PROJECT_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_ndjson(self):
+        """
+        Ensure NDJSON exports have one resource object per line and apply the list filters
+        """
+        response, content = self.export('?filter[rating.gte]=3', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = content.decode().split('\n')
+        self.assertEqual(lines.pop(), '')
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['attributes']['name'] for row in rows], ['Project 4', 'Project 3', 'Project 2'])
+
+        url = reverse('project-export', kwargs={'format': 'ndjson'})
+        _, content = self.export('?sort=name&fields[Project]=name', url=url)
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(set(json.loads(lines[0])['attributes']), {'name', 'url'})
+
+    def test_export_rejects_invalid_filters(self):
+        """
+        Ensure invalid filters are reported before anything is streamed
+        """
+        url = reverse('project-export') + '?filter[description]=x'
+        response = self.client.get(url, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.streaming)
+        self.assertEqual(json.loads(response.content)[0]['status'], '400')
+
+
+class ProjectOperationTests(APITestCase):
+    """
+    Project bulk atomic operations tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.other_user = User.objects.create_user(username='otheruser', password='12345')
+        self.auth_header = 'Token ' + Token.objects.create(user=self.user).key
+        self.project = Project.objects.create(
+            name='Project One', url='https://github.com/fedorkosilov/one', rating=Decimal('2'), owner=self.user,
+        )
+        self.other_project = Project.objects.create(
+            name='Project Two', url='https://github.com/fedorkosilov/two', owner=self.other_user,
+        )
+        # Events of the projects above
+        OutboxEvent.objects.all().delete()
+
+    def post(self, operations):
+        return self.client.post(
+            reverse('project-operations'),
+            data=json.dumps({'atomic:operations': operations}),
+            content_type=ATOMIC_MEDIA_TYPE,
+            HTTP_AUTHORIZATION=self.auth_header,
+        )
+
+    def add(self, index):
+        return {'op': 'add', 'data': {'type': 'Project', 'attributes': {
+            'name': 'New {0}'.format(index),
+            'url': 'https://github.com/Encode/new-{0}'.format(index),
+            'rating': '4.5',
+        }}}
+
+    def test_operations_are_written_in_bulk(self):
+        """
+        Ensure add, update and remove operations are applied with bulk queries and return their results
+        """
+        operations = [self.add(index) for index in range(20)] + [
+            {'op': 'update', 'data': {'type': 'Project', 'id': str(self.project.id), 'attributes': {
+                'name': 'Renamed', 'url': 'https://github.com/django/one',
+            }}},
+        ]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.post(operations)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], ATOMIC_MEDIA_TYPE)
+        # Token, lock, insert, outbox event, update, change log and statistics, not one query per operation
+        self.assertLess(len(queries), 12)
+
+        results = response.json()['atomic:results']
+        self.assertEqual(len(results), 21)
+        self.assertEqual(results[0]['data']['attributes']['name'], 'New 0')
+        self.assertEqual(results[0]['data']['attributes']['owner'], 'testuser')
+        self.assertEqual(results[20]['data'], {
+            'type': 'Project',
+            'id': str(self.project.id),
+            'attributes': {
+                'name': 'Renamed',
+                'description': '',
+                'url': 'https://github.com/django/one',
+                'rating': '2.00',
+                'owner': 'testuser',
+            },
+            'relationships': {'user': {'data': {'type': 'User', 'id': str(self.user.id)}}},
+        })
+        created = Project.objects.get(id=results[0]['data']['id'])
+        self.assertEqual((created.github_org, created.version), ('encode', 1))
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.github_org, self.project.version), ('django', 2))
+        self.assertGreater(self.project.updated_at, self.other_project.updated_at)
+
+        # A single outbox event for every created project
+        event = OutboxEvent.objects.get()
+        self.assertCountEqual(event.payload['project_ids'], [int(result['data']['id']) for result in results[:20]])
+
+    def test_remove_operations(self):
+        """
+        Ensure projects can be removed, with no content returned when no operation has a result
+        """
+        response = self.post([{'op': 'remove', 'ref': {'type': 'Project', 'id': str(self.project.id)}}])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Project.objects.filter(id=self.project.id).exists())
+
+    def test_removed_project_updates_have_no_result(self):
+        """
+        Ensure updates followed by a remove of the same project return no resource
+        """
+        remove = {'op': 'remove', 'ref': {'type': 'Project', 'id': str(self.project.id)}}
+        update = {'op': 'update', 'data': {'type': 'Project', 'id': str(self.project.id), 'attributes': {
+            'name': 'Renamed',
+        }}}
+        response = self.post([self.add(0), update, remove])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['atomic:results']
+        self.assertEqual(results[0]['data']['attributes']['name'], 'New 0')
+        self.assertEqual(results[1:], [{}, {}])
+        self.assertFalse(Project.objects.filter(id=self.project.id).exists())
+
+    def test_invalid_operations_reject_the_batch(self):
+        """
+        Ensure nothing is written when any operation is invalid and errors point at the operation
+        """
+        invalid = self.add(1)
+        invalid['data']['attributes']['url'] = 'https://gitlab.com/fedorkosilov/one'
+        response = self.post([
+            self.add(0),
+            {'op': 'remove', 'ref': {'type': 'Project', 'id': str(self.project.id)}},
+            invalid,
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()['errors']
+        self.assertEqual([error['source']['pointer'] for error in errors], ['/atomic:operations/2/data/attributes/url'])
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertEqual(OutboxEvent.objects.count(), 0)
+
+        cases = [
+            ({'op': 'remove', 'ref': {'type': 'Project', 'id': str(self.other_project.id)}}, 403),
+            ({'op': 'remove', 'ref': {'type': 'Project', 'id': '0'}}, 404),
+            ({'op': 'update', 'data': {'type': 'Webhook', 'id': str(self.project.id)}}, 409),
+            ({'op': 'replace', 'data': {'type': 'Project'}}, 400),
+        ]
+        for operation, status_code in cases:
+            with self.subTest(operation=operation):
+                response = self.post([operation])
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response.json()['errors'][0]['source']['pointer'][:20], '/atomic:operations/0')
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_operations_require_atomic_extension(self):
+        """
+        Ensure operations need an authenticated request with the atomic extension media type
+        """
+        response = self.client.post(
+            reverse('project-operations'),
+            data=json.dumps({'atomic:operations': [self.add(0)]}),
+            content_type='application/vnd.api+json',
+            HTTP_AUTHORIZATION=self.auth_header,
+        )
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.auth_header = ''
+        self.assertEqual(self.post([self.add(0)]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@patch.object(ProjectList, 'response_cache_enabled', False)
+class ProjectFieldsetTests(APITestCase):
+    """
+    Project sparse fieldset and include tests
+    """
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username='testuser{0}'.format(index), password='12345') for index in range(3)
+        ]
+        self.projects = [
+            Project.objects.create(
+                name='Project {0}'.format(index),
+                description='Some basic description',
+                url='https://github.com/fedorkosilov/literate-parakeet-{0}'.format(index),
+                owner=self.users[index % 3],
+            )
+            for index in range(6)
+        ]
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries[-1]['sql']
+
+    @patch.object(ProjectList, 'fast_path_enabled', False)
+    def test_sparse_fieldset_reads_requested_columns(self):
+        """
+        Ensure a sparse fieldset reads only the requested columns, without joining owners
+        """
+        response, sql = self.get(reverse('project-list') + '?fields[Project]=name&sort=-rating')
+        self.assertEqual(response.json()['data'][0]['attributes'], {'name': 'Project 5', 'url': self.projects[5].url})
+        self.assertIn('"rating"', sql)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('auth_user', sql)
+
+        url = reverse('project-detail', args=[self.projects[0].id]) + '?fields[Project]=name'
+        response, sql = self.get(url)
+        self.assertEqual(set(response.json()['data']['attributes']), {'name', 'url'})
+        self.assertNotIn('"description"', sql)
+        self.assertIn('ETag', response)
+
+    def test_include_user_is_a_single_join(self):
+        """
+        Ensure included owners are read with the projects, whatever the number of projects
+        """
+        url = reverse('project-list') + '?include=user&fields[Project]=name,user'
+        with self.assertNumQueries(2):
+            # COUNT(*) of page number pagination and the page itself
+            response = self.client.get(url)
+        document = response.json()
+        self.assertEqual(document['data'][0]['relationships']['user']['data'], {
+            'type': 'User',
+            'id': str(self.users[2].id),
+        })
+        self.assertEqual(
+            sorted(resource['attributes']['username'] for resource in document['included']),
+            ['testuser0', 'testuser1', 'testuser2'],
+        )
+
+        response = self.client.get(reverse('project-detail', args=[self.projects[0].id]) + '?include=user')
+        self.assertEqual(response.json()['included'][0]['attributes'], {'username': 'testuser0'})
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """
+    Cached token authentication tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.token = Token.objects.create(user=self.user)
+        self.auth_header = 'Token ' + self.token.key
+        self.project = Project.objects.create(
+            name='Project One', url='https://github.com/fedorkosilov/one', owner=self.user,
+        )
+
+    def patch_project(self):
+        return self.client.patch(
+            reverse('project-detail', args=[self.project.id]),
+            data={'data': {'type': 'Project', 'id': self.project.id, 'attributes': {'name': 'Renamed'}}},
+            HTTP_AUTHORIZATION=self.auth_header,
+        )
+
+    def test_cached_token_authenticates_without_queries(self):
+        """
+        Ensure authenticated writes do no authentication or owner queries once the token is cached
+        """
+        self.assertEqual(self.patch_project().status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch_project()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query['sql'] for query in queries if 'authtoken_token' in query['sql']])
+        self.assertFalse([query['sql'] for query in queries if 'FROM "auth_user"' in query['sql']])
+
+        # Invalid tokens are still refused
+        self.auth_header = 'Token invalid'
+        self.assertEqual(self.patch_project().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_token_is_invalidated(self):
+        """
+        Ensure deactivating the user or deleting the token refuses a cached token
+        """
+        self.assertEqual(self.patch_project().status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.patch_project().status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        self.assertEqual(self.patch_project().status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.patch_project().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidation_during_a_cache_miss_is_kept(self):
+        """
+        Ensure a user loaded before an invalidation is not cached after it
+        """
+        authenticate_credentials = TokenAuthentication.authenticate_credentials
+
+        def load_then_deactivate(authentication, key):
+            result = authenticate_credentials(authentication, key)
+            # Committed by another request between the join and the cache write
+            User.objects.filter(id=self.user.id).update(is_active=False)
+            invalidate_tokens([key])
+            return result
+
+        with patch.object(TokenAuthentication, 'authenticate_credentials', load_then_deactivate):
+            self.assertEqual(self.patch_project().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.patch_project().status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ProjectChangeTests(APITestCase):
+    """
+    Project change log tests
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.project = Project.objects.create(
+            name='Project One', url='https://github.com/fedorkosilov/literate-parakeet', owner=self.user,
+        )
+
+    def get_changes(self, query='', status_code=status.HTTP_200_OK):
+        # Committed changes are numbered by the periodic task
+        sequence_project_changes()
+        response = self.client.get(reverse('project-changes') + query)
+        self.assertEqual(response.status_code, status_code)
+        return response.json()
+
+    def summarize(self, document):
+        return [
+            (change['attributes']['project_id'], change['attributes']['action'], change['attributes']['version'])
+            for change in document['data']
+        ]
+
+    def backdate(self, seconds, **filters):
+        sequence_project_changes()
+        ProjectChange.objects.filter(**filters).update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_changes_are_returned_in_sequence_order(self):
+        """
+        Ensure creations, updates and deletions are returned after since, a page at a time
+        """
+        head = self.get_changes()
+        self.assertEqual(head['data'], [])
+        since = head['meta']['seq']
+        second = Project.objects.create(name='Two', url='https://github.com/fedorkosilov/two', owner=self.user)
+        self.project.name = 'Renamed'
+        self.project.save()
+        project_id = self.project.id
+        self.project.delete()
+
+        document = self.get_changes('?since={0}&page[size]=2'.format(since))
+        self.assertEqual(self.summarize(document), [(second.id, 'created', 1), (project_id, 'updated', 2)])
+        self.assertEqual(document['meta']['seq'], int(document['data'][-1]['id']))
+        self.assertIn('since={0}'.format(document['meta']['seq']), document['links']['next'])
+        document = self.get_changes('?since={0}'.format(document['meta']['seq']))
+        self.assertEqual(self.summarize(document), [(project_id, 'deleted', 2)])
+        document = self.get_changes('?since={0}'.format(document['meta']['seq']))
+        self.assertEqual(document['data'], [])
+
+    def test_operations_are_recorded(self):
+        """
+        Ensure projects written in bulk by atomic operations are recorded
+        """
+        since = self.get_changes()['meta']['seq']
+        self.client.force_authenticate(self.user)
+        document = {'atomic:operations': [
+            {'op': 'add', 'data': {'type': 'Project', 'attributes': {
+                'name': 'Bulk', 'url': 'https://github.com/fedorkosilov/bulk',
+            }}},
+            {'op': 'update', 'data': {'type': 'Project', 'id': str(self.project.id), 'attributes': {'rating': '3'}}},
+        ]}
+        response = self.client.post(
+            reverse('project-operations'), json.dumps(document), content_type=ATOMIC_MEDIA_TYPE,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        actions = [action for _, action, _ in self.summarize(self.get_changes('?since={0}'.format(since)))]
+        self.assertEqual(actions, ['created', 'updated'])
+
+    def test_changes_are_numbered_in_commit_order(self):
+        """
+        Ensure changes are only listed once numbered, after every change read before
+        """
+        since = self.get_changes()['meta']['seq']
+        second = Project.objects.create(name='Two', url='https://github.com/fedorkosilov/two', owner=self.user)
+        self.assertEqual(ProjectChange.objects.filter(seq__gt=since).count(), 0)
+        document = self.get_changes('?since={0}'.format(since))
+        self.assertEqual(self.summarize(document), [(second.id, 'created', 1)])
+
+        # Eg. a long transaction which started first commits last, with a lower pending id
+        pending = PendingProjectChange.objects.create(project_id=self.project.id, action='updated', version=2)
+        PendingProjectChange.objects.filter(id=pending.id).update(id=1)
+        document = self.get_changes('?since={0}'.format(document['meta']['seq']))
+        self.assertEqual(self.summarize(document), [(self.project.id, 'updated', 2)])
+        self.assertEqual(int(document['data'][0]['id']), since + 2)
+        self.assertFalse(PendingProjectChange.objects.exists())
+
+    @override_settings(PROJECT_CHANGES_COMPACT_AFTER=60, PROJECT_CHANGES_RETENTION=3600)
+    def test_superseded_changes_are_compacted_and_old_deletions_pruned(self):
+        """
+        Ensure compaction keeps the latest change of a project and clients behind a pruned deletion get 410
+        """
+        other = Project.objects.create(name='Two', url='https://github.com/fedorkosilov/two', owner=self.user)
+        self.project.save()
+        project_id = self.project.id
+        self.project.delete()
+        self.backdate(120)
+        other.save()
+        self.assertEqual(compact_project_changes(), 2)
+        self.assertEqual(self.summarize(self.get_changes('?since=0')), [
+            (other.id, 'created', 1), (project_id, 'deleted', 2), (other.id, 'updated', 2),
+        ])
+
+        self.backdate(7200, action=ProjectChange.Action.DELETED)
+        self.assertEqual(compact_project_changes(), 1)
+        floor = ProjectChange.objects.get(project_id=other.id, action='updated').seq - 1
+        self.get_changes('?since={0}'.format(floor - 1), status_code=status.HTTP_410_GONE)
+        self.assertEqual(self.summarize(self.get_changes('?since={0}'.format(floor))), [(other.id, 'updated', 2)])
+
+    def test_invalid_since_is_rejected(self):
+        """
+        Ensure since must be a non-negative integer
+        """
+        self.get_changes('?since=abc', status_code=status.HTTP_400_BAD_REQUEST)
+        self.get_changes('?since=-1', status_code=status.HTTP_400_BAD_REQUEST)
+
+
+class ProjectStatsTests(APITestCase):
+    """
+    Project rating statistics and leaderboard tests
+    """
+    def setUp(self):
+        get_redis().delete(LEADERBOARD_KEY)
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.other_user = User.objects.create_user(username='otheruser', password='12345')
+        self.auth_header = 'Token ' + Token.objects.create(user=self.user).key
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects = [
+                Project.objects.create(
+                    name='Project {0}'.format(index), url='https://github.com/fedorkosilov/p{0}'.format(index),
+                    rating=rating, owner=owner,
+                )
+                for index, (rating, owner) in enumerate([
+                    (Decimal('4.5'), self.user), (Decimal('2'), self.user), (Decimal('3.25'), self.other_user),
+                ])
+            ]
+        self.count_changes()
+
+    def count_changes(self):
+        sequence_project_changes()
+        count_project_changes()
+
+    def get_stats(self):
+        self.count_changes()
+        response = self.client.get(reverse('project-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['data']['attributes']
+
+    def test_stats_are_updated_on_every_change(self):
+        """
+        Ensure creations, rating and owner changes and deletions are counted from the change log
+        """
+        stats = self.get_stats()
+        self.assertEqual((stats['project_count'], stats['average_rating']), (3, '3.25'))
+        self.assertEqual(stats['owners'], [
+            {'owner': 'testuser', 'project_count': 2, 'average_rating': '3.25'},
+            {'owner': 'otheruser', 'project_count': 1, 'average_rating': '3.25'},
+        ])
+        self.assertEqual([(entry['name'], entry['rating']) for entry in stats['top_rated']], [
+            ('Project 0', '4.50'), ('Project 2', '3.25'), ('Project 1', '2.00'),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('project-detail', args=[self.projects[1].id]),
+                data={'data': {'type': 'Project', 'id': str(self.projects[1].id), 'attributes': {'rating': '5'}}},
+                HTTP_AUTHORIZATION=self.auth_header,
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # Changed twice before being counted, counted once with its current owner and rating
+            self.projects[2].rating = Decimal('1')
+            self.projects[2].save()
+            self.projects[2].rating = Decimal('3.25')
+            self.projects[2].owner = self.user
+            self.projects[2].save()
+            self.projects[0].delete()
+        # Writers do not update the statistics
+        self.assertEqual(ProjectStats.objects.get(key='*').project_count, 3)
+        stats = self.get_stats()
+        self.assertEqual((stats['project_count'], stats['average_rating']), (2, '4.12'))
+        self.assertEqual(stats['owners'], [{'owner': 'testuser', 'project_count': 2, 'average_rating': '4.12'}])
+        self.assertEqual([entry['name'] for entry in stats['top_rated']], ['Project 1', 'Project 2'])
+        self.assertEqual(check_stats(settings.PROJECT_STATS_BATCH_SIZE), [])
+
+    def test_operations_are_counted(self):
+        """
+        Ensure projects written in bulk by atomic operations are counted
+        """
+        operations = [
+            {'op': 'add', 'data': {'type': 'Project', 'attributes': {
+                'name': 'Bulk', 'url': 'https://github.com/fedorkosilov/bulk', 'rating': '1.5',
+            }}},
+            {'op': 'update', 'data': {'type': 'Project', 'id': str(self.projects[0].id), 'attributes': {'rating': '1'}}},
+            {'op': 'remove', 'ref': {'type': 'Project', 'id': str(self.projects[1].id)}},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('project-operations'), data=json.dumps({'atomic:operations': operations}),
+                content_type=ATOMIC_MEDIA_TYPE, HTTP_AUTHORIZATION=self.auth_header,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = self.get_stats()
+        self.assertEqual((stats['project_count'], stats['average_rating']), (3, '1.92'))
+        self.assertEqual(check_stats(settings.PROJECT_STATS_BATCH_SIZE), [])
+
+    def test_check_counts_changes_first(self):
+        """
+        Ensure changes committed before a check are counted, not reported as differences
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[0].rating = Decimal('2')
+            self.projects[0].save()
+            self.projects[1].delete()
+        output = StringIO()
+        call_command('rebuild_project_stats', '--check', stdout=output)
+        self.assertEqual(output.getvalue().strip(), 'statistics and leaderboard are consistent')
+
+    def test_rebuild_command_repairs_drift(self):
+        """
+        Ensure the rebuild command reports differences and recomputes statistics and the leaderboard
+        """
+        ProjectStats.objects.filter(key='*').update(project_count=10)
+        get_redis().zadd(LEADERBOARD_KEY, {'999': 5})
+        get_redis().zrem(LEADERBOARD_KEY, str(self.projects[0].id))
+        output = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_project_stats', '--check', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[2].delete()
+        call_command('rebuild_project_stats', stdout=StringIO())
+        self.assertEqual(check_stats(settings.PROJECT_STATS_BATCH_SIZE), [])
+        self.assertEqual([entry['name'] for entry in self.get_stats()['top_rated']], ['Project 0', 'Project 1'])
+
+
+class AsgiApplicationTests(TransactionTestCase):
+    """
+    ASGI application tests
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='12345')
+        for index in range(3):
+            Project.objects.create(
+                name='Project {0}'.format(index), url='https://github.com/fedorkosilov/p{0}'.format(index), owner=user,
+            )
+
+    async def get(self, path):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'root_path': '',
+            'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'accept', b'application/vnd.api+json')],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000),
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(timeout=10)
+        body = b''
+        while True:
+            message = await communicator.receive_output(timeout=10)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return start['status'], body
+
+    @patch.object(ProjectList, 'response_cache_enabled', False)
+    async def test_requests_are_served_concurrently(self):
+        """
+        Ensure Django's ASGI handler runs sync views of concurrent requests in parallel threads
+        """
+        barrier = threading.Barrier(4, timeout=5)
+        list_projects = ProjectList.list
+
+        def wait_for_all(view, request, *args, **kwargs):
+            # Only passes once the 4 requests are running at the same time
+            barrier.wait()
+            return list_projects(view, request, *args, **kwargs)
+
+        with patch.object(ProjectList, 'list', wait_for_all):
+            responses = await asyncio.gather(*[self.get('/projects/') for _ in range(4)])
+        expected = await sync_to_async(lambda: self.client.get('/projects/', HTTP_ACCEPT='application/vnd.api+json').content)()
+        self.assertEqual(responses, [(status.HTTP_200_OK, expected)] * 4)
+
+    @patch.object(ProjectList, 'response_cache_enabled', False)
+    async def test_concurrent_requests_are_bounded(self):
+        """
+        Ensure at most ASGI_MAX_CONCURRENT_REQUESTS views run at the same time, further requests wait
+        """
+        lock = threading.Lock()
+        running = [0]
+        most_running = [0]
+        list_projects = ProjectList.list
+
+        def count_running(view, request, *args, **kwargs):
+            with lock:
+                running[0] += 1
+                most_running[0] = max(most_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return list_projects(view, request, *args, **kwargs)
+
+        with patch.object(ProjectList, 'list', count_running), \
+                patch('djangochallenge.asgi.request_slots', asyncio.Semaphore(2)):
+            responses = await asyncio.gather(*[self.get('/projects/') for _ in range(6)])
+        self.assertEqual([status_code for status_code, _ in responses], [status.HTTP_200_OK] * 6)
+        self.assertEqual(most_running[0], 2)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Read replica routing tests, the replica alias is a mirror of the default database
+    """
+    databases = {'default', 'replica'}
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='12345')
+        self.auth_header = 'Token ' + Token.objects.create(user=user).key
+        Project.objects.create(name='Project One', url='https://github.com/fedorkosilov/one', owner=user)
+
+    def get_list(self, **extra):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse('project-list'), **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(primary), len(replica)
+
+    @patch.object(ProjectList, 'response_cache_enabled', False)
+    @patch.object(ProjectList, 'response_cache_etag', False)
+    def test_safe_requests_read_from_replica_until_client_writes(self):
+        """
+        Ensure reads of safe requests go to the replica, except for a client which has just written
+        """
+        # Tokens are looked up in the primary, then read from the token cache
+        primary, replica = self.get_list(HTTP_AUTHORIZATION=self.auth_header)
+        self.assertEqual(primary, 1)
+        primary, replica = self.get_list(HTTP_AUTHORIZATION=self.auth_header)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        response = self.client.post(
+            reverse('project-list'),
+            data={'data': {'type': 'Project', 'attributes': {
+                'name': 'Project Two', 'url': 'https://github.com/fedorkosilov/two',
+            }}},
+            HTTP_AUTHORIZATION=self.auth_header,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        primary, replica = self.get_list(HTTP_AUTHORIZATION=self.auth_header)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        # Other clients are not pinned
+        self.assertEqual(self.get_list()[0], 0)
+
+    def test_reads_in_primary_transactions_stay_on_primary(self):
+        """
+        Ensure reads of a transaction and select_for_update() are never sent to a replica
+        """
+        self.assertEqual(router.db_for_read(Project), 'default')
+        with read_from('replica'):
+            self.assertEqual(router.db_for_read(Project), 'replica')
+            self.assertEqual(Project.objects.select_for_update().db, 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Project), 'default')
+        self.assertEqual(router.db_for_write(Project), 'default')
+
+    def test_cached_responses_are_rendered_from_primary(self):
+        """
+        Ensure responses stored in the response cache are never read from a replica
+        """
+        primary, replica = self.get_list()
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        self.assertEqual(self.get_list(), (0, 0))
+
+    def test_pin_is_refreshed_after_unsafe_requests(self):
+        """
+        Ensure a client is still pinned to the primary after an unsafe request outlasting the pin
+        """
+        request = APIRequestFactory().post('/projects/', HTTP_AUTHORIZATION=self.auth_header)
+
+        def expire_pin(request):
+            cache.delete(primary_pin_key(request))
+            return HttpResponse()
+
+        PrimaryPinningMiddleware(expire_pin)(request)
+        self.assertIsNotNone(cache.get(primary_pin_key(request)))
+
+    def test_exports_are_read_from_replica(self):
+        """
+        Ensure streamed exports read their rows from the database selected for the request
+        """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse('project-export'))
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len(json.loads(content)['data']), 1)
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+
+    def test_full_batches_are_counted_on_primary(self):
+        """
+        Ensure buffered events are counted on the primary, a replica may not have them yet
+        """
+        hook = Webhook.objects.create(
+            url='https://example.com/hook', owner=User.objects.get(), batch_enabled=True, batch_max_size=1,
+        )
+        project = Project.objects.get()
+        with read_from('replica'), CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(buffer_event(project.id, [hook]), [hook.id])
+        self.assertEqual(len(replica), 0)
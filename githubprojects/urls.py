@@ -5,6 +5,10 @@ from githubprojects import views
 
 urlpatterns = [
     path('projects/', views.ProjectList.as_view(), name='project-list'),
+    path('projects/export/', views.ProjectExport.as_view(), name='project-export'),
+    path('projects/changes/', views.ProjectChangeList.as_view(), name='project-changes'),
+    path('projects/stats/', views.ProjectStatsDetail.as_view(), name='project-stats'),
+    path('projects/operations/', views.ProjectOperationList.as_view(), name='project-operations'),
     path('projects/<int:pk>/', views.ProjectDetail.as_view(), name='project-detail'),
 ]
 
@@ -1,19 +1,295 @@
-from githubprojects.models import Project
-from githubprojects.serializers import ProjectSerializer
+from djangochallenge.conditional import ConditionalObjectMixin
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from djangochallenge.pagination import JsonApiCursorPagination
+from djangochallenge.renderers import NDJSONRenderer
+from djangochallenge.response_cache import CachedResponseMixin
+from githubprojects.changes import get_floor, get_head, read_changes
+from githubprojects.encoders import EncodedResponse, ProjectListEncoder
+from githubprojects.filters import ProjectFilter
+from githubprojects.models import Project, ProjectChange, ProjectStats
+from githubprojects.operations import ATOMIC_MEDIA_TYPE, AtomicOperationsParser, ProjectOperations
+from githubprojects.serializers import ProjectChangeSerializer, ProjectSerializer
 from githubprojects.permissions import IsOwnerOrReadOnly
-from rest_framework import generics, permissions
+from githubprojects.search import ProjectSearchFilter
+from githubprojects.stats import top_rated
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_json_api.django_filters import DjangoFilterBackend
+from rest_framework_json_api.filters import OrderingFilter, QueryParameterValidationFilter
+from rest_framework_json_api.renderers import JSONRenderer
+from rest_framework_json_api.utils import get_included_resources
+from rest_framework_json_api.views import PreloadIncludesMixin
+from typing import TYPE_CHECKING, Optional
 
 
-class ProjectList(generics.ListCreateAPIView):
+class ChangesPruned(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Changes since this sequence number were pruned, list the projects again.'
+    default_code = 'gone'
+
+
+# The views the mixins are combined with, for type checking
+if TYPE_CHECKING:
+    ProjectViewBase = generics.GenericAPIView[Project]
+else:
+    ProjectViewBase = object
+
+
+class ProjectFieldsetMixin(PreloadIncludesMixin, ProjectViewBase):
+    """
+    Read only the columns and related objects a project document renders
+
+    A fields[Project] sparse fieldset translates to only() on the queryset
+    of safe requests, writes save whole objects. Owner usernames and
+    include=user are read with a single select_related() join.
+    """
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    select_for_includes = {'user': ['owner']}
+    # url is kept in every sparse fieldset, version and updated_at are the HTTP validators
+    fieldset_columns = ['url', 'version', 'updated_at']
+    # Columns of included resources, UserSerializer renders the username
+    include_columns = {'user': ['owner__username']}
+    encoder = ProjectListEncoder()
+
+    def get_queryset(self) -> 'QuerySet[Project]':
+        queryset = super().get_queryset()
+        fieldset = self.encoder.get_fieldset(self.request)
+        columns = self.encoder.get_values(fieldset)
+        if any('__' in column for column in columns):
+            queryset = queryset.select_related('owner')
+        if self.encoder.fieldset_param not in self.request.query_params:
+            return queryset
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        for include in get_included_resources(self.request, self.get_serializer_class()):
+            columns += self.include_columns.get(include, [])
+        return queryset.only(*columns, *self.fieldset_columns, *self.get_sort_columns())
+
+    def get_sort_columns(self) -> list[str]:
+        """
+        Return the columns of the requested sort, cursors are positioned on them
+        """
+        return []
+
+
+class ProjectFilteringMixin(ProjectFieldsetMixin):
+    """
+    Filters, search and sorts of project lists
+    """
+    filter_backends = [QueryParameterValidationFilter, OrderingFilter, DjangoFilterBackend, ProjectSearchFilter]
+    filterset_class = ProjectFilter
+    # Sorts with an index to scan, see Project.Meta.indexes
+    ordering_fields = ['id', 'name', 'rating']
+    # Used by databases without a full-text search index
+    search_fields = ['name', 'description']
+
+    def get_sort_columns(self) -> list[str]:
+        fields = self.request.query_params.get(OrderingFilter.ordering_param, '').split(',')
+        # Invalid sorts are rejected by OrderingFilter
+        return [field.lstrip('-') for field in fields if field.lstrip('-') in self.ordering_fields]
+
+
+class ProjectList(ProjectFilteringMixin, CachedResponseMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = JsonApiCursorPagination
+    response_cache_namespace = 'projects'
+    # The generation is bumped whenever a Project object or an owner changes
+    response_cache_etag = True
+    # Read JSON:API documents straight from values(), see ProjectListEncoder
+    fast_path_enabled = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_path_enabled or not self.encoder.accepts(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        fieldset = self.encoder.get_fieldset(request)
+        # Sort columns and annotations (eg. search_rank) are kept, cursors may be positioned on them
+        columns = [*self.encoder.get_values(fieldset), *self.get_sort_columns(), *queryset.query.annotations]
+        rows = queryset.values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return EncodedResponse(self.encoder.encode(rows, fieldset), rows)
+        document = self.get_paginated_response(page).data
+        content = self.encoder.encode(page, fieldset, document.get('links'), document.get('meta'))
+        return EncodedResponse(content, document)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
+class ProjectExport(ProjectFilteringMixin, generics.ListAPIView):
+    """
+    Stream every project matching the list filters in a single response
+
+    The body is a JSON:API document, or with Accept: application/x-ndjson
+    (or /projects/export.ndjson) one resource object per line. Rows are read through
+    a database cursor (a server-side cursor on Postgres) and encoded
+    PROJECT_EXPORT_CHUNK_SIZE at a time, so memory use does not grow with
+    the number of projects.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        # Rows are read after the view returns, outside of the database selected for the request
+        queryset = self.filter_queryset(self.get_queryset()).using(router.db_for_read(Project))
+        fieldset = self.encoder.get_fieldset(request)
+        chunk_size = settings.PROJECT_EXPORT_CHUNK_SIZE
+        rows = queryset.values(*self.encoder.get_values(fieldset)).iterator(chunk_size=chunk_size)
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            content = self.encoder.stream_lines(rows, fieldset, chunk_size)
+        else:
+            content = self.encoder.stream(rows, fieldset, chunk_size)
+        return StreamingHttpResponse(content, content_type=request.accepted_renderer.media_type)
+
+
+class ProjectOperationList(generics.GenericAPIView):  # type: ignore[type-arg]
+    """
+    Create, update and delete projects in bulk with JSON:API atomic operations
+
+    The request is an {"atomic:operations": [...]} document sent with the
+    Content-Type application/vnd.api+json; ext="https://jsonapi.org/ext/atomic".
+    All operations are applied in a single transaction or none is, see
+    ProjectOperations.
+    """
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [AtomicOperationsParser]
+    # Documents are atomic:operations and atomic:results, the renderer does not build resources
+    resource_name = False
+
+    def post(self, request, *args, **kwargs):
+        operations = ProjectOperations(request.data, self.get_serializer_context())
+        with transaction.atomic():
+            results = operations.apply()
+        if results is None:
+            return Response(operations.errors, status=operations.get_status_code())
+        if not any(results):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        content_type = ATOMIC_MEDIA_TYPE if request.accepted_renderer.format == 'vnd.api+json' else None
+        return Response({'atomic:results': results}, content_type=content_type)
+
+
+class ProjectChangeList(generics.GenericAPIView):  # type: ignore[type-arg]
+    """
+    Changes of projects after a sequence number, in sequence order
+
+    ?since=<seq> returns the next changes (created, updated and deleted
+    project ids with their version) and meta.seq, the since of the next
+    request, also in links.next. Without since no change is returned and
+    meta.seq is the latest sequence number: read it before listing the
+    projects, then follow the changes since it. Changes are listed once
+    numbered, shortly after they are committed. Superseded changes are
+    compacted, so a project may have been created and updated since. Once
+    deletions after since were pruned, the request fails with 410 Gone and
+    the projects have to be listed again.
+    """
+    queryset = ProjectChange.objects.all()
+    serializer_class = ProjectChangeSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = None
+    page_size_query_param = 'page[size]'
+
+    def get(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return self.get_response([], get_head())
+        since = self.get_integer_param('since', minimum=0)
+        if since < get_floor():
+            raise ChangesPruned()
+        limit = min(
+            self.get_integer_param(self.page_size_query_param, minimum=1, default=settings.PROJECT_CHANGES_PAGE_SIZE),
+            settings.PROJECT_CHANGES_MAX_PAGE_SIZE,
+        )
+        changes = read_changes(since, limit)
+        return self.get_response(changes, changes[-1].seq if changes else since)
+
+    def get_integer_param(self, name: str, minimum: int, default: Optional[int] = None) -> int:
+        value = self.request.query_params.get(name)
+        if value is None and default is not None:
+            return default
+        try:
+            number = int(value) if value is not None else None
+        except ValueError:
+            number = None
+        if number is None or number < minimum:
+            raise ValidationError({name: 'Must be an integer of at least {0}.'.format(minimum)})
+        return number
+
+    def get_response(self, changes: list[ProjectChange], seq: int) -> Response:
+        return Response({
+            'results': self.get_serializer(changes, many=True).data,
+            'links': {'next': replace_query_param(self.request.build_absolute_uri(), 'since', seq)},
+            'meta': {'seq': seq},
+        })
+
+
+class ProjectStatsDetail(generics.GenericAPIView):  # type: ignore[type-arg]
+    """
+    Rating statistics of all projects, the owners with the most projects and the best rated projects
+
+    Statistics are read from ProjectStats objects and the best rated projects
+    from the Redis leaderboard, both counted from the change log shortly after
+    every project change, nothing is aggregated from the projects. Lists
+    have PROJECT_STATS_TOP_SIZE entries.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # The document is a single statistics resource, not a model
+    resource_name = False
+
+    def get(self, request, *args, **kwargs):
+        limit = settings.PROJECT_STATS_TOP_SIZE
+        total = ProjectStats.objects.filter(key='*').first() or ProjectStats(key='*')
+        owners = (
+            ProjectStats.objects.filter(owner__isnull=False, project_count__gt=0)
+            .select_related('owner').order_by('-project_count', '-key')[:limit]
+        )
+        ranking = top_rated(limit)
+        rows = Project.objects.filter(id__in=[pk for pk, _ in ranking]).values('id', 'name', 'owner__username')
+        projects = {row['id']: row for row in rows}
+        return Response({'data': {
+            'type': 'ProjectStats',
+            'id': 'all',
+            'attributes': {
+                'project_count': total.project_count,
+                'average_rating': format_rating(total.average_rating),
+                'owners': [
+                    {
+                        # Owner statistics are filtered on owner__isnull=False
+                        'owner': stats.owner.username,  # type: ignore[union-attr]
+                        'project_count': stats.project_count,
+                        'average_rating': format_rating(stats.average_rating),
+                    }
+                    for stats in owners
+                ],
+                'top_rated': [
+                    {
+                        'id': str(pk),
+                        'name': projects[pk]['name'],
+                        'owner': projects[pk]['owner__username'],
+                        'rating': format_rating(rating),
+                    }
+                    # Projects deleted since the leaderboard was read are skipped
+                    for pk, rating in ranking if pk in projects
+                ],
+            },
+        }})
+
+
+def format_rating(rating) -> Optional[str]:
+    # Ratings are rendered like Project.rating, eg. "4.50"
+    return None if rating is None else '{0:.2f}'.format(rating)
+
+
+class ProjectDetail(
+    ProjectFieldsetMixin, ConditionalObjectMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView,
+):
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    response_cache_namespace = 'projects'
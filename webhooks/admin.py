@@ -1,5 +1,39 @@
 from django.contrib import admin
-from webhooks.models import Webhook
+from webhooks.breaker import CircuitBreaker
+from webhooks.models import OutboxEvent, Webhook, WebhookBatchItem, WebhookDelivery, WebhookFanout
+from webhooks.retries import redrive
 
 
-admin.site.register(Webhook)
+@admin.register(Webhook)
+class WebhookAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
+    list_display = ['url', 'owner', 'comment', 'circuit_state']
+    list_select_related = ['owner']
+    actions = ['close_circuits']
+
+    @admin.display(description='Circuit')
+    def circuit_state(self, obj):
+        return CircuitBreaker.for_url(obj.url).state().label
+
+    @admin.action(description='Close circuit breakers of selected webhooks')
+    def close_circuits(self, request, queryset):
+        for url in queryset.values_list('url', flat=True):
+            CircuitBreaker.for_url(url).record_success()
+        self.message_user(request, 'Circuit breakers closed.')
+
+
+admin.site.register(WebhookFanout)
+admin.site.register(OutboxEvent)
+admin.site.register(WebhookBatchItem)
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
+    list_display = ['id', 'webhook', 'project', 'status', 'attempts', 'last_status_code', 'next_attempt_at']
+    list_filter = ['status']
+    list_select_related = ['webhook', 'project']
+    actions = ['redrive_deliveries']
+
+    @admin.action(description='Re-drive selected dead-lettered deliveries')
+    def redrive_deliveries(self, request, queryset):
+        count = redrive(queryset)
+        self.message_user(request, '{0} deliveries scheduled for retry.'.format(count))
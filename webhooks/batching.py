@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from djangochallenge.routers import read_from
+from githubprojects.models import Project
+from typing import Iterable
+from webhooks.delivery import send_post_request
+from webhooks.models import Webhook, WebhookBatchItem
+from webhooks.payloads import render_projects
+from webhooks.retries import record_batch_attempt
+
+
+def buffer_event(project_id: int, hooks: Iterable[Webhook]) -> list[int]:
+    """
+    Buffer a Project event for webhooks in batching mode
+
+    Returns ids of the webhooks whose batch is full and should be delivered right away.
+    """
+    now = timezone.now()
+    max_sizes = {}
+    items = []
+    for hook in hooks:
+        max_sizes[hook.id] = hook.batch_max_size
+        items.append(WebhookBatchItem(
+            webhook_id=hook.id,
+            project_id=project_id,
+            flush_at=now + timedelta(seconds=hook.batch_linger),
+        ))
+    if not items:
+        return []
+    WebhookBatchItem.objects.bulk_create(items)
+    # A replica may not have the items just buffered yet
+    with read_from(None):
+        sizes = list(
+            WebhookBatchItem.objects.filter(unleased(now), webhook_id__in=max_sizes)
+            .values('webhook_id')
+            .annotate(size=Count('id'))
+            .order_by()
+        )
+    return [row['webhook_id'] for row in sizes if row['size'] >= max_sizes[row['webhook_id']]]
+
+
+def unleased(now: datetime) -> Q:
+    return Q(leased_until__isnull=True) | Q(leased_until__lte=now)
+
+
+def due_webhook_ids(now: datetime) -> list[int]:
+    """
+    Return ids of the webhooks with buffered events which have lingered long enough
+    """
+    return list(
+        WebhookBatchItem.objects.filter(unleased(now), flush_at__lte=now)
+        .order_by()
+        .values_list('webhook_id', flat=True)
+        .distinct()
+    )
+
+
+def claim(hook: Webhook, now: datetime) -> list[WebhookBatchItem]:
+    """
+    Lease the oldest unclaimed buffered events of a webhook for delivery, at most batch_max_size of them
+
+    Leases expire after WEBHOOK_BATCH_LEASE seconds, the events of a worker
+    lost while delivering them are claimed and delivered again.
+    """
+    with transaction.atomic():
+        items = list(
+            WebhookBatchItem.objects.select_for_update(skip_locked=True)
+            .filter(unleased(now), webhook_id=hook.id)
+            .order_by('id')[:hook.batch_max_size]
+        )
+        WebhookBatchItem.objects.filter(id__in=[item.id for item in items]).update(
+            leased_until=now + timedelta(seconds=settings.WEBHOOK_BATCH_LEASE)
+        )
+    return items
+
+
+def flush(webhook_id: int, full_only: bool = False) -> int:
+    """
+    Deliver the oldest buffered events of a webhook as a single JSON:API document
+
+    With full_only nothing is delivered unless there are batch_max_size events buffered.
+    Items are claimed with a lease in a short transaction, so one batch is
+    never delivered by two workers, the request is sent outside of any
+    transaction and the items are deleted, or released, once it is answered.
+    Deferred batches (open circuit, rate limit) stay buffered until the host
+    accepts requests again. Returns the number of delivered events.
+    """
+    hook = Webhook.objects.filter(id=webhook_id).first()
+    if hook is None:
+        return 0
+    now = timezone.now()
+    if full_only and WebhookBatchItem.objects.filter(unleased(now), webhook_id=webhook_id).count() < hook.batch_max_size:
+        return 0
+    items = claim(hook, now)
+    if not items:
+        return 0
+    item_ids = [item.id for item in items]
+    if full_only and len(items) < hook.batch_max_size:
+        WebhookBatchItem.objects.filter(id__in=item_ids).update(leased_until=None)
+        return 0
+    projects_by_id = Project.objects.select_related('owner').in_bulk([item.project_id for item in items])
+    # Events keep their buffering order, events of deleted Projects are dropped
+    projects = [projects_by_id[item.project_id] for item in items if item.project_id in projects_by_id]
+    if not projects:
+        WebhookBatchItem.objects.filter(id__in=item_ids).delete()
+        return 0
+    outcome = send_post_request(hook, render_projects(projects))
+    if outcome.deferred:
+        WebhookBatchItem.objects.filter(id__in=item_ids).update(
+            flush_at=timezone.now() + timedelta(seconds=outcome.retry_after or 0),
+            leased_until=None,
+        )
+        return 0
+    with transaction.atomic():
+        WebhookBatchItem.objects.filter(id__in=item_ids).delete()
+        record_batch_attempt(hook, projects, outcome)
+    return len(items)
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from typing import Optional
+from urllib.parse import urlsplit
+import time
+
+
+class CircuitState(models.TextChoices):
+    CLOSED = 'closed', _('Closed')
+    OPEN = 'open', _('Open')
+    HALF_OPEN = 'half_open', _('Half-open')
+
+
+def destination_host(url: str) -> str:
+    """
+    Return the host (and port) part of a webhook URL, which circuit breakers are keyed by
+    """
+    return urlsplit(url).netloc.lower()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one webhook destination host
+
+    State lives in the default cache (Redis), so it is shared by all workers:
+
+    closed - Requests go through, consecutive failures are counted
+    open - After settings.WEBHOOK_BREAKER_FAILURE_THRESHOLD consecutive failures
+        requests are not sent for settings.WEBHOOK_BREAKER_COOLDOWN seconds
+    half-open - After the cooldown a single probe request is let through,
+        its success closes the circuit and its failure opens it again
+    """
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.failures_key = 'webhooks:breaker:{0}:failures'.format(host)
+        self.open_until_key = 'webhooks:breaker:{0}:open_until'.format(host)
+        self.probe_key = 'webhooks:breaker:{0}:probe'.format(host)
+
+    @classmethod
+    def for_url(cls, url: str) -> 'CircuitBreaker':
+        return cls(destination_host(url))
+
+    def state(self) -> CircuitState:
+        return _circuit_state(cache.get(self.open_until_key))
+
+    def allow_request(self) -> Optional[float]:
+        """
+        Check whether a request to the host may be sent now
+
+        Returns None when it may, otherwise the number of seconds after which to try again.
+        """
+        open_until = cache.get(self.open_until_key)
+        if open_until is None:
+            return None
+        now = time.time()
+        if now < open_until:
+            return open_until - now
+        # Half-open, only one probe at a time is let through
+        if cache.add(self.probe_key, now, settings.WEBHOOK_BREAKER_PROBE_TIMEOUT):
+            return None
+        return float(settings.WEBHOOK_BREAKER_PROBE_TIMEOUT)
+
+    def record_success(self) -> None:
+        cache.delete_many([self.failures_key, self.open_until_key, self.probe_key])
+
+    def record_failure(self) -> None:
+        if cache.get(self.open_until_key) is not None:
+            # A failed half-open probe opens the circuit again
+            self.trip()
+            return
+        cache.add(self.failures_key, 0, settings.WEBHOOK_BREAKER_FAILURES_TIMEOUT)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # The counter expired between add() and incr()
+            failures = 1
+            cache.set(self.failures_key, failures, settings.WEBHOOK_BREAKER_FAILURES_TIMEOUT)
+        if failures >= settings.WEBHOOK_BREAKER_FAILURE_THRESHOLD:
+            self.trip()
+
+    def trip(self) -> None:
+        """
+        Open the circuit for settings.WEBHOOK_BREAKER_COOLDOWN seconds
+        """
+        cache.set(self.open_until_key, time.time() + settings.WEBHOOK_BREAKER_COOLDOWN, None)
+        cache.delete_many([self.failures_key, self.probe_key])
+
+
+def _circuit_state(open_until: Optional[float]) -> CircuitState:
+    if open_until is None:
+        return CircuitState.CLOSED
+    if time.time() < open_until:
+        return CircuitState.OPEN
+    return CircuitState.HALF_OPEN
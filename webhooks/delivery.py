@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from typing import Iterable, NamedTuple, Optional
+from webhooks.breaker import CircuitBreaker
+from webhooks.models import Webhook
+from webhooks.sessions import get_session_pool
+from webhooks.throttling import HostThrottle
+import requests
+import time
+
+
+class DeliveryOutcome(NamedTuple):
+    """
+    Result of a single webhook delivery attempt
+
+    webhook_id - The id of the Webhook object the payload was sent to
+    url - The target URL
+    ok - Whether the receiver answered with a successful (2xx) status code
+    status_code - HTTP status code of the response, None if no response was received
+    error - Short description of the failure, empty string on success
+    elapsed - Wall-clock duration of the attempt in seconds
+    deferred - The request was not sent, eg. because the circuit of the host is open
+    retry_after - For deferred deliveries, seconds after which to try again
+    """
+
+    webhook_id: int
+    url: str
+    ok: bool
+    status_code: Optional[int]
+    error: str
+    elapsed: float
+    deferred: bool = False
+    retry_after: Optional[float] = None
+
+
+def send_post_request(hook: Webhook, payload: bytes) -> DeliveryOutcome:
+    """
+    POST the encoded payload to a single webhook and report the outcome
+
+    The request goes through the pooled session of the target host,
+    so keep-alive connections are reused between deliveries. Requests to hosts
+    whose circuit is open, or which are over their rate or in-flight limits
+    for longer than settings.WEBHOOK_THROTTLE_MAX_WAIT, are not sent, they are
+    reported as deferred.
+    """
+    webhook_id, target = hook.id, hook.url
+    breaker = CircuitBreaker.for_url(target)
+    retry_after = breaker.allow_request()
+    if retry_after is not None:
+        return DeliveryOutcome(webhook_id, target, False, None, 'Circuit open', 0.0, True, retry_after)
+    throttle = HostThrottle.for_hook(hook)
+    retry_after = throttle.acquire()
+    if retry_after is not None and retry_after <= settings.WEBHOOK_THROTTLE_MAX_WAIT:
+        time.sleep(retry_after)
+        retry_after = throttle.acquire()
+    if retry_after is not None:
+        return DeliveryOutcome(webhook_id, target, False, None, 'Throttled', 0.0, True, retry_after)
+    started = time.monotonic()
+    try:
+        # The read timeout bounds each read, not the whole response
+        with throttle.renewing():
+            response = get_session_pool().session_for(target).post(
+                url=target,
+                data=payload,
+                headers={'Content-Type': 'application/vnd.api+json'},
+                timeout=(settings.WEBHOOK_DELIVERY_CONNECT_TIMEOUT, settings.WEBHOOK_DELIVERY_READ_TIMEOUT),
+            )
+    except requests.RequestException as exc:
+        breaker.record_failure()
+        return DeliveryOutcome(webhook_id, target, False, None, repr(exc), time.monotonic() - started)
+    finally:
+        throttle.release()
+    # Server errors count towards opening the circuit, client errors mean the host is up
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    error = '' if response.ok else 'HTTP {0}'.format(response.status_code)
+    return DeliveryOutcome(
+        webhook_id, target, response.ok, response.status_code, error, time.monotonic() - started
+    )
+
+
+def deliver_concurrently(
+    hooks: Iterable[Webhook],
+    payload: bytes,
+    max_in_flight: Optional[int] = None,
+) -> list[DeliveryOutcome]:
+    """
+    Deliver one encoded payload to many webhooks in parallel
+
+    At most max_in_flight requests are outstanding at any time (defaults to
+    settings.WEBHOOK_DELIVERY_MAX_IN_FLIGHT), so wall-clock time of the fan-out
+    is bound by the slowest endpoints rather than by the sum of all of them.
+    Outcomes are returned in the same order as hooks.
+    """
+    targets = list(hooks)
+    if not targets:
+        return []
+    limit = max_in_flight or settings.WEBHOOK_DELIVERY_MAX_IN_FLIGHT
+    with ThreadPoolExecutor(max_workers=min(limit, len(targets))) as executor:
+        futures = [executor.submit(send_post_request, hook, payload) for hook in targets]
+        return [future.result() for future in futures]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0007_delete_webhook'),
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookFanout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('chunks', models.PositiveIntegerField(default=0, verbose_name='Chunks')),
+                ('succeeded', models.PositiveIntegerField(default=0, verbose_name='Succeeded')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Failed')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Completed at')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fanouts', to='githubprojects.project')),
+            ],
+            options={
+                'verbose_name': 'Webhook fan-out',
+                'verbose_name_plural': 'Webhook fan-outs',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0008_project_version'),
+        ('webhooks', '0002_webhookfanout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='Version')),
+                ('status', models.CharField(choices=[('succeeded', 'Succeeded'), ('retrying', 'Retrying'), ('dead_letter', 'Dead letter')], max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Last status code')),
+                ('last_error', models.CharField(blank=True, default='', max_length=500, verbose_name='Last error')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Next attempt at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='githubprojects.project')),
+                ('webhook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='webhooks.webhook')),
+            ],
+            options={
+                'verbose_name': 'Webhook delivery',
+                'verbose_name_plural': 'Webhook deliveries',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='webhookdelivery',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='webhooks_delivery_due_idx'),
+        ),
+    ]
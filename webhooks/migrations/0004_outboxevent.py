@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0003_webhookdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('project.created', 'Project created')], max_length=50, verbose_name='Event type')),
+                ('payload', models.JSONField(default=dict, verbose_name='Payload')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Dispatched at')),
+            ],
+            options={
+                'verbose_name': 'Outbox event',
+                'verbose_name_plural': 'Outbox events',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['id'], name='webhooks_outbox_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:27
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0004_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='max_in_flight',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Max in flight'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='rate_limit',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='Rate limit'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='rate_limit_burst',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Rate limit burst'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:28
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('githubprojects', '0008_project_version'),
+        ('webhooks', '0005_webhook_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='batch_enabled',
+            field=models.BooleanField(default=False, verbose_name='Batch enabled'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='batch_linger',
+            field=models.PositiveIntegerField(default=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(3600)], verbose_name='Batch linger'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='batch_max_size',
+            field=models.PositiveIntegerField(default=100, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)], verbose_name='Batch max size'),
+        ),
+        migrations.CreateModel(
+            name='WebhookBatchItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('flush_at', models.DateTimeField(db_index=True, verbose_name='Flush at')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_items', to='githubprojects.project')),
+                ('webhook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_items', to='webhooks.webhook')),
+            ],
+            options={
+                'verbose_name': 'Webhook batch item',
+                'verbose_name_plural': 'Webhook batch items',
+                'ordering': ['id'],
+            },
+        ),
+    ]
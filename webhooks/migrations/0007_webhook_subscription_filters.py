@@ -0,0 +1,41 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:32
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('webhooks', '0006_webhook_batching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='filter_github_org',
+            field=models.CharField(blank=True, default='', max_length=39, validators=[django.core.validators.RegexValidator('^[A-Za-z0-9-]*$', 'Must be a valid GitHub user or organization name.')], verbose_name='GitHub organization filter'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='filter_min_rating',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)], verbose_name='Minimum rating filter'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='filter_owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Owner filter'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='subscription_key',
+            field=models.CharField(default='*', editable=False, max_length=50, verbose_name='Subscription key'),
+        ),
+        migrations.AddIndex(
+            model_name='webhook',
+            index=models.Index(fields=['subscription_key', 'id'], name='webhooks_subscription_idx'),
+        ),
+    ]
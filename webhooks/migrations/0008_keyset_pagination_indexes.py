@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0007_webhook_subscription_filters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhook',
+            index=models.Index(fields=['owner', 'id'], name='webhooks_owner_idx'),
+        ),
+    ]
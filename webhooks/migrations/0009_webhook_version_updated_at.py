@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+    ]
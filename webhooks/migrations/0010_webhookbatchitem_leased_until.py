@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0009_webhook_version_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookbatchitem',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Leased until'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+def mark_dispatched_events_streamed(apps, schema_editor):
+    # The relay used to publish events to the stream when it dispatched them
+    OutboxEvent = apps.get_model('webhooks', 'OutboxEvent')
+    OutboxEvent.objects.filter(dispatched_at__isnull=False).update(streamed_at=models.F('dispatched_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0010_webhookbatchitem_leased_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='streamed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Streamed at'),
+        ),
+        migrations.RunPython(mark_dispatched_events_streamed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('streamed_at__isnull', True)), fields=['id'], name='webhooks_outbox_unstreamed_idx'),
+        ),
+    ]
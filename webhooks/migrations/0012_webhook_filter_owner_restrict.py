@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('webhooks', '0011_outboxevent_streamed_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhook',
+            name='filter_owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Owner filter'),
+        ),
+    ]
@@ -1,5 +1,38 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.utils.translation import gettext_lazy as _
+from githubprojects.models import next_version
+
+
+def project_subscription_keys(project) -> list[str]:
+    """
+    Return the subscription keys a webhook may be indexed under to receive events of a Project object
+    """
+    return ['*', 'owner:{0}'.format(project.owner_id), 'org:{0}'.format(project.github_org)]
+
+
+class WebhookQuerySet(models.QuerySet['Webhook']):
+
+    def subscribed_to(self, project) -> 'WebhookQuerySet':
+        """
+        Webhooks whose subscription filters match a Project object
+
+        Candidates are looked up through the subscription_key index, so only
+        webhooks which may match are read, the remaining filters are checked
+        on those rows only.
+        """
+        return self.filter(
+            models.Q(filter_owner__isnull=True) | models.Q(filter_owner=project.owner_id),
+            models.Q(filter_github_org='') | models.Q(filter_github_org=project.github_org),
+            models.Q(filter_min_rating__isnull=True) | models.Q(filter_min_rating__lte=project.rating),
+            subscription_key__in=project_subscription_keys(project),
+        )
+
+
+class WebhookManager(models.Manager.from_queryset(WebhookQuerySet)):  # type: ignore[misc]
+    """
+    Manager of Webhook objects with the WebhookQuerySet methods
+    """
 
 
 class Webhook(models.Model):
@@ -11,6 +44,23 @@ class Webhook(models.Model):
 
     url - Is not blank and is a valid URL
     owner - Is not blank
+    rate_limit - Is empty or a positive number of requests per second
+    rate_limit_burst - Is empty or a positive number of requests
+    max_in_flight - Is empty or a positive number of concurrent requests
+    batch_enabled - Project events are buffered and delivered in batches
+    batch_max_size - Is a number of events between 1 and 1000, a full batch is delivered immediately
+    batch_linger - Is a number of seconds between 0 and 3600 an event may wait in the buffer
+    filter_owner - Is empty or a User, only their projects are delivered, the User cannot be deleted while
+        webhooks of other users filter on them
+    filter_github_org - Is empty or a GitHub user or organization name, only its projects are delivered
+    filter_min_rating - Is empty or a decimal between 1 and 5, only projects rated at least that are delivered
+
+    Empty limits fall back to the ones configured for the webhook host in settings.WEBHOOK_HOST_LIMITS
+
+    subscription_key - Is compiled from the filters on every save, it indexes the webhook
+        under its most selective equality filter, see WebhookQuerySet.subscribed_to()
+    version - Is increased on every save, it identifies a particular state of the object
+    updated_at - Is set on every save
 
     ModelSerializer class will handle the validation automatically
 
@@ -19,11 +69,207 @@ class Webhook(models.Model):
     url = models.URLField(_('URL'), max_length=200)
     owner = models.ForeignKey('auth.User', related_name='webhooks', on_delete=models.CASCADE)
     comment = models.CharField(_('Comment'), max_length=200, blank=True, default='')
+    rate_limit = models.FloatField(_('Rate limit'), null=True, blank=True, validators=[MinValueValidator(0.01)])
+    rate_limit_burst = models.PositiveIntegerField(_('Rate limit burst'), null=True, blank=True, validators=[MinValueValidator(1)])
+    max_in_flight = models.PositiveIntegerField(_('Max in flight'), null=True, blank=True, validators=[MinValueValidator(1)])
+    batch_enabled = models.BooleanField(_('Batch enabled'), default=False)
+    batch_max_size = models.PositiveIntegerField(_('Batch max size'), default=100, validators=[
+            MinValueValidator(1),
+            MaxValueValidator(1000),
+        ])
+    batch_linger = models.PositiveIntegerField(_('Batch linger'), default=5, validators=[
+            MinValueValidator(0),
+            MaxValueValidator(3600),
+        ])
+    filter_owner = models.ForeignKey('auth.User', verbose_name=_('Owner filter'), related_name='+', null=True, blank=True, on_delete=models.RESTRICT)
+    filter_github_org = models.CharField(_('GitHub organization filter'), max_length=39, blank=True, default='', validators=[
+            RegexValidator('^[A-Za-z0-9-]*$', 'Must be a valid GitHub user or organization name.'),
+        ])
+    filter_min_rating = models.DecimalField(_('Minimum rating filter'), null=True, blank=True, max_digits=3, decimal_places=2, validators=[
+            MinValueValidator(1),
+            MaxValueValidator(5),
+        ])
+    subscription_key = models.CharField(_('Subscription key'), max_length=50, default='*', editable=False)
+    version = models.PositiveIntegerField(_('Version'), default=1, editable=False)
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+
+    objects = WebhookManager()
     
     class Meta:
         verbose_name = _('Webhook')
         verbose_name_plural = _('Webhooks')
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['subscription_key', 'id'], name='webhooks_subscription_idx'),
+            # Webhooks are listed per owner, keyset pagination seeks on id
+            models.Index(fields=['owner', 'id'], name='webhooks_owner_idx'),
+        ]
+
+    def __str__(self):
+        return self.url
+
+    def compile_subscription_key(self) -> str:
+        if self.filter_owner_id is not None:
+            return 'owner:{0}'.format(self.filter_owner_id)
+        if self.filter_github_org:
+            return 'org:{0}'.format(self.filter_github_org)
+        return '*'
+
+    def save(self, *args, **kwargs):
+        self.filter_github_org = self.filter_github_org.lower()
+        self.subscription_key = self.compile_subscription_key()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'subscription_key', 'version', 'updated_at'}
+        with transaction.atomic():
+            if not self._state.adding:
+                self.version = next_version(self)
+            super().save(*args, **kwargs)
+
+
+class WebhookFanout(models.Model):
+    """
+    The WebhookFanout object
+
+    Aggregate completion record of delivering one Project event to all webhooks.
+    Deliveries are split into chunks which run as separate Celery tasks,
+    counters are filled in once every chunk has finished:
+
+    project - The Project the event is about
+    total - Number of webhooks the event is delivered to
+    chunks - Number of chunk tasks the delivery was split into
+    succeeded - Number of successful deliveries
+    failed - Number of failed deliveries
+    completed_at - When the last chunk finished, empty while the fan-out is running
+    """
+
+    project = models.ForeignKey('githubprojects.Project', related_name='fanouts', on_delete=models.CASCADE)
+    total = models.PositiveIntegerField(_('Total'), default=0)
+    chunks = models.PositiveIntegerField(_('Chunks'), default=0)
+    succeeded = models.PositiveIntegerField(_('Succeeded'), default=0)
+    failed = models.PositiveIntegerField(_('Failed'), default=0)
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    completed_at = models.DateTimeField(_('Completed at'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Webhook fan-out')
+        verbose_name_plural = _('Webhook fan-outs')
+        ordering = ['-id']
+
+    def __str__(self):
+        return 'Project {0} fan-out #{1}'.format(self.project_id, self.id)
+
+
+class WebhookDelivery(models.Model):
+    """
+    The WebhookDelivery object
+
+    Delivery of one Project event to one webhook. It is created after the first
+    attempt and updated after every retry:
+
+    webhook - The Webhook the event is delivered to
+    project - The Project the event is about
+    version - Version of the Project payload the event was created with
+    status - Succeeded, retrying (waiting for next_attempt_at) or dead-lettered
+    attempts - Number of attempts made so far
+    last_status_code - HTTP status code of the last attempt, empty if there was no response
+    last_error - Failure description of the last attempt
+    next_attempt_at - When the next retry is due, empty unless retrying
+    """
+
+    class Status(models.TextChoices):
+        SUCCEEDED = 'succeeded', _('Succeeded')
+        RETRYING = 'retrying', _('Retrying')
+        DEAD_LETTER = 'dead_letter', _('Dead letter')
+
+    webhook = models.ForeignKey(Webhook, related_name='deliveries', on_delete=models.CASCADE)
+    project = models.ForeignKey('githubprojects.Project', related_name='deliveries', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(_('Version'))
+    status = models.CharField(_('Status'), max_length=20, choices=Status.choices)
+    attempts = models.PositiveIntegerField(_('Attempts'), default=0)
+    last_status_code = models.PositiveSmallIntegerField(_('Last status code'), null=True, blank=True)
+    last_error = models.CharField(_('Last error'), max_length=500, blank=True, default='')
+    next_attempt_at = models.DateTimeField(_('Next attempt at'), null=True, blank=True)
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Webhook delivery')
+        verbose_name_plural = _('Webhook deliveries')
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhooks_delivery_due_idx'),
+        ]
+
+    def __str__(self):
+        return '{0} -> {1}'.format(self.project_id, self.webhook)
+
+
+class OutboxEvent(models.Model):
+    """
+    The OutboxEvent object
+
+    Event written in the same database transaction as the change it is about,
+    and published to Celery by the outbox relay once the transaction is committed:
+
+    event_type - What happened, eg. project.created
+    payload - Event data, eg. {"project_ids": [1, 2]}
+    dispatched_at - When the event was published, empty until then
+    streamed_at - When the event was published to the project stream, empty until then
+    """
+
+    class EventType(models.TextChoices):
+        PROJECT_CREATED = 'project.created', _('Project created')
+
+    event_type = models.CharField(_('Event type'), max_length=50, choices=EventType.choices)
+    payload = models.JSONField(_('Payload'), default=dict)
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    dispatched_at = models.DateTimeField(_('Dispatched at'), null=True, blank=True)
+    streamed_at = models.DateTimeField(_('Streamed at'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Outbox event')
+        verbose_name_plural = _('Outbox events')
+        ordering = ['id']
+        indexes = [
+            # The relay only ever looks for events which are not dispatched yet
+            models.Index(
+                fields=['id'],
+                condition=models.Q(dispatched_at__isnull=True),
+                name='webhooks_outbox_pending_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(streamed_at__isnull=True),
+                name='webhooks_outbox_unstreamed_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return '{0} #{1}'.format(self.event_type, self.id)
+
+
+class WebhookBatchItem(models.Model):
+    """
+    The WebhookBatchItem object
+
+    Project event buffered for a webhook in batching mode until its batch is delivered:
+
+    webhook - The Webhook the event is buffered for
+    project - The Project the event is about
+    flush_at - When the batch holding the event has to be delivered at the latest
+    leased_until - While the event is being delivered, when the worker delivering it is presumed lost
+    """
+
+    webhook = models.ForeignKey(Webhook, related_name='batch_items', on_delete=models.CASCADE)
+    project = models.ForeignKey('githubprojects.Project', related_name='batch_items', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    flush_at = models.DateTimeField(_('Flush at'), db_index=True)
+    leased_until = models.DateTimeField(_('Leased until'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Webhook batch item')
+        verbose_name_plural = _('Webhook batch items')
+        ordering = ['id']
 
     def __str__(self):
-        return self.url
\ No newline at end of file
+        return '{0} -> {1}'.format(self.project_id, self.webhook)
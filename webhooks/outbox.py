@@ -0,0 +1,96 @@
+from celery import group
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from typing import Iterable
+from webhooks.models import OutboxEvent
+from webhooks.stream import publish_projects_created
+
+
+def record_projects_created(project_ids: Iterable[int]) -> OutboxEvent:
+    """
+    Write a project.created event for one or many Project objects to the outbox
+
+    Must be called inside the transaction which creates the Project objects,
+    so the event is committed or rolled back together with them.
+    """
+    return OutboxEvent.objects.create(
+        event_type=OutboxEvent.EventType.PROJECT_CREATED,
+        payload={'project_ids': list(project_ids)},
+    )
+
+
+def relay(batch_size: int) -> int:
+    """
+    Publish pending outbox events to Celery in batches and mark them dispatched
+
+    Events are locked while they are published, so several relays can run at
+    once without publishing the same event twice. Publishing is at least once:
+    if the transaction fails after publishing, the events are published again
+    by the next relay run. Returns the number of published events.
+    """
+    # Imported here, tasks module imports this one
+    from webhooks.tasks import deliver_project_create_hook
+
+    published = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            project_ids = [project_id for event in events for project_id in event.payload['project_ids']]
+            group(
+                deliver_project_create_hook.s(project_id) for project_id in project_ids
+            ).apply_async()
+            OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                dispatched_at=timezone.now()
+            )
+        published += len(events)
+        if len(events) < batch_size:
+            break
+    return published
+
+
+def stream(batch_size: int) -> int:
+    """
+    Publish outbox events to the project stream in batches and mark them streamed
+
+    Runs apart from relay(), a failing Redis does not hold back webhook
+    deliveries. Events are locked while they are published, an event
+    published again after the transaction failed is skipped by
+    publish_projects_created(). Returns the number of streamed events.
+    """
+    streamed = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(streamed_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            for event in events:
+                publish_projects_created(event.id, event.payload['project_ids'])
+            OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                streamed_at=timezone.now()
+            )
+        streamed += len(events)
+        if len(events) < batch_size:
+            break
+    return streamed
+
+
+def prune(retention: int) -> int:
+    """
+    Delete events dispatched and streamed more than retention seconds ago
+
+    Returns the number of deleted events.
+    """
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=cutoff, streamed_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+from djangochallenge.routers import get_with_primary_fallback
+from githubprojects.models import Project
+from githubprojects.serializers import ProjectSerializer
+from githubprojects.views import ProjectDetail, ProjectList
+from rest_framework_json_api.renderers import JSONRenderer
+from typing import Iterable, Optional
+
+
+def render_project(project: Project) -> bytes:
+    """
+    Render a Project object to the same JSON:API document the API returns for it
+    """
+    return JSONRenderer().render(
+        ProjectSerializer(project).data,
+        renderer_context={'view': ProjectDetail()},
+    )
+
+
+def render_projects(projects: Iterable[Project]) -> bytes:
+    """
+    Render many Project objects to a single JSON:API document with a data array
+    """
+    return JSONRenderer().render(
+        ProjectSerializer(list(projects), many=True).data,
+        renderer_context={'view': ProjectList()},
+    )
+
+
+def project_payload_cache_key(project_id: int, version: int) -> str:
+    return 'webhooks:payload:project:{0}:{1}'.format(project_id, version)
+
+
+def get_project_payload(project_id: int, version: Optional[int] = None) -> bytes:
+    """
+    Return the encoded webhook payload of a Project object
+
+    The payload is rendered once per (project id, version) and the bytes are
+    cached, so every hook and every retry of one event reuse the same buffer.
+    When version is None, or the cached buffer has expired, the current state
+    of the Project object is rendered.
+    """
+    if version is not None:
+        payload = cache.get(project_payload_cache_key(project_id, version))
+        if payload is not None:
+            return payload
+    project = get_with_primary_fallback(Project.objects.select_related('owner'), id=project_id)
+    payload = render_project(project)
+    cache.set(
+        project_payload_cache_key(project.id, project.version),
+        payload,
+        settings.WEBHOOK_PAYLOAD_CACHE_TIMEOUT,
+    )
+    return payload
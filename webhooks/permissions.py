@@ -7,5 +7,6 @@ class IsOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        # Read and write permissions are only allowed to the owner of the object
-        return obj.owner == request.user
+        # Read and write permissions are only allowed to the owner of the object,
+        # compared by id so neither user is loaded
+        return obj.owner_id == request.user.id
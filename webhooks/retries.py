@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+from githubprojects.models import Project
+from typing import Iterable, Optional
+from webhooks.delivery import DeliveryOutcome
+from webhooks.models import Webhook, WebhookDelivery
+import random
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds to wait before the next attempt after attempts failed ones
+
+    The delay grows exponentially from settings.WEBHOOK_RETRY_BASE_DELAY up to
+    settings.WEBHOOK_RETRY_MAX_DELAY. Half of it is randomized, so deliveries
+    which failed together do not hit the receiver together again.
+    """
+    delay = min(settings.WEBHOOK_RETRY_MAX_DELAY, settings.WEBHOOK_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def next_attempt_at(attempts: int, now: Optional[datetime] = None) -> datetime:
+    return (now or timezone.now()) + timedelta(seconds=retry_delay(attempts))
+
+
+def apply_outcome(delivery: WebhookDelivery, outcome: DeliveryOutcome, now: datetime) -> None:
+    """
+    Update a WebhookDelivery object with the outcome of one more attempt
+
+    Deliveries which failed settings.WEBHOOK_DELIVERY_MAX_ATTEMPTS times are dead-lettered.
+    Deferred deliveries were not attempted, they are rescheduled without
+    using up an attempt, spread over settings.WEBHOOK_DEFER_JITTER seconds.
+    The object is not saved.
+    """
+    delivery.updated_at = now
+    if outcome.deferred:
+        delay = (outcome.retry_after or 0) + random.uniform(0, settings.WEBHOOK_DEFER_JITTER)
+        delivery.status = WebhookDelivery.Status.RETRYING
+        delivery.last_error = outcome.error[:500]
+        delivery.next_attempt_at = now + timedelta(seconds=delay)
+        return
+    delivery.attempts += 1
+    delivery.last_status_code = outcome.status_code
+    delivery.last_error = outcome.error[:500]
+    if outcome.ok:
+        delivery.status = WebhookDelivery.Status.SUCCEEDED
+        delivery.next_attempt_at = None
+    elif delivery.attempts >= settings.WEBHOOK_DELIVERY_MAX_ATTEMPTS:
+        delivery.status = WebhookDelivery.Status.DEAD_LETTER
+        delivery.next_attempt_at = None
+    else:
+        delivery.status = WebhookDelivery.Status.RETRYING
+        delivery.next_attempt_at = next_attempt_at(delivery.attempts, now)
+
+
+def record_first_attempts(project_id: int, version: int, outcomes: Iterable[DeliveryOutcome]) -> list[WebhookDelivery]:
+    """
+    Create WebhookDelivery objects for the first attempts of one event
+
+    Failed deliveries are scheduled for retry, the retries themselves are
+    picked up later by the retry_due_webhook_deliveries periodic task, so they
+    never hold up the first-attempt path.
+    """
+    now = timezone.now()
+    deliveries = []
+    for outcome in outcomes:
+        delivery = WebhookDelivery(webhook_id=outcome.webhook_id, project_id=project_id, version=version)
+        apply_outcome(delivery, outcome, now)
+        deliveries.append(delivery)
+    return WebhookDelivery.objects.bulk_create(deliveries)
+
+
+def record_batch_attempt(hook: Webhook, projects: Iterable[Project], outcome: DeliveryOutcome) -> list[WebhookDelivery]:
+    """
+    Create WebhookDelivery objects for every Project event of a delivered batch
+
+    Events of a failed batch are retried one by one, like any other failed delivery.
+    """
+    now = timezone.now()
+    deliveries = []
+    for project in projects:
+        delivery = WebhookDelivery(webhook_id=hook.id, project_id=project.id, version=project.version)
+        apply_outcome(delivery, outcome, now)
+        deliveries.append(delivery)
+    return WebhookDelivery.objects.bulk_create(deliveries)
+
+
+def redrive(deliveries: 'QuerySet[WebhookDelivery]') -> int:
+    """
+    Schedule dead-lettered deliveries for immediate retry with a fresh attempts budget
+
+    Returns the number of re-driven deliveries.
+    """
+    return deliveries.filter(status=WebhookDelivery.Status.DEAD_LETTER).update(
+        status=WebhookDelivery.Status.RETRYING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+    )
@@ -1,10 +1,43 @@
+from django.contrib.auth.models import User
 from rest_framework_json_api import serializers
-from webhooks.models import Webhook
+from webhooks.breaker import CircuitBreaker
+from webhooks.models import Webhook, WebhookDelivery
 
 
 class WebhookSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
+    # Username of the owner whose projects are delivered
+    filter_owner = serializers.CharField(required=False, allow_null=True)
+    circuit_state = serializers.SerializerMethodField()
 
     class Meta:
         model = Webhook
-        fields = ['id', 'url', 'owner', 'comment']
\ No newline at end of file
+        fields = [
+            'id', 'url', 'owner', 'comment',
+            'rate_limit', 'rate_limit_burst', 'max_in_flight',
+            'batch_enabled', 'batch_max_size', 'batch_linger',
+            'filter_owner', 'filter_github_org', 'filter_min_rating', 'circuit_state',
+        ]
+
+    def validate_filter_owner(self, value):
+        if value is None:
+            return None
+        try:
+            return User.objects.get(username=value)
+        except User.DoesNotExist:
+            raise serializers.ValidationError('User does not exist.')
+
+    def get_circuit_state(self, obj):
+        # State of the circuit breaker of the webhook destination host
+        return CircuitBreaker.for_url(obj.url).state()
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = WebhookDelivery
+        fields = [
+            'id', 'webhook', 'project', 'version', 'status', 'attempts',
+            'last_status_code', 'last_error', 'next_attempt_at', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
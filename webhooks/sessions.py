@@ -0,0 +1,113 @@
+from celery.signals import worker_process_shutdown
+from collections import OrderedDict
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from typing import Any, Optional
+from urllib.parse import urlsplit
+import requests
+import threading
+import time
+
+
+class SessionPool:
+    """
+    Worker scoped pool of HTTP sessions keyed by destination host
+
+    Every destination (scheme, host and port) gets its own requests.Session
+    with a keep-alive connection pool, so consecutive deliveries to the same
+    receiver skip the TCP connect, DNS lookup and TLS handshake.
+
+    pool_maxsize - Number of keep-alive connections kept per destination
+    max_hosts - Number of destinations kept at once, least recently used are closed first
+    idle_timeout - Seconds after which an unused destination session is closed
+    """
+
+    def __init__(self, pool_maxsize: int, max_hosts: int, idle_timeout: float) -> None:
+        self.pool_maxsize = pool_maxsize
+        self.max_hosts = max_hosts
+        self.idle_timeout = idle_timeout
+        self._sessions: OrderedDict[str, tuple[requests.Session, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        """
+        Return the pooled session for the destination of url
+        """
+        parts = urlsplit(url)
+        key = '{0}://{1}'.format(parts.scheme, parts.netloc).lower()
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            if key in self._sessions:
+                session, _ = self._sessions.pop(key)
+            else:
+                session = self._new_session()
+            self._sessions[key] = (session, now)
+            while len(self._sessions) > self.max_hosts:
+                _, (evicted, _) = self._sessions.popitem(last=False)
+                evicted.close()
+        return session
+
+    def evict_idle(self) -> None:
+        """
+        Close sessions which have not been used for idle_timeout seconds
+        """
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def close(self) -> None:
+        """
+        Close all pooled sessions and their connections
+        """
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_idle(self, now: float) -> None:
+        # Sessions are kept in least recently used order
+        while self._sessions:
+            key, (session, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._sessions[key]
+            session.close()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+_session_pool: Optional[SessionPool] = None
+_session_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    """
+    Return the session pool of the current worker process, creating it on first use
+    """
+    global _session_pool
+    if _session_pool is None:
+        with _session_pool_lock:
+            if _session_pool is None:
+                _session_pool = SessionPool(
+                    pool_maxsize=settings.WEBHOOK_HTTP_POOL_MAXSIZE,
+                    max_hosts=settings.WEBHOOK_HTTP_POOL_MAX_HOSTS,
+                    idle_timeout=settings.WEBHOOK_HTTP_POOL_IDLE_TIMEOUT,
+                )
+    return _session_pool
+
+
+@worker_process_shutdown.connect
+def close_session_pool(**kwargs: Any) -> None:
+    """
+    Close pooled connections when a Celery worker process exits
+    """
+    if _session_pool is not None:
+        _session_pool.close()
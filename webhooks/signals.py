@@ -1,8 +1,9 @@
 from django.db.models.signals import post_save
 from django.db.models.query import QuerySet
 from django.dispatch import receiver
-from webhooks.tasks import deliver_project_create_hook
+from webhooks.outbox import record_projects_created
 from githubprojects.models import Project
+from githubprojects.signals import projects_bulk_saved
 
 
 @receiver(post_save, sender=Project)
@@ -13,6 +14,17 @@ def send_project_created_hooks(sender: Project,**kwargs: Project) -> None:
     project = kwargs.get('instance',None)
     created = kwargs.get('created',False)
     if project and created:
-        # Run shared task for New Project webhooks delivery 
-        # outside of the request response cycle
-        deliver_project_create_hook.delay(project.id)        
+        # Record the event in the outbox within the Project saving transaction,
+        # the outbox relay runs New Project webhooks delivery
+        # outside of the request response cycle once it is committed
+        record_projects_created([project.id])
+
+
+@receiver(projects_bulk_saved, sender=Project)
+def send_projects_bulk_created_hooks(sender: Project, instances: list[Project], created: bool, **kwargs) -> None:
+    """
+    Send webhooks when creating Project objects in bulk
+    """
+    if created and instances:
+        # A single outbox event for the whole batch
+        record_projects_created([project.id for project in instances])
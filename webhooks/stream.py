@@ -0,0 +1,250 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from djangochallenge.redis_client import get_redis
+from githubprojects.models import Project
+from typing import Any, Iterable, Optional
+from webhooks.payloads import render_project
+import asyncio
+import re
+import threading
+import time
+
+# Recent events, read by clients resuming with Last-Event-ID
+STREAM_KEY = 'projects:stream'
+# New events, fanned in by a single subscriber per web process
+CHANNEL = 'projects:stream:live'
+# Set once the events of an outbox event are published, kept as long as outbox events
+GUARD_KEY = 'projects:stream:outbox:{0}'
+
+EVENT_TYPE = b'project.created'
+
+# Appends every document to the stream and publishes it prefixed with its stream id,
+# in one script so live and replayed events carry the same ids. The guard key of the
+# outbox event is set in the same script, an event is never appended twice.
+PUBLISH_SCRIPT = """
+if not redis.call('SET', KEYS[3], 1, 'NX', 'EX', ARGV[2]) then
+    return {}
+end
+local ids = {}
+for index = 3, #ARGV do
+    local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[index])
+    redis.call('PUBLISH', KEYS[2], id .. ' ' .. ARGV[index])
+    ids[#ids + 1] = id
+end
+return ids
+"""
+
+EVENT_ID = re.compile(r'^\d+-\d+$')
+
+
+def publish_projects_created(outbox_event_id: int, project_ids: Iterable[int]) -> list[bytes]:
+    """
+    Publish a project.created event per Project object of an outbox event to the connected stream clients
+
+    An outbox event is published once, publishing it again (eg. after the
+    relay transaction failed) is a no-op. Projects deleted in the meantime
+    are skipped. Returns the stream event ids.
+    """
+    projects = Project.objects.select_related('owner').filter(id__in=list(project_ids)).order_by('id')
+    documents = [render_project(project) for project in projects]
+    if not documents:
+        return []
+    return get_redis().eval(  # type: ignore[no-untyped-call]
+        PUBLISH_SCRIPT, 3, STREAM_KEY, CHANNEL, GUARD_KEY.format(outbox_event_id),
+        settings.PROJECT_STREAM_MAXLEN, settings.OUTBOX_RETENTION, *documents,
+    )
+
+
+def replay(last_event_id: str) -> list[tuple[bytes, bytes]]:
+    """
+    Return the (id, document) of the events published after last_event_id still kept in the stream
+    """
+    events = get_redis().xrange(STREAM_KEY, '(' + last_event_id, '+', count=settings.PROJECT_STREAM_MAXLEN)
+    return [(event_id, fields[b'data']) for event_id, fields in events]
+
+
+def event_key(event_id: bytes) -> tuple[int, int]:
+    milliseconds, sequence = event_id.split(b'-')
+    return int(milliseconds), int(sequence)
+
+
+def format_event(event_id: bytes, document: bytes) -> bytes:
+    # Documents are compact JSON, they fit on a single data line
+    return b'id: ' + event_id + b'\nevent: ' + EVENT_TYPE + b'\ndata: ' + document + b'\n\n'
+
+
+class Subscriber:
+    """
+    Fan-in of the Redis channel to the stream clients of the process
+
+    A single thread receives the published events and hands them to the
+    queue of every client in the event loop, so idle clients cost a queue
+    and a coroutine, not a Redis connection or a thread. A client whose
+    queue is full, or every client when the Redis connection is lost, is
+    disconnected and resumes with Last-Event-ID.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queues: set[asyncio.Queue[Optional[bytes]]] = set()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.listen, name='project-stream', daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def add(self, queue: asyncio.Queue[Optional[bytes]]) -> None:
+        self.queues.add(queue)
+
+    def discard(self, queue: asyncio.Queue[Optional[bytes]]) -> None:
+        self.queues.discard(queue)
+
+    def listen(self) -> None:
+        # Runs until the event loop of the clients is closed
+        while not self.loop.is_closed():
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(CHANNEL)
+                while not self.loop.is_closed():
+                    message = pubsub.get_message(timeout=1.0)
+                    # Set once the subscription is confirmed, events published later are not missed
+                    self.ready.set()
+                    if message is not None:
+                        self.loop.call_soon_threadsafe(self.dispatch, message['data'])
+            except Exception:
+                # Events published while reconnecting are only in the stream, clients resume from it
+                self.ready.clear()
+                if not self.loop.is_closed():
+                    self.loop.call_soon_threadsafe(self.disconnect_all)
+                time.sleep(1.0)
+            finally:
+                pubsub.close()
+
+    def dispatch(self, message: bytes) -> None:
+        for queue in list(self.queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.close(queue)
+
+    def disconnect_all(self) -> None:
+        for queue in list(self.queues):
+            self.close(queue)
+
+    def close(self, queue: asyncio.Queue[Optional[bytes]]) -> None:
+        self.queues.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+class ProjectEventStream:
+    """
+    ASGI application streaming project.created events as Server-Sent Events
+
+    Events are replayed from the Redis stream after Last-Event-ID (header,
+    or lastEventId query parameter), then pushed live as they are
+    published. Comments are sent every PROJECT_STREAM_HEARTBEAT seconds
+    so proxies keep idle connections open.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: dict[asyncio.AbstractEventLoop, Subscriber] = {}
+
+    def get_subscriber(self) -> Subscriber:
+        loop = asyncio.get_running_loop()
+        for closed in [closed for closed in self.subscribers if closed.is_closed()]:
+            del self.subscribers[closed]
+        subscriber = self.subscribers.get(loop)
+        if subscriber is None:
+            subscriber = self.subscribers[loop] = Subscriber(loop)
+            subscriber.start()
+        return subscriber
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] not in ('GET', 'HEAD'):
+            await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET, HEAD')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        last_event_id = self.get_last_event_id(scope)
+        if last_event_id is not None and not EVENT_ID.match(last_event_id):
+            await send({'type': 'http.response.start', 'status': 400, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Invalid Last-Event-ID'})
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        subscriber = self.get_subscriber()
+        queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=settings.PROJECT_STREAM_QUEUE_SIZE)
+        # Subscribed before replaying, events published in between are received twice and skipped
+        subscriber.add(queue)
+        if not subscriber.ready.is_set():
+            await asyncio.get_running_loop().run_in_executor(None, subscriber.ready.wait, 5.0)
+        disconnected: asyncio.Future[Any] = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.body', 'body': b'retry: 1000\n\n', 'more_body': True})
+            last_key = (0, 0)
+            if last_event_id is not None:
+                last_key = event_key(last_event_id.encode())
+                for event_id, document in await sync_to_async(replay, thread_sensitive=False)(last_event_id):
+                    await self.send_event(send, event_id, document)
+                    last_key = event_key(event_id)
+            while True:
+                message: asyncio.Future[Any] = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {message, disconnected},
+                    timeout=settings.PROJECT_STREAM_HEARTBEAT,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    message.cancel()
+                    return
+                if message not in done:
+                    message.cancel()
+                    await send({'type': 'http.response.body', 'body': b': heartbeat\n\n', 'more_body': True})
+                    continue
+                data = message.result()
+                if data is None:
+                    break
+                event_id, document = data.split(b' ', 1)
+                if event_key(event_id) <= last_key:
+                    continue
+                last_key = event_key(event_id)
+                await self.send_event(send, event_id, document)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            subscriber.discard(queue)
+            disconnected.cancel()
+
+    @staticmethod
+    def get_last_event_id(scope) -> Optional[str]:
+        for name, value in scope['headers']:
+            if name == b'last-event-id':
+                return value.decode('latin-1').strip()
+        # EventSource cannot set headers on the first connection
+        for parameter in scope.get('query_string', b'').decode('latin-1').split('&'):
+            name, _, value = parameter.partition('=')
+            if name == 'lastEventId':
+                return value
+        return None
+
+    @staticmethod
+    async def send_event(send, event_id: bytes, document: bytes) -> None:
+        await send({'type': 'http.response.body', 'body': format_event(event_id, document), 'more_body': True})
+
+    @staticmethod
+    async def wait_disconnect(receive) -> None:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
@@ -1,46 +1,230 @@
-from celery import shared_task
-from django.core.serializers.json import DjangoJSONEncoder
-from webhooks.models import Webhook
+from celery import chord, shared_task
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from itertools import groupby
+from typing import Iterator, Optional
+from djangochallenge.routers import get_with_primary_fallback, reads_from_replica
+from webhooks.batching import buffer_event, due_webhook_ids, flush
+from webhooks.delivery import deliver_concurrently
+from webhooks.models import Webhook, WebhookDelivery, WebhookFanout
+from webhooks.outbox import prune, relay, stream
+from webhooks.payloads import get_project_payload
+from webhooks.retries import apply_outcome, record_first_attempts
 from githubprojects.models import Project
-from typing_extensions import TypeAlias
-import requests
-import json
 
-ProjectJSONType: TypeAlias = dict[str, dict[str, object]]
+OutcomeListType = list[dict[str, object]]
+
+
+@shared_task
+def relay_outbox() -> int:
+    """
+    Publish pending outbox events, runs periodically
+
+    Returns the number of published events.
+    """
+    return relay(settings.OUTBOX_RELAY_BATCH_SIZE)
+
+
+@shared_task
+def stream_outbox() -> int:
+    """
+    Publish outbox events to the project stream, runs periodically
+
+    Returns the number of streamed events.
+    """
+    return stream(settings.OUTBOX_RELAY_BATCH_SIZE)
+
 
 @shared_task
-def deliver_project_create_hook(project_id: int) -> None:
+def prune_outbox() -> int:
+    """
+    Delete outbox events dispatched more than settings.OUTBOX_RETENTION seconds ago, runs periodically
+    """
+    return prune(settings.OUTBOX_RETENTION)
+
+
+@shared_task
+@reads_from_replica
+def deliver_project_create_hook(project_id: int) -> int:
     """
     Deliver project create hooks in an asynchronous manner
 
+    This task only coordinates the fan-out: ids of the webhooks subscribed to
+    the project are streamed in ranges of settings.WEBHOOK_FANOUT_CHUNK_SIZE
+    and every range is delivered by its own deliver_webhook_chunk task, so one
+    event can use the whole worker fleet. Subscribers are looked up through
+    the subscription index, webhooks filtering the project out are never read.
+    The payload is rendered here once, chunks reuse the cached bytes.
+    Reads go to a replica, which may not have the new project yet.
+    Returns the id of the WebhookFanout completion record.
+
     project_id: the id of the Project object
     """
-    project = Project.objects.get(id=project_id)
-    # TODO: There should be a better way to construct object payload in JSON:API format
-    data = {
-        "data": {
-            "type": project.__class__.__name__,
-            "id": project.id,
-            "attributes": {
-                "name": project.name,
-                "description": project.description,
-                "url": project.url,
-                "rating": project.rating,
-                "owner": project.owner.username
-            }
-        }
-    }
-    for hook in Webhook.objects.all():
-        send_post_request(hook.url,data)
-
-
-def send_post_request(target: str, data: ProjectJSONType) -> None:
-    try:
-        response = requests.post(
-            url=target,
-            data=json.dumps(data, cls=DjangoJSONEncoder),
-            headers={'Content-Type': 'application/vnd.api+json'}
+    project = get_with_primary_fallback(Project.objects.all(), id=project_id)
+    get_project_payload(project.id, project.version)
+    fanout = WebhookFanout.objects.create(project=project)
+    subscribers = Webhook.objects.subscribed_to(project)
+    header = [
+        deliver_webhook_chunk.s(project.id, project.version, first_id, last_id)
+        for first_id, last_id in webhook_id_ranges(settings.WEBHOOK_FANOUT_CHUNK_SIZE, subscribers)
+    ]
+    if not header:
+        WebhookFanout.objects.filter(id=fanout.id).update(completed_at=timezone.now())
+        return fanout.id
+    WebhookFanout.objects.filter(id=fanout.id).update(chunks=len(header))
+    chord(header)(record_fanout_completion.s(fanout.id))
+    return fanout.id
+
+
+@shared_task
+@reads_from_replica
+def deliver_webhook_chunk(project_id: int, version: int, first_id: int, last_id: int) -> OutcomeListType:
+    """
+    Deliver a project create hook to the subscribed webhooks with ids in [first_id, last_id]
+
+    Every attempt is recorded as a WebhookDelivery object, failed ones are
+    retried later by retry_due_webhook_deliveries. Webhooks in batching mode
+    only get the event buffered, it is delivered with their next batch.
+    Returns a list of per-hook outcomes of immediate deliveries.
+    """
+    project = get_with_primary_fallback(Project.objects.only('id', 'url', 'rating', 'owner_id'), id=project_id)
+    hooks = Webhook.objects.subscribed_to(project).filter(id__gte=first_id, id__lte=last_id).only(
+        'id', 'url', 'rate_limit', 'rate_limit_burst', 'max_in_flight',
+        'batch_enabled', 'batch_max_size', 'batch_linger',
+    )
+    immediate: list[Webhook] = []
+    batched: list[Webhook] = []
+    for hook in hooks:
+        (batched if hook.batch_enabled else immediate).append(hook)
+    for webhook_id in buffer_event(project_id, batched):
+        flush_webhook_batch.delay(webhook_id, full_only=True)
+    if not immediate:
+        return []
+    payload = get_project_payload(project_id, version)
+    outcomes = deliver_concurrently(immediate, payload)
+    record_first_attempts(project_id, version, outcomes)
+    return [outcome._asdict() for outcome in outcomes]
+
+
+@shared_task
+def record_fanout_completion(chunk_results: list[OutcomeListType], fanout_id: int) -> None:
+    """
+    Fill in the aggregate WebhookFanout record once every chunk has finished
+    """
+    outcomes = [outcome for chunk in chunk_results for outcome in chunk]
+    succeeded = sum(1 for outcome in outcomes if outcome['ok'])
+    WebhookFanout.objects.filter(id=fanout_id).update(
+        total=F('total') + len(outcomes),
+        succeeded=F('succeeded') + succeeded,
+        failed=F('failed') + len(outcomes) - succeeded,
+        completed_at=timezone.now(),
+    )
+
+
+@shared_task
+def retry_due_webhook_deliveries() -> int:
+    """
+    Dispatch retries of the deliveries whose next attempt is due
+
+    Runs periodically. Due deliveries are leased by moving next_attempt_at
+    forward, so they are not dispatched twice while their retry is queued
+    or running. Returns the number of dispatched deliveries.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        delivery_ids = list(
+            WebhookDelivery.objects.select_for_update(skip_locked=True)
+            .filter(status=WebhookDelivery.Status.RETRYING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:settings.WEBHOOK_RETRY_BATCH_SIZE]
+        )
+        WebhookDelivery.objects.filter(id__in=delivery_ids).update(
+            next_attempt_at=now + timedelta(seconds=settings.WEBHOOK_RETRY_LEASE)
         )
-    except:
-        # TODO: Implement some exception workaround logic  
-        pass
\ No newline at end of file
+    chunk_size = settings.WEBHOOK_FANOUT_CHUNK_SIZE
+    for index in range(0, len(delivery_ids), chunk_size):
+        retry_webhook_deliveries.delay(delivery_ids[index:index + chunk_size])
+    return len(delivery_ids)
+
+
+@shared_task
+def retry_webhook_deliveries(delivery_ids: list[int]) -> None:
+    """
+    Make one more attempt for each of the given WebhookDelivery objects
+    """
+    deliveries = list(
+        WebhookDelivery.objects.select_related('webhook')
+        .filter(id__in=delivery_ids, status=WebhookDelivery.Status.RETRYING)
+        .order_by('project_id', 'version')
+    )
+    for (project_id, version), group in groupby(deliveries, key=lambda d: (d.project_id, d.version)):
+        batch = list(group)
+        payload = get_project_payload(project_id, version)
+        outcomes = deliver_concurrently([delivery.webhook for delivery in batch], payload)
+        now = timezone.now()
+        for delivery, outcome in zip(batch, outcomes):
+            apply_outcome(delivery, outcome, now)
+        WebhookDelivery.objects.bulk_update(
+            batch, ['status', 'attempts', 'last_status_code', 'last_error', 'next_attempt_at', 'updated_at']
+        )
+
+
+@shared_task
+def flush_due_webhook_batches() -> int:
+    """
+    Dispatch delivery of the batches whose oldest event has lingered long enough, runs periodically
+
+    Returns the number of dispatched batches.
+    """
+    webhook_ids = due_webhook_ids(timezone.now())
+    for webhook_id in webhook_ids:
+        flush_webhook_batch.delay(webhook_id)
+    return len(webhook_ids)
+
+
+@shared_task
+def flush_webhook_batch(webhook_id: int, full_only: bool = False) -> int:
+    """
+    Deliver buffered events of a webhook in batches of at most batch_max_size events
+
+    The first batch may be a partial one unless full_only is set, the following
+    ones are always full, a partial remainder waits for its linger time.
+    Returns the number of delivered events.
+    """
+    delivered = 0
+    while True:
+        flushed = flush(webhook_id, full_only)
+        delivered += flushed
+        if not flushed:
+            return delivered
+        full_only = True
+
+
+def webhook_id_ranges(chunk_size: int, hooks: Optional['QuerySet[Webhook]'] = None) -> Iterator[tuple[int, int]]:
+    """
+    Stream ids of hooks (all webhooks by default) in ascending order and
+    yield (first_id, last_id) ranges covering chunk_size webhooks each
+
+    Ids are read with a server-side cursor where the database supports it,
+    so the Webhook table is never loaded into memory at once.
+    """
+    first_id = last_id = None
+    count = 0
+    if hooks is None:
+        hooks = Webhook.objects.all()
+    ids = hooks.order_by('id').values_list('id', flat=True)
+    for webhook_id in ids.iterator(chunk_size=chunk_size):
+        if first_id is None:
+            first_id = webhook_id
+        last_id = webhook_id
+        count += 1
+        if count == chunk_size:
+            yield first_id, last_id
+            first_id = None
+            count = 0
+    if first_id is not None and last_id is not None:
+        yield first_id, last_id
+
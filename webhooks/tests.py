@@ -3,13 +3,35 @@ from django.contrib.auth.models import User
 from rest_framework import status
 from rest_framework.test import APITestCase, APISimpleTestCase
 from rest_framework.authtoken.models import Token
-from webhooks.models import Webhook
+from webhooks.models import OutboxEvent, Webhook, WebhookBatchItem, WebhookDelivery, WebhookFanout
+from webhooks.delivery import deliver_concurrently
+from webhooks.sessions import SessionPool
 from githubprojects.models import Project
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import RestrictedError
 from celery.contrib.testing.worker import start_worker
 from djangochallenge.celery import app
+from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import patch
+from webhooks.tasks import (
+    flush_due_webhook_batches, flush_webhook_batch, relay_outbox, retry_due_webhook_deliveries, stream_outbox,
+    webhook_id_ranges,
+)
+from webhooks.retries import retry_delay
+from webhooks.breaker import CircuitBreaker, CircuitState
+from webhooks.throttling import DeliveryLimits, HostThrottle, limits_for
+from djangochallenge.redis_client import get_redis
+from django.utils import timezone
+from webhooks.payloads import get_project_payload, render_project
+from webhooks.stream import GUARD_KEY, STREAM_KEY, ProjectEventStream, publish_projects_created
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+import time
+import requests
+import threading
 import json
 
 
@@ -217,6 +239,7 @@ class WebhookCeleryTasksTests(SimpleTestCase):
         cls.celery_worker.__exit__(None, None, None)
 
     def setUp(self):
+        cache.clear()
         self.user1 = User.objects.create_user(
             username='testuser1', 
             password='12345',
@@ -227,12 +250,13 @@ class WebhookCeleryTasksTests(SimpleTestCase):
             owner=self.user1,
         )
 
-    @patch('webhooks.tasks.requests.post')
+    @patch('webhooks.sessions.requests.Session.post')
     def test_webhooks_on_project_creation(self,mock):
         """
         Ensure we send webhooks with correct payload on Project creation 
         """
         mock.return_value.ok = True
+        mock.return_value.status_code = 200
 
         pjct_name = 'Project Two'
         pjct_description = 'Some basic description'
@@ -246,15 +270,944 @@ class WebhookCeleryTasksTests(SimpleTestCase):
             rating=pjct_rating,
             owner=self.user1,
         )
+        # Publish the outbox event, the worker delivers webhooks in the background
+        self.assertEqual(relay_outbox(), 1)
+        deadline = time.monotonic() + 10
+        while not mock.called and time.monotonic() < deadline:
+            time.sleep(0.05)
 
         mock_call_args, mock_call_kwargs = mock.call_args_list[0]
         webhook_payload = json.loads(mock_call_kwargs['data'])
         self.assertEqual(mock.call_count, 1)
         self.assertEqual(mock_call_kwargs['url'], self.user1_webhook.url)
         self.assertEqual(webhook_payload['data']['type'], 'Project')
-        self.assertEqual(webhook_payload['data']['id'], project.id)
+        self.assertEqual(webhook_payload['data']['id'], str(project.id))
         self.assertEqual(webhook_payload['data']['attributes']['name'], project.name)
         self.assertEqual(webhook_payload['data']['attributes']['description'], project.description)
         self.assertEqual(webhook_payload['data']['attributes']['url'], project.url)
         self.assertEqual(webhook_payload['data']['attributes']['rating'], str(project.rating))
-        self.assertEqual(webhook_payload['data']['attributes']['owner'], project.owner.username)
\ No newline at end of file
+        self.assertEqual(webhook_payload['data']['attributes']['owner'], project.owner.username)
+
+
+class WebhookDeliveryEngineTests(SimpleTestCase):
+    """
+    Concurrent webhook delivery engine tests
+    """
+    def setUp(self):
+        self.hooks = [
+            Webhook(id=hook_id, url='https://example.com/hook-{0}'.format(hook_id))
+            for hook_id in range(1, 5)
+        ]
+        self.payload = json.dumps({'data': {'type': 'Project', 'id': '1'}}).encode()
+
+    @patch('webhooks.sessions.requests.Session.post')
+    def test_deliveries_are_sent_in_parallel(self, mock):
+        """
+        Ensure all deliveries of one event are in flight at the same time
+        """
+        # Every request waits until all of them have started, so a sequential
+        # engine would break the barrier instead of passing it
+        barrier = threading.Barrier(len(self.hooks), timeout=5)
+
+        def post(**kwargs):
+            barrier.wait()
+            response = requests.Response()
+            response.status_code = 200
+            return response
+
+        mock.side_effect = post
+        outcomes = deliver_concurrently(self.hooks, self.payload, max_in_flight=len(self.hooks))
+        self.assertEqual(mock.call_count, len(self.hooks))
+        self.assertTrue(all(call.kwargs['data'] == self.payload for call in mock.call_args_list))
+        self.assertTrue(all(outcome.ok for outcome in outcomes))
+
+    @patch('webhooks.sessions.requests.Session.post')
+    def test_outcome_is_reported_per_hook(self, mock):
+        """
+        Ensure each hook gets its own outcome, in the order of the hooks
+        """
+        def post(url, **kwargs):
+            if url.endswith('-2'):
+                raise requests.ConnectionError('Connection refused')
+            response = requests.Response()
+            response.status_code = 500 if url.endswith('-3') else 204
+            return response
+
+        mock.side_effect = post
+        outcomes = deliver_concurrently(self.hooks, self.payload, max_in_flight=2)
+        self.assertEqual([outcome.webhook_id for outcome in outcomes], [1, 2, 3, 4])
+        self.assertEqual([outcome.ok for outcome in outcomes], [True, False, False, True])
+        self.assertIsNone(outcomes[1].status_code)
+        self.assertIn('Connection refused', outcomes[1].error)
+        self.assertEqual(outcomes[2].status_code, 500)
+        self.assertEqual(outcomes[2].error, 'HTTP 500')
+
+
+class SessionPoolTests(SimpleTestCase):
+    """
+    Pooled HTTP sessions tests
+    """
+    def test_sessions_are_reused_per_destination_host(self):
+        """
+        Ensure the same session serves every URL of one host, and hosts do not share sessions
+        """
+        pool = SessionPool(pool_maxsize=2, max_hosts=10, idle_timeout=60)
+        first = pool.session_for('https://example.com/hook-1')
+        self.assertIs(pool.session_for('https://EXAMPLE.com/hook-2?x=1'), first)
+        self.assertIsNot(pool.session_for('https://example.org/hook-1'), first)
+        self.assertIsNot(pool.session_for('http://example.com/hook-1'), first)
+        self.assertEqual(len(pool), 3)
+        pool.close()
+        self.assertEqual(len(pool), 0)
+
+    def test_least_recently_used_hosts_are_evicted(self):
+        """
+        Ensure the pool never keeps more than max_hosts destinations
+        """
+        pool = SessionPool(pool_maxsize=2, max_hosts=2, idle_timeout=60)
+        first = pool.session_for('https://one.example.com/')
+        pool.session_for('https://two.example.com/')
+        pool.session_for('https://one.example.com/')
+        pool.session_for('https://three.example.com/')
+        self.assertEqual(len(pool), 2)
+        # one.example.com was used more recently than two.example.com
+        self.assertIs(pool.session_for('https://one.example.com/'), first)
+
+    def test_idle_sessions_are_evicted(self):
+        """
+        Ensure sessions unused for idle_timeout seconds are closed
+        """
+        pool = SessionPool(pool_maxsize=2, max_hosts=10, idle_timeout=0.05)
+        first = pool.session_for('https://example.com/')
+        time.sleep(0.1)
+        pool.evict_idle()
+        self.assertEqual(len(pool), 0)
+        self.assertIsNot(pool.session_for('https://example.com/'), first)
+
+
+class WebhookFanoutTests(TestCase):
+    """
+    Chunked webhook fan-out tests
+    """
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        self.hooks = [
+            Webhook.objects.create(
+                url='https://example.com/hook-{0}'.format(index),
+                owner=self.user1,
+            )
+            for index in range(5)
+        ]
+        cache.clear()
+        # Run Celery tasks (including chords) synchronously
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def test_webhook_ids_are_streamed_in_ranges(self):
+        """
+        Ensure webhook ids are split into ranges of chunk size webhooks
+        """
+        ids = [hook.id for hook in self.hooks]
+        self.assertEqual(
+            list(webhook_id_ranges(2)),
+            [(ids[0], ids[1]), (ids[2], ids[3]), (ids[4], ids[4])],
+        )
+        self.assertEqual(list(webhook_id_ranges(10)), [(ids[0], ids[4])])
+
+    @override_settings(WEBHOOK_FANOUT_CHUNK_SIZE=2)
+    @patch('webhooks.sessions.requests.Session.post')
+    def test_fanout_is_split_into_chunks_and_recorded(self, mock):
+        """
+        Ensure every webhook gets one delivery and the fan-out record aggregates all chunks
+        """
+        def post(url, **kwargs):
+            response = requests.Response()
+            response.status_code = 500 if url.endswith('-4') else 200
+            return response
+
+        mock.side_effect = post
+        project = Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user1,
+        )
+        relay_outbox()
+        self.assertEqual(
+            sorted(call.kwargs['url'] for call in mock.call_args_list),
+            sorted(hook.url for hook in self.hooks),
+        )
+        fanout = WebhookFanout.objects.get(project=project)
+        self.assertEqual(fanout.chunks, 3)
+        self.assertEqual(fanout.total, 5)
+        self.assertEqual(fanout.succeeded, 4)
+        self.assertEqual(fanout.failed, 1)
+        self.assertIsNotNone(fanout.completed_at)
+
+
+class WebhookPayloadTests(APITestCase):
+    """
+    Webhook payload pipeline tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        self.project = Project.objects.create(
+            name='Project One',
+            description='Some basic description',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            rating=Decimal('4.99'),
+            owner=self.user1,
+        )
+
+    def test_payload_is_the_api_representation(self):
+        """
+        Ensure the webhook payload is exactly what the API returns for the Project
+        """
+        response = self.client.get(reverse('project-detail', kwargs={'pk': self.project.id}))
+        self.assertEqual(get_project_payload(self.project.id, self.project.version), response.content)
+
+    @patch('webhooks.payloads.render_project', wraps=render_project)
+    def test_payload_is_rendered_once_per_version(self, mock):
+        """
+        Ensure the payload is encoded once per Project version and reused afterwards
+        """
+        payload = get_project_payload(self.project.id, self.project.version)
+        self.assertEqual(get_project_payload(self.project.id, self.project.version), payload)
+        self.assertEqual(mock.call_count, 1)
+
+        self.project.name = 'Project Number One'
+        self.project.save()
+        changed = get_project_payload(self.project.id, self.project.version)
+        self.assertEqual(json.loads(changed)['data']['attributes']['name'], 'Project Number One')
+        self.assertEqual(mock.call_count, 2)
+
+
+class WebhookDeliveryRetryTests(APITestCase):
+    """
+    Webhook delivery retry and dead-letter tests
+    """
+    def setUp(self):
+        cache.clear()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        self.status_code = 503
+        post = patch('webhooks.sessions.requests.Session.post', side_effect=self.post)
+        self.mock = post.start()
+        self.addCleanup(post.stop)
+
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        user1_token = Token.objects.create(user=self.user1)
+        self.user1_auth_header = 'Token ' + user1_token.key
+        self.user1_webhook = Webhook.objects.create(
+            url='https://example.com/hook',
+            owner=self.user1,
+        )
+        self.project = Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user1,
+        )
+        relay_outbox()
+
+    def post(self, **kwargs):
+        response = requests.Response()
+        response.status_code = self.status_code
+        return response
+
+    def make_due(self):
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+
+    def test_failed_first_attempt_is_scheduled_for_retry(self):
+        """
+        Ensure a failed delivery is recorded and scheduled for a later retry
+        """
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.webhook, self.user1_webhook)
+        self.assertEqual(delivery.status, WebhookDelivery.Status.RETRYING)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(delivery.last_status_code, 503)
+        self.assertGreater(delivery.next_attempt_at, timezone.now())
+        # Nothing is retried before the next attempt is due
+        self.assertEqual(retry_due_webhook_deliveries(), 0)
+        self.assertEqual(self.mock.call_count, 1)
+
+    def test_due_delivery_is_retried(self):
+        """
+        Ensure due deliveries are retried with the original payload
+        """
+        self.make_due()
+        self.status_code = 200
+        self.assertEqual(retry_due_webhook_deliveries(), 1)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.Status.SUCCEEDED)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertIsNone(delivery.next_attempt_at)
+        first_call, retry_call = self.mock.call_args_list
+        self.assertEqual(retry_call.kwargs['data'], first_call.kwargs['data'])
+
+    @override_settings(WEBHOOK_DELIVERY_MAX_ATTEMPTS=2)
+    def test_delivery_is_dead_lettered_after_max_attempts(self):
+        """
+        Ensure a delivery which keeps failing ends up dead-lettered
+        """
+        self.make_due()
+        retry_due_webhook_deliveries()
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.Status.DEAD_LETTER)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertIsNone(delivery.next_attempt_at)
+        self.make_due()
+        self.assertEqual(retry_due_webhook_deliveries(), 0)
+
+    @override_settings(WEBHOOK_RETRY_BASE_DELAY=10, WEBHOOK_RETRY_MAX_DELAY=60)
+    def test_retry_delay_grows_exponentially_with_jitter(self):
+        """
+        Ensure the retry delay doubles with every attempt up to the maximum
+        """
+        for attempts, delay in [(1, 10), (2, 20), (3, 40), (4, 60), (10, 60)]:
+            self.assertTrue(delay / 2 <= retry_delay(attempts) <= delay)
+
+    def test_user_can_redrive_dead_lettered_deliveries(self):
+        """
+        Ensure dead-lettered deliveries of user's webhooks can be re-driven through the API
+        """
+        WebhookDelivery.objects.update(status=WebhookDelivery.Status.DEAD_LETTER, next_attempt_at=None)
+        user2 = User.objects.create_user(
+            username='testuser2',
+            password='12345',
+        )
+        auth_header2 = 'Token ' + Token.objects.create(user=user2).key
+        url = reverse('webhook-delivery-redrive')
+
+        self.client.credentials(HTTP_AUTHORIZATION=auth_header2)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'meta': {'redriven': 0}})
+
+        self.client.credentials(HTTP_AUTHORIZATION=self.user1_auth_header)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'meta': {'redriven': 1}})
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.Status.RETRYING)
+        self.assertEqual(delivery.attempts, 0)
+
+        response = self.client.get(reverse('webhook-delivery-list'), {'filter[status]': 'retrying'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+@override_settings(WEBHOOK_BREAKER_FAILURE_THRESHOLD=3, WEBHOOK_BREAKER_COOLDOWN=60)
+class CircuitBreakerTests(APITestCase):
+    """
+    Webhook destination circuit breaker tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker.for_url('https://Example.com/hook')
+
+    def open_cooldown_elapsed(self):
+        cache.set(self.breaker.open_until_key, time.time() - 1, None)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        """
+        Ensure the circuit opens after threshold consecutive failures only
+        """
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), CircuitState.CLOSED)
+        self.assertIsNone(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), CircuitState.OPEN)
+        self.assertGreater(self.breaker.allow_request(), 0)
+        # The breaker is shared by every URL of the host
+        self.assertEqual(CircuitBreaker.for_url('https://example.com/other-hook').state(), CircuitState.OPEN)
+
+    def test_half_open_circuit_lets_a_single_probe_through(self):
+        """
+        Ensure only one probe is sent after the cooldown, and its outcome decides the state
+        """
+        self.breaker.trip()
+        self.open_cooldown_elapsed()
+        self.assertEqual(self.breaker.state(), CircuitState.HALF_OPEN)
+        self.assertIsNone(self.breaker.allow_request())
+        self.assertIsNotNone(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), CircuitState.OPEN)
+
+        self.open_cooldown_elapsed()
+        self.assertIsNone(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state(), CircuitState.CLOSED)
+
+    @patch('webhooks.sessions.requests.Session.post')
+    def test_deliveries_to_open_circuit_are_deferred(self, mock):
+        """
+        Ensure deliveries to a host with an open circuit are not sent and do not use up attempts
+        """
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        user1_token = Token.objects.create(user=user1)
+        webhook = Webhook.objects.create(url='https://example.com/hook', owner=user1)
+        self.breaker.trip()
+        Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=user1,
+        )
+        relay_outbox()
+        self.assertEqual(mock.call_count, 0)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.Status.RETRYING)
+        self.assertEqual(delivery.attempts, 0)
+        self.assertGreater(delivery.next_attempt_at, timezone.now())
+
+        # Breaker state is exposed on the Webhook API
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + user1_token.key)
+        response = self.client.get(reverse('webhook-detail', kwargs={'pk': webhook.id}))
+        self.assertEqual(response.data['circuit_state'], CircuitState.OPEN)
+
+
+class OutboxTests(TestCase):
+    """
+    Transactional outbox tests
+    """
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+
+    def create_project(self):
+        return Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user1,
+        )
+
+    @patch('webhooks.tasks.deliver_project_create_hook.apply_async')
+    def test_project_creation_only_writes_outbox_event(self, mock):
+        """
+        Ensure creating a Project writes an outbox event and does not talk to the broker
+        """
+        project = self.create_project()
+        project.save()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event_type, OutboxEvent.EventType.PROJECT_CREATED)
+        self.assertEqual(event.payload, {'project_ids': [project.id]})
+        self.assertIsNone(event.dispatched_at)
+        self.assertEqual(mock.call_count, 0)
+
+    def test_outbox_event_is_rolled_back_with_project(self):
+        """
+        Ensure no event is left behind when the Project creating transaction is rolled back
+        """
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_project()
+                raise RuntimeError
+        self.assertEqual(OutboxEvent.objects.count(), 0)
+
+    @override_settings(OUTBOX_RELAY_BATCH_SIZE=2)
+    @patch('webhooks.outbox.group')
+    def test_relay_publishes_pending_events_in_batches(self, mock):
+        """
+        Ensure the relay publishes every pending event once, in batches
+        """
+        projects = [self.create_project() for index in range(3)]
+        self.assertEqual(relay_outbox(), 3)
+        self.assertEqual(mock.call_count, 2)
+        published = [
+            signature.args[0]
+            for call in mock.call_args_list
+            for signature in call.args[0]
+        ]
+        self.assertEqual(published, [project.id for project in projects])
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+        self.assertEqual(relay_outbox(), 0)
+
+
+class ProjectStreamTests(TestCase):
+    """
+    Server-Sent Events project stream tests
+    """
+    def setUp(self):
+        get_redis().delete(STREAM_KEY, *get_redis().keys(GUARD_KEY.format('*')))
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        self.project1 = Project.objects.create(
+            name='Project One',
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user1,
+        )
+        self.project2 = Project.objects.create(
+            name='Project Two',
+            url='https://github.com/fedorkosilov/bookish-octo-broccoli',
+            owner=self.user1,
+        )
+
+    def connect(self, headers=(), query_string=b''):
+        return ApplicationCommunicator(ProjectEventStream(), {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/projects/stream',
+            'headers': list(headers),
+            'query_string': query_string,
+        })
+
+    async def receive_event(self, communicator):
+        message = await communicator.receive_output(timeout=5)
+        self.assertTrue(message['more_body'])
+        return message['body']
+
+    async def test_missed_events_are_replayed_after_last_event_id(self):
+        """
+        Ensure a client reconnecting with Last-Event-ID receives the events published since
+        """
+        first_id, = await sync_to_async(publish_projects_created)(1, [self.project1.id])
+        second_id, = await sync_to_async(publish_projects_created)(2, [self.project2.id])
+        communicator = self.connect(headers=[(b'last-event-id', first_id)])
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(timeout=5)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertEqual(await self.receive_event(communicator), b'retry: 1000\n\n')
+        event = await self.receive_event(communicator)
+        self.assertTrue(event.startswith(b'id: ' + second_id + b'\nevent: project.created\ndata: '))
+        self.assertEqual(json.loads(event.split(b'data: ', 1)[1])['data']['attributes']['name'], 'Project Two')
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(timeout=5)
+
+    async def test_created_projects_are_pushed_to_connected_clients(self):
+        """
+        Ensure events published while a client is connected are pushed to it once
+        """
+        communicator = self.connect()
+        await communicator.send_input({'type': 'http.request'})
+        await communicator.receive_output(timeout=5)
+        self.assertEqual(await self.receive_event(communicator), b'retry: 1000\n\n')
+        event_id, = await sync_to_async(publish_projects_created)(1, [self.project1.id])
+        event = await self.receive_event(communicator)
+        self.assertTrue(event.startswith(b'id: ' + event_id + b'\n'))
+        self.assertIn(b'"Project One"', event)
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(timeout=5)
+
+    async def test_invalid_last_event_id_is_rejected(self):
+        """
+        Ensure a malformed Last-Event-ID is answered with 400
+        """
+        communicator = self.connect(query_string=b'lastEventId=0-0%27')
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(timeout=5)
+        self.assertEqual(start['status'], 400)
+
+    def test_outbox_events_are_streamed_once(self):
+        """
+        Ensure every outbox event is appended to the stream once, even when published again
+        """
+        self.assertEqual(stream_outbox(), 2)
+        events = get_redis().xrange(STREAM_KEY)
+        self.assertEqual(
+            [json.loads(fields[b'data'])['data']['id'] for _, fields in events],
+            [str(self.project1.id), str(self.project2.id)],
+        )
+        self.assertFalse(OutboxEvent.objects.filter(streamed_at__isnull=True).exists())
+        self.assertEqual(stream_outbox(), 0)
+        # Eg. the streaming transaction failed after publishing
+        event = OutboxEvent.objects.first()
+        self.assertEqual(publish_projects_created(event.id, event.payload['project_ids']), [])
+        self.assertEqual(get_redis().xrange(STREAM_KEY), events)
+
+    @patch('webhooks.outbox.group')
+    def test_stream_failures_do_not_hold_back_deliveries(self, mock):
+        """
+        Ensure events are dispatched to Celery while the stream is unavailable
+        """
+        with patch('webhooks.outbox.publish_projects_created', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                stream_outbox()
+        self.assertEqual(relay_outbox(), 2)
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+        self.assertEqual(OutboxEvent.objects.filter(streamed_at__isnull=True).count(), 2)
+
+
+class HostThrottleTests(SimpleTestCase):
+    """
+    Per-host rate limit and in-flight cap tests
+    """
+    def setUp(self):
+        get_redis().delete(
+            'webhooks:throttle:example.com:bucket',
+            'webhooks:throttle:example.com:in_flight',
+        )
+
+    def throttle(self, rate=None, burst=1, max_in_flight=None):
+        return HostThrottle('example.com', DeliveryLimits(rate, burst, max_in_flight))
+
+    def test_token_bucket_limits_request_rate(self):
+        """
+        Ensure a burst of requests is let through and the rest has to wait for tokens
+        """
+        self.assertIsNone(self.throttle(rate=1, burst=2).acquire())
+        self.assertIsNone(self.throttle(rate=1, burst=2).acquire())
+        wait = self.throttle(rate=1, burst=2).acquire()
+        self.assertTrue(0 < wait <= 1)
+
+    @override_settings(WEBHOOK_THROTTLE_BUSY_DELAY=2)
+    def test_in_flight_requests_are_capped(self):
+        """
+        Ensure no more than max_in_flight requests are sent at once
+        """
+        first = self.throttle(max_in_flight=1)
+        self.assertIsNone(first.acquire())
+        self.assertEqual(self.throttle(max_in_flight=1).acquire(), 2)
+        first.release()
+        self.assertIsNone(self.throttle(max_in_flight=1).acquire())
+
+    @override_settings(WEBHOOK_DELIVERY_CONNECT_TIMEOUT=0.05, WEBHOOK_DELIVERY_READ_TIMEOUT=0.1)
+    def test_slots_of_requests_in_flight_are_renewed(self):
+        """
+        Ensure a request in flight for longer than the lease keeps its slot, and an idle one loses it
+        """
+        first = self.throttle(max_in_flight=1)
+        self.assertIsNone(first.acquire())
+        with first.renewing():
+            time.sleep(0.4)
+            self.assertIsNotNone(self.throttle(max_in_flight=1).acquire())
+        time.sleep(0.2)
+        self.assertIsNone(self.throttle(max_in_flight=1).acquire())
+
+    @override_settings(WEBHOOK_HOST_LIMITS={'example.com': {'rate': 5, 'burst': 10, 'max_in_flight': 4}})
+    def test_webhook_limits_take_precedence_over_host_limits(self):
+        """
+        Ensure limits set on a Webhook override the ones configured for its host
+        """
+        hook = Webhook(url='https://example.com/hook')
+        self.assertEqual(limits_for(hook), DeliveryLimits(5, 10, 4))
+        hook.rate_limit = 0.5
+        hook.max_in_flight = 1
+        self.assertEqual(limits_for(hook), DeliveryLimits(0.5, 10, 1))
+        self.assertEqual(limits_for(Webhook(url='https://example.org/hook')), DeliveryLimits(None, 1, None))
+
+    @override_settings(WEBHOOK_THROTTLE_MAX_WAIT=1)
+    @patch('webhooks.sessions.requests.Session.post')
+    def test_deliveries_over_the_limit_are_deferred(self, mock):
+        """
+        Ensure deliveries which would have to wait long for a token are deferred, not dropped
+        """
+        cache.clear()
+        mock.return_value.ok = True
+        mock.return_value.status_code = 200
+        hooks = [
+            Webhook(id=hook_id, url='https://example.com/hook-{0}'.format(hook_id), rate_limit=0.01)
+            for hook_id in range(1, 3)
+        ]
+        sent, deferred = deliver_concurrently(hooks, b'{}', max_in_flight=1)
+        self.assertTrue(sent.ok)
+        self.assertTrue(deferred.deferred)
+        self.assertGreater(deferred.retry_after, 1)
+        self.assertEqual(mock.call_count, 1)
+
+
+class WebhookBatchingTests(TestCase):
+    """
+    Batched webhook delivery tests
+    """
+    def setUp(self):
+        cache.clear()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        post = patch('webhooks.sessions.requests.Session.post')
+        self.mock = post.start()
+        self.mock.return_value.ok = True
+        self.mock.return_value.status_code = 200
+        self.addCleanup(post.stop)
+
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        self.batching_webhook = Webhook.objects.create(
+            url='https://example.com/batch',
+            owner=self.user1,
+            batch_enabled=True,
+            batch_max_size=2,
+            batch_linger=60,
+        )
+        self.webhook = Webhook.objects.create(
+            url='https://example.com/hook',
+            owner=self.user1,
+        )
+
+    def create_project(self, name):
+        project = Project.objects.create(
+            name=name,
+            url='https://github.com/fedorkosilov/literate-parakeet',
+            owner=self.user1,
+        )
+        relay_outbox()
+        return project
+
+    def posted(self, url):
+        return [json.loads(call.kwargs['data']) for call in self.mock.call_args_list if call.kwargs['url'] == url]
+
+    def test_full_batch_is_delivered_as_one_document(self):
+        """
+        Ensure events are buffered until the batch is full and then delivered in a single request
+        """
+        first = self.create_project('Project One')
+        self.assertEqual(self.posted(self.batching_webhook.url), [])
+        self.assertEqual(len(self.posted(self.webhook.url)), 1)
+
+        second = self.create_project('Project Two')
+        batches = self.posted(self.batching_webhook.url)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([resource['id'] for resource in batches[0]['data']], [str(first.id), str(second.id)])
+        self.assertEqual(batches[0]['data'][1]['attributes']['name'], 'Project Two')
+        self.assertFalse(WebhookBatchItem.objects.exists())
+        self.assertEqual(
+            WebhookDelivery.objects.filter(
+                webhook=self.batching_webhook, status=WebhookDelivery.Status.SUCCEEDED
+            ).count(),
+            2,
+        )
+
+    def test_partial_batch_is_delivered_after_linger_time(self):
+        """
+        Ensure a partial batch waits for its linger time and is delivered afterwards
+        """
+        project = self.create_project('Project One')
+        self.assertEqual(flush_due_webhook_batches(), 0)
+        self.assertEqual(self.posted(self.batching_webhook.url), [])
+
+        WebhookBatchItem.objects.update(flush_at=timezone.now())
+        self.assertEqual(flush_due_webhook_batches(), 1)
+        batches = self.posted(self.batching_webhook.url)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([resource['id'] for resource in batches[0]['data']], [str(project.id)])
+        self.assertFalse(WebhookBatchItem.objects.exists())
+
+    def test_leased_events_are_not_delivered_twice(self):
+        """
+        Ensure events claimed by a worker are skipped by others until their lease expires
+        """
+        project = self.create_project('Project One')
+        WebhookBatchItem.objects.update(flush_at=timezone.now(), leased_until=timezone.now() + timedelta(seconds=60))
+        self.assertEqual(flush_due_webhook_batches(), 0)
+        self.assertEqual(flush_webhook_batch(self.batching_webhook.id), 0)
+        self.assertEqual(self.posted(self.batching_webhook.url), [])
+
+        WebhookBatchItem.objects.update(leased_until=timezone.now())
+        self.assertEqual(flush_due_webhook_batches(), 1)
+        batches = self.posted(self.batching_webhook.url)
+        self.assertEqual([resource['id'] for resource in batches[0]['data']], [str(project.id)])
+        self.assertFalse(WebhookBatchItem.objects.exists())
+
+    def test_deferred_batch_is_released(self):
+        """
+        Ensure a batch the host does not accept yet is released for a later delivery
+        """
+        self.create_project('Project One')
+        with patch('webhooks.batching.send_post_request') as send:
+            send.return_value.deferred = True
+            send.return_value.retry_after = 30
+            self.assertEqual(flush_webhook_batch(self.batching_webhook.id), 0)
+        item = WebhookBatchItem.objects.get()
+        self.assertIsNone(item.leased_until)
+        self.assertGreater(item.flush_at, timezone.now() + timedelta(seconds=20))
+
+
+class WebhookSubscriptionTests(APITestCase):
+    """
+    Webhook subscription filter tests
+    """
+    def setUp(self):
+        cache.clear()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        self.user2 = User.objects.create_user(
+            username='testuser2',
+            password='12345',
+        )
+        user1_token = Token.objects.create(user=self.user1)
+        self.user1_auth_header = 'Token ' + user1_token.key
+
+        self.all_webhook = Webhook.objects.create(url='https://example.com/all', owner=self.user1)
+        self.owner_webhook = Webhook.objects.create(url='https://example.com/owner', owner=self.user1, filter_owner=self.user2)
+        self.org_webhook = Webhook.objects.create(url='https://example.com/org', owner=self.user1, filter_github_org='Django')
+        self.rating_webhook = Webhook.objects.create(url='https://example.com/rating', owner=self.user1, filter_min_rating=Decimal('4'))
+        self.owner_and_org_webhook = Webhook.objects.create(
+            url='https://example.com/owner-and-org',
+            owner=self.user1,
+            filter_owner=self.user2,
+            filter_github_org='django',
+        )
+
+    def create_project(self, owner, url, rating='1'):
+        return Project.objects.create(name='Project One', url=url, rating=Decimal(rating), owner=owner)
+
+    def test_filtered_owners_are_not_deleted_with_webhooks_of_others(self):
+        """
+        Ensure deleting a filtered User neither deletes nor widens webhooks of other users
+        """
+        with self.assertRaises(RestrictedError):
+            self.user2.delete()
+        self.assertEqual(Webhook.objects.filter(filter_owner=self.user2).count(), 2)
+        # Webhooks of the deleted User itself do not protect it
+        Webhook.objects.filter(filter_owner=self.user2).update(owner=self.user2)
+        self.user2.delete()
+        self.assertFalse(Webhook.objects.filter(subscription_key='owner:{0}'.format(self.user2.id)).exists())
+
+    def test_webhooks_are_indexed_under_most_selective_filter(self):
+        """
+        Ensure the subscription key is compiled from the filters on save
+        """
+        self.assertEqual(self.all_webhook.subscription_key, '*')
+        self.assertEqual(self.owner_webhook.subscription_key, 'owner:{0}'.format(self.user2.id))
+        self.assertEqual(self.org_webhook.subscription_key, 'org:django')
+        self.assertEqual(self.rating_webhook.subscription_key, '*')
+        self.assertEqual(self.owner_and_org_webhook.subscription_key, 'owner:{0}'.format(self.user2.id))
+
+        self.org_webhook.filter_github_org = ''
+        self.org_webhook.save(update_fields=['filter_github_org'])
+        self.org_webhook.refresh_from_db()
+        self.assertEqual(self.org_webhook.subscription_key, '*')
+
+    def test_only_matching_webhooks_are_subscribed(self):
+        """
+        Ensure every filter of a webhook has to match the project
+        """
+        cases = [
+            (self.user1, 'https://github.com/fedorkosilov/literate-parakeet', '1', {self.all_webhook}),
+            (self.user1, 'https://github.com/fedorkosilov/literate-parakeet', '4.5', {self.all_webhook, self.rating_webhook}),
+            (self.user2, 'https://github.com/fedorkosilov/literate-parakeet', '1', {self.all_webhook, self.owner_webhook}),
+            (self.user1, 'https://github.com/django/django', '1', {self.all_webhook, self.org_webhook}),
+            (self.user2, 'https://github.com/Django/django', '1', {
+                self.all_webhook, self.owner_webhook, self.org_webhook, self.owner_and_org_webhook,
+            }),
+        ]
+        for owner, url, rating, expected in cases:
+            with self.subTest(owner=owner.username, url=url, rating=rating):
+                project = self.create_project(owner, url, rating)
+                self.assertEqual(set(Webhook.objects.subscribed_to(project)), expected)
+
+    @patch('webhooks.sessions.requests.Session.post')
+    def test_project_is_delivered_to_subscribed_webhooks_only(self, mock):
+        """
+        Ensure the fan-out only delivers to webhooks whose filters match
+        """
+        mock.return_value.ok = True
+        mock.return_value.status_code = 200
+        project = self.create_project(self.user2, 'https://github.com/fedorkosilov/literate-parakeet')
+        relay_outbox()
+        self.assertEqual(
+            sorted(call.kwargs['url'] for call in mock.call_args_list),
+            [self.all_webhook.url, self.owner_webhook.url],
+        )
+        self.assertEqual(WebhookFanout.objects.get(project=project).total, 2)
+
+    def test_user_can_create_webhook_with_filters(self):
+        """
+        Ensure subscription filters can be set through the API, owner filter by username
+        """
+        data = {
+                'data': {
+                    'type': 'Webhook',
+                    'attributes': {
+                        'url': 'https://example.com/filtered',
+                        'filter_owner': self.user2.username,
+                        'filter_github_org': 'Django',
+                        'filter_min_rating': '3.5',
+                    }
+                }
+            }
+        self.client.credentials(HTTP_AUTHORIZATION=self.user1_auth_header)
+        response = self.client.post(reverse('webhook-list'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['data']['attributes']['filter_owner'], self.user2.username)
+        webhook = Webhook.objects.get(url='https://example.com/filtered')
+        self.assertEqual(webhook.filter_owner, self.user2)
+        self.assertEqual(webhook.filter_github_org, 'django')
+        self.assertEqual(webhook.filter_min_rating, Decimal('3.5'))
+
+        data['data']['attributes']['filter_owner'] = 'nobody'
+        response = self.client.post(reverse('webhook-list'), data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WebhookConditionalRequestTests(APITestCase):
+    """
+    Webhook conditional request tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            password='12345',
+        )
+        user1_token = Token.objects.create(user=self.user1)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + user1_token.key)
+        self.webhook = Webhook.objects.create(url='https://example.com/hook', owner=self.user1)
+
+    def test_webhook_etag_follows_version_and_circuit_state(self):
+        """
+        Ensure webhook ETags change with the webhook and with its circuit breaker state
+        """
+        url = reverse('webhook-detail', args=[self.webhook.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        CircuitBreaker.for_url(self.webhook.url).trip()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['data']['attributes']['circuit_state'], CircuitState.OPEN)
+
+        list_url = reverse('webhook-list')
+        etag = self.client.get(list_url)['ETag']
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        CircuitBreaker.for_url(self.webhook.url).record_success()
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_webhook_writes_with_stale_if_match_fail(self):
+        """
+        Ensure If-Match gives optimistic concurrency to webhook updates
+        """
+        url = reverse('webhook-detail', args=[self.webhook.id])
+        etag = self.client.get(url)['ETag']
+        data = {'data': {'type': 'Webhook', 'id': self.webhook.id, 'attributes': {'comment': 'First'}}}
+        self.assertEqual(self.client.patch(url, data, HTTP_IF_MATCH=etag).status_code, status.HTTP_200_OK)
+        data['data']['attributes']['comment'] = 'Second'
+        self.assertEqual(self.client.patch(url, data, HTTP_IF_MATCH=etag).status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.webhook.refresh_from_db()
+        self.assertEqual(self.webhook.comment, 'First')
+        self.assertEqual(self.webhook.version, 2)
+        # A save without preconditions from a stale instance still gets a new version
+        stale = Webhook.objects.get(id=self.webhook.id)
+        stale.version = 1
+        stale.save()
+        self.assertEqual(Webhook.objects.get(id=self.webhook.id).version, 3)
@@ -0,0 +1,170 @@
+from contextlib import contextmanager
+from django.conf import settings
+from djangochallenge.redis_client import get_redis
+from typing import Iterator, NamedTuple, Optional
+from webhooks.breaker import destination_host
+from webhooks.models import Webhook
+import threading
+import time
+import uuid
+
+# Token bucket, refilled continuously at rate tokens per second up to burst tokens.
+# Returns {allowed, seconds to wait for the next token}, floats are returned as strings
+# because Redis truncates Lua numbers to integers.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+# Counting semaphore on a sorted set of slot holders scored by acquisition time.
+# Slots held longer than the lease are expired, so a crashed worker cannot leak them,
+# requests in flight renew their slot (see SEMAPHORE_RENEW_SCRIPT).
+SEMAPHORE_ACQUIRE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - lease)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(lease))
+return 1
+"""
+
+# Moves a held slot to the current time, a slot which has already expired is not taken again
+SEMAPHORE_RENEW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+if redis.call('ZADD', KEYS[1], 'XX', 'CH', now, ARGV[3]) == 1 then
+    redis.call('EXPIRE', KEYS[1], math.ceil(lease))
+end
+"""
+
+
+class DeliveryLimits(NamedTuple):
+    """
+    Limits of deliveries to one destination host
+
+    rate - Sustained number of requests per second, None for no limit
+    burst - Number of requests which may be sent at once after an idle period
+    max_in_flight - Number of concurrent requests, None for no limit
+    """
+
+    rate: Optional[float]
+    burst: int
+    max_in_flight: Optional[int]
+
+
+def limits_for(hook: Webhook) -> DeliveryLimits:
+    """
+    Return the limits of deliveries to a webhook
+
+    Limits set on the Webhook object take precedence over the ones configured
+    for its host in settings.WEBHOOK_HOST_LIMITS.
+    """
+    host_limits = settings.WEBHOOK_HOST_LIMITS.get(destination_host(hook.url), {})
+    rate = hook.rate_limit or host_limits.get('rate')
+    burst = hook.rate_limit_burst or int(host_limits.get('burst') or max(1, rate or 1))
+    max_in_flight = hook.max_in_flight or host_limits.get('max_in_flight')
+    return DeliveryLimits(rate, burst, None if max_in_flight is None else int(max_in_flight))
+
+
+class HostThrottle:
+    """
+    Rate limit (token bucket) and bulkhead (max in-flight requests) of one destination host
+
+    Both are enforced through Redis, so the limits hold across all Celery workers.
+    In-flight slots are leased for the connect and read timeouts of a
+    request, a request in flight for longer (eg. a slowly transferred
+    response) renews its slot, see renewing().
+    """
+
+    def __init__(self, host: str, limits: DeliveryLimits) -> None:
+        self.limits = limits
+        self.lease = settings.WEBHOOK_DELIVERY_CONNECT_TIMEOUT + settings.WEBHOOK_DELIVERY_READ_TIMEOUT
+        self.bucket_key = 'webhooks:throttle:{0}:bucket'.format(host)
+        self.in_flight_key = 'webhooks:throttle:{0}:in_flight'.format(host)
+        self.slot: Optional[str] = None
+
+    @classmethod
+    def for_hook(cls, hook: Webhook) -> 'HostThrottle':
+        return cls(destination_host(hook.url), limits_for(hook))
+
+    def acquire(self) -> Optional[float]:
+        """
+        Take an in-flight slot and a token for one request
+
+        Returns None when the request may be sent (release() must be called once
+        it has finished), otherwise the number of seconds after which to try again.
+        """
+        client = get_redis()
+        now = time.time()
+        if self.limits.max_in_flight is not None:
+            slot = uuid.uuid4().hex
+            acquired = client.eval(  # type: ignore[no-untyped-call]
+                SEMAPHORE_ACQUIRE_SCRIPT, 1, self.in_flight_key, self.limits.max_in_flight, now, self.lease, slot,
+            )
+            if not acquired:
+                return settings.WEBHOOK_THROTTLE_BUSY_DELAY
+            self.slot = slot
+        if self.limits.rate is not None:
+            allowed, wait = client.eval(  # type: ignore[no-untyped-call]
+                TOKEN_BUCKET_SCRIPT, 1, self.bucket_key, self.limits.rate, self.limits.burst, now,
+            )
+            if not allowed:
+                self.release()
+                return float(wait)
+        return None
+
+    def renew(self) -> None:
+        """
+        Extend the lease of the held in-flight slot
+        """
+        if self.slot is not None:
+            get_redis().eval(  # type: ignore[no-untyped-call]
+                SEMAPHORE_RENEW_SCRIPT, 1, self.in_flight_key, time.time(), self.lease, self.slot,
+            )
+
+    @contextmanager
+    def renewing(self) -> Iterator[None]:
+        """
+        Renew the held in-flight slot every third of its lease until the block exits
+        """
+        if self.slot is None:
+            yield
+            return
+        stop = threading.Event()
+
+        def renew() -> None:
+            while not stop.wait(self.lease / 3):
+                self.renew()
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def release(self) -> None:
+        if self.slot is not None:
+            get_redis().zrem(self.in_flight_key, self.slot)
+            self.slot = None
@@ -7,6 +7,8 @@ from webhooks import views
 urlpatterns = [
     path('webhooks/', views.WebhookList.as_view(), name='webhook-list'),
     path('webhooks/<int:pk>/', views.WebhookDetail.as_view(), name='webhook-detail'),
+    path('webhooks/deliveries/', views.WebhookDeliveryList.as_view(), name='webhook-delivery-list'),
+    path('webhooks/deliveries/redrive/', views.WebhookDeliveryRedrive.as_view(), name='webhook-delivery-redrive'),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns)
\ No newline at end of file
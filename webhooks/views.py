@@ -1,14 +1,22 @@
-from webhooks.models import Webhook
-from webhooks.serializers import WebhookSerializer
+from djangochallenge.conditional import ConditionalListMixin, ConditionalObjectMixin
+from djangochallenge.pagination import JsonApiCursorPagination
+from django.db.models import QuerySet
+from django.utils.cache import quote_etag  # type: ignore[attr-defined]
+from webhooks.breaker import CircuitBreaker, destination_host
+from webhooks.models import Webhook, WebhookDelivery
+from webhooks.serializers import WebhookSerializer, WebhookDeliverySerializer
 from webhooks.permissions import IsOwner
+from webhooks.retries import redrive
 from rest_framework import generics, permissions
+from rest_framework.response import Response
 
 
-class WebhookList(generics.ListCreateAPIView):
+class WebhookList(ConditionalListMixin, generics.ListCreateAPIView):
     serializer_class = WebhookSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = JsonApiCursorPagination
 
-    def get_queryset(self):
+    def get_queryset(self) -> 'QuerySet[Webhook]':
         if self.request.user.is_anonymous:
             # For unauthenticated users we want to return an empty queryset, otherwise we will get an exception
             return Webhook.objects.none()
@@ -19,8 +27,50 @@ class WebhookList(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def get_conditional_state(self):
+        # circuit_state of the listed webhooks is not stored with them
+        hosts = {destination_host(url) for url in self.get_queryset().values_list('url', flat=True)}
+        return sorted((host, CircuitBreaker(host).state()) for host in hosts)
 
-class WebhookDetail(generics.RetrieveUpdateDestroyAPIView):
+
+class WebhookDetail(ConditionalObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Webhook.objects.all()
     serializer_class = WebhookSerializer
-    permission_classes = [permissions.IsAuthenticated, IsOwner]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get_etag(self, obj):
+        # circuit_state is not stored with the webhook, it is a part of its ETag
+        return quote_etag('{0}.{1}'.format(obj.version, CircuitBreaker.for_url(obj.url).state()))
+
+    def get_last_modified(self, obj):
+        # updated_at does not change with circuit_state
+        return None
+
+
+class WebhookDeliveryList(generics.ListAPIView):
+    serializer_class = WebhookDeliverySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['status', 'webhook']
+
+    def get_queryset(self) -> 'QuerySet[WebhookDelivery]':
+        if self.request.user.is_anonymous:
+            return WebhookDelivery.objects.none()
+        else:
+            # Deliveries of webhooks owned by authenticated user
+            return WebhookDelivery.objects.filter(webhook__owner=self.request.user)
+
+
+class WebhookDeliveryRedrive(WebhookDeliveryList):
+    """
+    Re-drive dead-lettered deliveries of authenticated user's webhooks
+
+    Deliveries can be narrowed down with the same filters as the delivery list,
+    eg. filter[webhook]=1
+    """
+    http_method_names = ['post', 'options']
+    # The response is a meta-only JSON:API document
+    resource_name = False
+
+    def post(self, request, *args, **kwargs):
+        count = redrive(self.filter_queryset(self.get_queryset()))
+        return Response({'meta': {'redriven': count}})